@@ -1,5 +1,7 @@
 import pygame.mixer as mixer
 from motion.recorder import *
+from motion.gesture_library import gesture_library
+from motion.clock import MixerClock
 from motion.move import *
 import threading
 import time
@@ -106,15 +108,13 @@ def play_opera(shimi, **kwargs):
     mixer.init()  # Initialize audio mixer
     mixer.music.load('audio/opera_long.wav')  # Load song
 
-    r = load_recorder(shimi, "opera")  # Load the movement
+    # Get the movement, only loading and planning it the first time
+    gesture_library.plan("opera")
 
-    # Start moving
-    move = threading.Thread(target=r.play)
+    # Start the song once the gesture is at its initial position, and keep the gesture in sync with it
+    move = threading.Thread(target=gesture_library.play, args=(shimi, "opera"),
+                            kwargs={"callback": mixer.music.play, "clock": MixerClock()})
     move.start()
 
-    time.sleep(2.7)  # Allow for move to catch up
-
-    mixer.music.play()  # Start song
-
     move.join()  # Wait for move to end, blocking
     shimi.initial_position()  # Move back to initial position
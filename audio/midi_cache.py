@@ -0,0 +1,295 @@
+from config.definitions import MIDI_ANALYSIS_CACHE_DIR
+from collections import OrderedDict
+import numpy as np
+import threading
+import tempfile
+import hashlib
+import os
+
+# Bump when the extracted features change, so analyses cached by older versions aren't used
+MIDI_ANALYSIS_VERSION = 1
+
+
+class MidiFeatures:
+    """The features MidiAnalysis extracts from a MIDI file, computed once and kept without the parsed file.
+
+    Has the same methods as MidiAnalysis, so it can be used in its place.
+    """
+
+    def __init__(self, path, tempo_change_times, tempi, num_beats, note_starts, note_ends, note_pitches, lowest,
+                 pitch_range, downbeats, key_tonics, key_modes):
+        """Initializes the features.
+
+        Args:
+            path (str): Path of the MIDI file, to synthesize it from in play().
+            tempo_change_times (np.ndarray): Times in seconds of each tempo change.
+            tempi (np.ndarray): Tempo in beats per minute from each change.
+            num_beats (int): Number of beats in the piece.
+            note_starts (np.ndarray): Start time in seconds of each note of the melody.
+            note_ends (np.ndarray): End time in seconds of each note of the melody.
+            note_pitches (np.ndarray): MIDI pitch of each note of the melody.
+            lowest (int): MIDI pitch of the lowest note of the piece.
+            pitch_range (int): Range of the piece in semitones.
+            downbeats (np.ndarray): Time in seconds of the start of each measure.
+            key_tonics (np.ndarray): Name of the estimated key's tonic for each measure.
+            key_modes (np.ndarray): Mode of the estimated key for each measure.
+        """
+        self.path = path
+        self.tempo_change_times = np.asarray(tempo_change_times, dtype=np.float64)
+        self.tempi = np.asarray(tempi, dtype=np.float64)
+        self.num_beats = int(num_beats)
+        self.note_starts = np.asarray(note_starts, dtype=np.float64)
+        self.note_ends = np.asarray(note_ends, dtype=np.float64)
+        self.note_pitches = np.asarray(note_pitches, dtype=np.int64)
+        self.lowest = int(lowest)
+        self.pitch_range = int(pitch_range)
+        self.downbeats = np.asarray(downbeats, dtype=np.float64)
+        self.key_tonics = np.asarray(key_tonics, dtype=str)
+        self.key_modes = np.asarray(key_modes, dtype=str)
+
+    @classmethod
+    def from_analysis(cls, path, analysis):
+        """Extracts the features from a parsed MIDI file.
+
+        Args:
+            path (str): Path of the MIDI file.
+            analysis (MidiAnalysis): The analysis of the file.
+
+        Returns:
+            MidiFeatures: The features.
+        """
+        tempo_change_times, tempi = analysis.pm_obj.get_tempo_changes()
+        notes = analysis.pm_obj.instruments[0].notes
+        interval = analysis.m21_obj.analyze('range')
+        measure_keys = analysis.get_measure_keys()
+
+        return cls(path, tempo_change_times, tempi, len(analysis.pm_obj.get_beats()),
+                   [note.start for note in notes], [note.end for note in notes], [note.pitch for note in notes],
+                   interval.noteStart.midi, interval.semitones,
+                   [measure["time"] for measure in measure_keys],
+                   [measure["key"].tonic.name for measure in measure_keys],
+                   [measure["key"].mode for measure in measure_keys])
+
+    def save(self, path):
+        """Saves the features to a .npz file.
+
+        Args:
+            path (str): The path of the file to save.
+        """
+        np.savez(path, path=np.array(self.path), tempo_change_times=self.tempo_change_times, tempi=self.tempi,
+                 num_beats=np.array(self.num_beats), note_starts=self.note_starts, note_ends=self.note_ends,
+                 note_pitches=self.note_pitches, lowest=np.array(self.lowest), pitch_range=np.array(self.pitch_range),
+                 downbeats=self.downbeats, key_tonics=self.key_tonics, key_modes=self.key_modes)
+
+    @classmethod
+    def load(cls, path, midi_path=None):
+        """Loads features saved with save().
+
+        Args:
+            path (str): The path of the .npz file.
+            midi_path (str, optional): Defaults to None. Path of the MIDI file now, or None for the one they were saved with.
+
+        Returns:
+            MidiFeatures: The loaded features.
+        """
+        # Reading an array from the archive copies it out, so the file can be closed right away
+        with np.load(path) as data:
+            return cls(midi_path or str(data["path"]), data["tempo_change_times"], data["tempi"], data["num_beats"],
+                       data["note_starts"], data["note_ends"], data["note_pitches"], data["lowest"],
+                       data["pitch_range"], data["downbeats"], data["key_tonics"], data["key_modes"])
+
+    def get_tempo(self, t=0.0):
+        """Gets the tempo of the MIDI file.
+
+        Args:
+            t (float, optional): The time in seconds at which to get the tempo.
+
+        Returns:
+            float: The tempo of the MIDI file at time t in seconds per beat.
+        """
+        if t < 0:
+            print("Unable to get tempo at time %f" % t)
+            return
+
+        if len(self.tempi) == 0:
+            return None
+
+        # Last tempo change at or before t, or the first tempo before any change
+        i = max(int(np.searchsorted(self.tempo_change_times, t, side='right')) - 1, 0)
+        return 1 / (self.tempi[i] / 60)
+
+    def get_normalized_pitch_contour(self):
+        """Gets a pitch contour for the MIDI melody, normalized for the range of the melody between 0-1.
+
+        Returns:
+            List[dict]: Notes with a norm_pitch attribute, and start/end times in seconds.
+        """
+        if self.pitch_range == 0:
+            return [8.0 for _ in range(len(self.note_pitches))]
+
+        norm_pitches = (self.note_pitches - self.lowest) / self.pitch_range
+        return [{"norm_pitch": float(norm_pitch), "start": float(start), "end": float(end)}
+                for norm_pitch, start, end in zip(norm_pitches, self.note_starts, self.note_ends)]
+
+    def get_measure_keys(self):
+        """Gets a key estimation for every measure, with timestamps.
+
+        Returns:
+            List[dict]: Measures with a music21 key object and a timestamp.
+        """
+        import music21 as m21
+
+        return [{"key": m21.key.Key(tonic, mode), "time": float(t)}
+                for tonic, mode, t in zip(self.key_tonics, self.key_modes, self.downbeats)]
+
+    def get_length(self):
+        """Gets the length of the piece in seconds.
+
+        Returns:
+            float: The length in seconds.
+        """
+        tempo = self.get_tempo()
+        return (self.num_beats * tempo) + ((4 - (self.num_beats % 4)) * tempo)
+
+    def get_shortest_note_length(self):
+        """Gets the length of the shortest note that occurs in the piece, in seconds.
+
+        Returns:
+            float: The length of the shortest note in seconds.
+        """
+        if len(self.note_starts) == 0:
+            return 99999
+        return float(np.min(self.note_ends - self.note_starts))
+
+    def get_longest_note_length(self):
+        """Gets the length of the longest note that occurs in the piece, in seconds.
+
+        Returns:
+            float: The length of the longest note in seconds.
+        """
+        if len(self.note_starts) == 0:
+            return -1
+        return float(np.max(self.note_ends - self.note_starts))
+
+    def play(self):
+        """Play basic synthesized audio of MIDI file."""
+        import pretty_midi as pm
+        import sounddevice as sd
+
+        sd.play(pm.PrettyMIDI(self.path).synthesize())
+
+
+class MidiAnalysisCache:
+    """Analyzes MIDI files once and keeps their features, so repeat phrases skip parsing entirely.
+
+    Features are keyed on a hash of the MIDI file's content, kept in a bounded in-memory LRU cache, and saved to an
+    on-disk cache that survives restarts. music21 and pretty_midi are only imported when a file has to be parsed.
+    """
+
+    def __init__(self, cache_dir=MIDI_ANALYSIS_CACHE_DIR, capacity=32):
+        """Initializes the caches.
+
+        Args:
+            cache_dir (str, optional): Defaults to MIDI_ANALYSIS_CACHE_DIR. Directory of the on-disk cache, or None to only cache in memory.
+            capacity (int, optional): Defaults to 32. The most analyses to keep in memory.
+        """
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+
+        self._features = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        """Gets the cache key of a MIDI file, hashing it only if it has changed since it was last hashed.
+
+        Args:
+            path (str): Path of the MIDI file.
+
+        Returns:
+            str: Hex digest of the file content and analysis version.
+        """
+        stat = os.stat(path)
+        stamp = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+        key = self._hashes.get(stamp)
+        if key is None:
+            digest = hashlib.sha1(str(MIDI_ANALYSIS_VERSION).encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+            key = digest.hexdigest()
+            self._hashes[stamp] = key
+
+        return key
+
+    def analyze(self, path):
+        """Gets the features of a MIDI file, from memory, disk, or by parsing it.
+
+        Args:
+            path (str): Path of the MIDI file.
+
+        Returns:
+            MidiFeatures: The file's features.
+        """
+        key = self.key(path)
+
+        with self._lock:
+            features = self._features.get(key)
+            if features is not None:
+                self._features.move_to_end(key)
+                return features
+
+        cache_path = os.path.join(self.cache_dir, key + ".npz") if self.cache_dir else None
+        features = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                features = MidiFeatures.load(cache_path, path)
+            except Exception as e:
+                print("Unable to read cached analysis of %s, reanalyzing it." % path, e)
+
+        if features is None:
+            from audio.midi_analysis import MidiAnalysis
+
+            features = MidiFeatures.from_analysis(path, MidiAnalysis(path))
+
+            if cache_path:
+                try:
+                    if not os.path.exists(self.cache_dir):
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                    # Write somewhere else first and rename, so other processes never read a partly written file
+                    fd, partial = tempfile.mkstemp(suffix=".npz", dir=self.cache_dir)
+                    with os.fdopen(fd, "wb") as f:
+                        features.save(f)
+                    os.replace(partial, cache_path)
+                except Exception as e:
+                    print("Unable to cache analysis of %s." % path, e)
+
+        with self._lock:
+            self._features[key] = features
+            self._features.move_to_end(key)
+            while len(self._features) > self.capacity:
+                self._features.popitem(last=False)
+
+        return features
+
+    def warm(self, paths):
+        """Analyzes MIDI files ahead of time, e.g. all the stimuli of an experiment.
+
+        Args:
+            paths (List[str]): Paths of the MIDI files. Missing or unreadable files are skipped.
+        """
+        for path in paths:
+            try:
+                self.analyze(path)
+            except Exception as e:
+                print("Unable to analyze %s." % path, e)
+
+    def clear(self):
+        """Empties the in-memory cache. The on-disk cache is kept."""
+        with self._lock:
+            self._features.clear()
+
+
+# Shared so MIDI files are only analyzed once per process
+midi_analysis_cache = MidiAnalysisCache()
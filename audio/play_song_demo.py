@@ -1,6 +1,6 @@
 """Uses voice recognition to play sequenced song demos."""
 
-from pypot.utils import StoppableThread
+from utils.threads import WaitableThread
 from matt.SpeechRecognizer import *
 from nltk.corpus import stopwords
 from nltk.stem.snowball import EnglishStemmer
@@ -121,14 +121,14 @@ class PlaySongDemoOnce:
             no.join()
 
 
-class PlaySongDemoListen(StoppableThread):
+class PlaySongDemoListen(WaitableThread):
     def __init__(self, shimi):
         init_demo(self, shimi)
 
-        StoppableThread.__init__(self,
-                                 setup=self.setup,
-                                 target=self.run,
-                                 teardown=self.teardown)
+        WaitableThread.__init__(self,
+                                setup=self.setup,
+                                target=self.run,
+                                teardown=self.teardown)
 
     def setup(self):
         # Get and calibrate the recognizer object
@@ -137,9 +137,10 @@ class PlaySongDemoListen(StoppableThread):
     def run(self):
         # Allow the demo to be stopped
         while not self.should_stop():
-            # Allow the demo to be paused between queries
-            while self.should_pause():
-                pass
+            # Allow the demo to be paused between queries, blocking until resumed or stopped
+            if self.should_pause():
+                self.wait_to_resume()
+                continue
 
             # Get a phrase
             phrase, _ = self.recognizer.listenForPhrase(timeout=2.0)
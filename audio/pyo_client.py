@@ -12,6 +12,9 @@ class PyoClient:
         self.midi_server = None
         self.midi_device_ids = None
 
+        # Functions called with (status, note, velocity, device_id) for each MIDI message, e.g. LivePhrase.on_midi
+        self.midi_handlers = []
+
         if audio:
             self.setup_audio(duplex=audio_duplex, sr=sr, ichnls=2, prompt_for_devices=prompt_for_audio_devices,
                              input_device_id=audio_input_device_id, output_device_id=audio_output_device_id)
@@ -117,7 +120,11 @@ class PyoClient:
             print("Unable to setup MIDI.", e)
 
     def on_midi(self, status, note, velocity, device_id):
-        pass
+        for handler in list(self.midi_handlers):
+            try:
+                handler(status, note, velocity, device_id)
+            except Exception as e:
+                print("MIDI handler failed.", e)
 
 
 if __name__ == '__main__':
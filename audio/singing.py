@@ -23,6 +23,7 @@ import pickle
 import markovify
 import json
 import multiprocessing
+import threading
 
 
 class PVSample:
@@ -126,6 +127,8 @@ class Singing:
                 resource_path, "audio_files", "shimi_vocalization.wav")
         self.resource_path = resource_path
         self.playing = False
+        self.finished = threading.Event()  # Set whenever singing isn't playing, to block on without spinning
+        self.finished.set()
         
         self.shimi_sample = None
         self.song_sample = None
@@ -239,6 +242,7 @@ class Singing:
             self.shimi_sample.stop()
             self.song_sample.stop()
             self.playing = False
+            self.finished.set()
 
         self.frequency_index = (self.frequency_index +
                                 1) % len(self.melody_data)
@@ -281,9 +285,9 @@ class Singing:
             starting_callback()
 
         self.playing = True
+        self.finished.clear()
         if blocking:
-            while self.playing:
-                pass
+            self.finished.wait()
     
     def stop_audio(self):
         if self.shimi_sample:
@@ -292,6 +296,8 @@ class Singing:
             self.song_sample.stop()
         if self.frequency_setter:
             self.frequency_setter.stop()
+        self.playing = False
+        self.finished.set()
 
     def define_singing_pattern(self):
         # The function self.set_freq is called every self.frequency_timestep seconds as a result of this Pattern object
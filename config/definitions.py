@@ -1,3 +1,5 @@
+import os
+
 # Aliases for motor IDs
 TORSO = 1
 NECK_LR = 2
@@ -21,4 +23,19 @@ ANGLE_LIMITS = {
     NECK_UD: [-49.01, 11.21],
     PHONE: [-101.85, 78.15],
     FOOT: [5.41, 21.14]
-}
\ No newline at end of file
+}
+
+# Maximum speed of an MX-28 in degrees per second, used when a moving speed of 0.0 (as fast as possible) is set
+MAX_SPEED = 702.0
+
+# Where the last discovered motor bus configuration is cached, to skip scanning on startup
+BUS_PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".shimi", "bus_profile.json")
+
+# Where preprocessed gesture playback plans are cached, keyed by gesture file content
+PLAN_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".shimi", "plans")
+
+# Where features extracted from MIDI files are cached, keyed by MIDI file content
+MIDI_ANALYSIS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".shimi", "midi_analysis")
+
+# Where precomputed generative gesture plans are stored, keyed by MIDI file content, emotion and seed
+PHRASE_PLAN_DIR = os.path.join(os.path.expanduser("~"), ".shimi", "phrase_plans")
@@ -2,6 +2,7 @@ import os, sys
 
 sys.path.insert(1, os.path.join(sys.path[0], '../..'))
 from motion.generative_phrase import GenerativePhrase
+from motion.phrase_plans import PHRASE_SEED
 
 from pythonosc import osc_server, dispatcher, udp_client
 from subprocess import Popen, PIPE
@@ -86,6 +87,13 @@ class EmotionTrustExperiment:
 
         self.generator = GenerativePhrase()
 
+        # Analyze the gesture stimuli now, so trials don't wait on MIDI parsing
+        stimuli = [op.join(self.group_name, trial_type, stimulus + ".mid")
+                   for trial_type, stimuli in [("linkedgesture", self.generated_movement_audio_files),
+                                               ("randomgesture", self.random_movement_audio_files)]
+                   for stimulus in stimuli]
+        threading.Thread(target=self.generator.midi_cache.warm, args=(stimuli,), daemon=True).start()
+
         mixer.init()
 
     def on_get_trial(self, _):
@@ -189,7 +197,8 @@ class EmotionTrustExperiment:
                     self.osc_client.send_message("/trial_started", [])
                     print("Running trial %s for stimulus %s, with_audio %s" %
                           (trial_type, stimulus, str(with_audio)))
-                    self.generator.generate(base_filename + ".mid", valence, arousal, wav_path=base_filename + ".wav")
+                    self.generator.generate(base_filename + ".mid", valence, arousal, wav_path=base_filename + ".wav",
+                                            seed=PHRASE_SEED)
             else:
                 if trial_type == "randomgesture":
                     self.osc_client.send_message("/trial_started", [])
@@ -201,7 +210,7 @@ class EmotionTrustExperiment:
                     self.osc_client.send_message("/trial_started", [])
                     print("Running trial %s for stimulus %s, with_audio %s" %
                           (trial_type, stimulus, str(with_audio)))
-                    self.generator.generate(base_filename + ".mid", valence, arousal, mute=True)
+                    self.generator.generate(base_filename + ".mid", valence, arousal, mute=True, seed=PHRASE_SEED)
 
         self.osc_client.send_message("/trial_ended", [])
 
@@ -95,9 +95,8 @@ class SingingBluetoothDemo:
             self.fetch_queried_songs(search_query, num_results, offset)
 
     def on_sing(self, message):
-        if self.move:  # Make sure no movement is happening
+        if self.move:  # Stop where Shimi is, the next gesture blends in from there
             self.move.stop()
-            self.shimi.initial_position()
         
         self.singing_client_pipe.send({  # Make sure no other audio is playing
             "command": "stop"
@@ -137,7 +136,7 @@ class SingingBluetoothDemo:
     def on_stop(self, message):
         if self.move:  # Make sure no movement is happening
             self.move.stop()
-            self.shimi.initial_position()
+            self.shimi.initial_position(wait=False)  # Blend back without blocking the next request
         
         self.singing_client_pipe.send({  # Make sure no other audio is playing
             "command": "stop"
@@ -5,6 +5,7 @@ sys.path.insert(1, os.path.join(sys.path[0], 'shimiAudio'))
 from shimi import Shimi
 from motion.move import Alert
 from motion.generative_phrase import GenerativePhrase
+from motion.phrase_plans import PHRASE_SEED
 from wakeword.wakeword_activation import WakeWordClient
 from audio.audio_demos import play_opera
 from wakeword.doa import DOA
@@ -67,14 +68,14 @@ def main():
             # Image.open("val_aro.png").show()
             # plt.clf()
 
-            phrase_generator.generate(midi_filename, valence, arousal, wav_path=wav_filename)
+            phrase_generator.generate(midi_filename, valence, arousal, wav_path=wav_filename, seed=PHRASE_SEED)
 
         def play_hey_jude(_, **kwargs):
             _, _, valence, arousal = audio_response_demo(kwargs['phrase'],
                                                          kwargs['audio_data'][0],
                                                          kwargs['audio_data'][1])
 
-            phrase_generator.generate("heymidi.mid", valence, arousal, wav_path="heyjude.mp3")
+            phrase_generator.generate("heymidi.mid", valence, arousal, wav_path="heyjude.mp3", seed=PHRASE_SEED)
 
         def heard():
             ping_file = "shimiAudio/audio/"
@@ -0,0 +1,137 @@
+from config.definitions import STARTING_POSITIONS
+from shimi import Shimi
+from motion.move import Move
+from motion.trajectory import BLEND_TIME
+from concurrent.futures import ThreadPoolExecutor
+import pypot.dynamixel
+import time
+
+# Default time in seconds between dispatching a gesture to the fleet and all robots starting it
+START_LEAD = 0.05
+
+
+class ShimiFleet:
+    """Drives several Shimis from one host, one per serial bus, in sync.
+
+    Every robot has its own control loop and state poller threads, which are the only threads using its bus, so
+    serial I/O on different buses happens in parallel rather than queueing behind one thread.
+    """
+
+    def __init__(self, ports=None, simulate=0, silent=False, **shimi_kwargs):
+        """Connects to every robot in parallel and moves them all to their initial positions.
+
+        Args:
+            ports (List[str], optional): Defaults to None. Serial ports with a Shimi on them, or None for every available port.
+            simulate (int, optional): Defaults to 0. Number of simulated robots to run instead of connecting to ports.
+            silent (bool, optional): Defaults to False. Suppresses print information on motor connections.
+            **shimi_kwargs (dict): Keyword arguments passed on to each Shimi.
+        """
+        if simulate:
+            ports = [None for _ in range(simulate)]
+        elif ports is None:
+            ports = pypot.dynamixel.get_available_ports()
+
+        def connect(port):
+            return Shimi(silent=silent, simulate=bool(simulate), home_async=True, port=port, **shimi_kwargs)
+
+        # Connecting mostly waits on serial I/O, so every bus can be set up at once
+        with ThreadPoolExecutor(max_workers=max(len(ports), 1)) as executor:
+            robots = list(executor.map(connect, ports))
+
+        self.robots = []
+        for port, robot in zip(ports, robots):
+            if robot.controller is None:
+                print("Unable to connect to Shimi on", port)
+            else:
+                self.robots.append(robot)
+
+        self.wait_until_ready()
+
+        if not silent:
+            print("Fleet of %d Shimi(s) ready." % len(self.robots))
+
+    def __len__(self):
+        return len(self.robots)
+
+    def __iter__(self):
+        return iter(self.robots)
+
+    def __getitem__(self, i):
+        return self.robots[i]
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until every robot has reached its initial position.
+
+        Args:
+            timeout (float, optional): Defaults to None. Maximum time in seconds to wait per robot, or None to wait indefinitely.
+
+        Returns:
+            bool: Whether every robot set up successfully.
+        """
+        return all([robot.wait_until_ready(timeout) for robot in self.robots])
+
+    def perform(self, moves, blend=BLEND_TIME, lead=START_LEAD):
+        """Performs one gesture on every robot, all starting at the same time.
+
+        Each robot's current gesture is preempted, blending from where that robot is into the new one.
+
+        Args:
+            moves (List[Move]): Moves that have not been started yet, making up the gesture. They can be created for any one of the robots.
+            blend (float, optional): Defaults to BLEND_TIME. Time in seconds to blend from each robot's current motion into the gesture.
+            lead (float, optional): Defaults to START_LEAD. Time in seconds after dispatching that the gesture starts.
+
+        Returns:
+            List[TrajectoryPlayer]: The player performing the gesture on each robot.
+        """
+        # Compile before picking the start time, so it doesn't eat into the lead
+        trajectories = [robot.compile(moves) for robot in self.robots]
+        return self.play(trajectories, blend, time.monotonic() + lead)
+
+    def play(self, trajectories, blend=BLEND_TIME, start_time=None):
+        """Plays trajectories on the robots, all starting at the same time.
+
+        Args:
+            trajectories (List[Trajectory] or Trajectory): A trajectory per robot, or one to play on all of them.
+            blend (float, optional): Defaults to BLEND_TIME. Time in seconds to blend from each robot's current motion into its trajectory.
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start, or None for START_LEAD from now.
+
+        Returns:
+            List[TrajectoryPlayer]: The player performing the trajectory on each robot.
+        """
+        if not isinstance(trajectories, list):
+            trajectories = [trajectories for _ in self.robots]
+        if start_time is None:
+            start_time = time.monotonic() + START_LEAD
+
+        return [robot.play(trajectory, blend, start_time) for robot, trajectory in zip(self.robots, trajectories)]
+
+    def stop(self):
+        """Stops every robot's gesture, leaving them where they are."""
+        for robot in self.robots:
+            if robot.gesture is not None:
+                robot.gesture.stop()
+
+    def initial_position(self, duration=1.0):
+        """Moves every robot to its initial position at the same time.
+
+        Args:
+            duration (float, optional): Defaults to 1.0. Time to take the robots to their initial positions.
+        """
+        if not self.robots:
+            return
+
+        self.enable_torque()
+        moves = [Move(self.robots[0], m, STARTING_POSITIONS[m], duration, normalized_positions=False)
+                 for m in self.robots[0].all_motors]
+        for player in self.perform(moves):
+            player.join()
+
+    def disable_torque(self):
+        """Turns off torque for every robot's motors."""
+        for robot in self.robots:
+            robot.disable_torque()
+
+    def enable_torque(self):
+        """Turns on torque for every robot's motors."""
+        for robot in self.robots:
+            robot.enable_torque()
@@ -0,0 +1,206 @@
+from multiprocessing import Array
+import numpy as np
+import threading
+import time
+
+# Default maximum time in seconds a gesture may drift from its clock before being stretched back in line
+SYNC_TOLERANCE = 0.04
+
+# Default longest time in seconds a gesture waits for its clock to start before giving up, e.g. if its song fails
+CLOCK_START_TIMEOUT = 10.0
+
+# Largest change in playback rate used to get back in sync, as a fraction of normal speed
+MAX_STRETCH = 0.25
+
+# Time in seconds over which drift is corrected, which sets how hard the rate is changed for a given drift
+CATCH_UP_TIME = 0.5
+
+# Drift in seconds past which the gesture jumps to the clock instead of stretching, e.g. after the song is seeked
+RESYNC_ERROR = 1.0
+
+# Time in seconds a clock is followed before its rate is estimated, as readings like mixer positions are jittery
+RATE_WINDOW = 1.0
+
+# Interval time in seconds between samples of a clock shared with another process
+SHARE_FREQ = 0.01
+
+
+class Clock:
+    """An external time reference for playback to follow, like the position in a song being played."""
+
+    def __init__(self, source, offset=0.0):
+        """Initializes the clock.
+
+        Args:
+            source (function): Returns the current time of the reference in seconds, or None while it isn't running. E.g. a function reading a pyo time reference.
+            offset (float, optional): Defaults to 0.0. Time in seconds added to the source's time, so gestures can lead (positive) or lag (negative) it.
+        """
+        self.source = source
+        self.offset = offset
+
+    def time(self):
+        """Gets the current time of the clock.
+
+        Returns:
+            float: Time in seconds, or None if the reference isn't running.
+        """
+        t = self.source()
+        if t is None:
+            return None
+        return t + self.offset
+
+
+class MixerClock(Clock):
+    """The playback position of the song playing through pygame's mixer.music."""
+
+    def __init__(self, offset=0.0):
+        """Initializes the clock.
+
+        Args:
+            offset (float, optional): Defaults to 0.0. Time in seconds added to the song's position, so gestures can lead (positive) or lag (negative) it.
+        """
+        import pygame.mixer as mixer
+
+        def position():
+            ms = mixer.music.get_pos()
+            return ms / 1000.0 if ms >= 0 else None
+
+        Clock.__init__(self, position, offset)
+
+
+class SharedClock(Clock):
+    """A clock read in another process, through shared memory written by a thread sampling the real clock.
+
+    Must be created before forking the process that reads it. Between samples, the time is extrapolated from when it
+    was sampled, since time.monotonic() is the same across processes.
+    """
+
+    def __init__(self):
+        # Time of the followed clock (NaN while it isn't running) and the time.monotonic() time it was sampled at
+        self._sample = Array('d', [np.nan, 0.0])
+        self._thread = None
+        self._running = threading.Event()
+        Clock.__init__(self, self._extrapolate)
+
+    def follow(self, clock, freq=SHARE_FREQ):
+        """Starts sampling a clock into shared memory, replacing any clock already followed.
+
+        Args:
+            clock (Clock): The clock to follow.
+            freq (float, optional): Defaults to SHARE_FREQ. The interval time in seconds between samples.
+        """
+        self.stop()
+        self._write(clock.time())
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._pump, args=(clock, freq))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling, after which the clock reads as not running."""
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write(None)
+
+    def _pump(self, clock, freq):
+        while self._running.is_set():
+            self._write(clock.time())
+            time.sleep(freq)
+
+    def _write(self, t):
+        with self._sample.get_lock():
+            self._sample[0] = np.nan if t is None else t
+            self._sample[1] = time.monotonic()
+
+    def _extrapolate(self):
+        with self._sample.get_lock():
+            t, sampled_at = self._sample[0], self._sample[1]
+        if np.isnan(t):
+            return None
+        return t + (time.monotonic() - sampled_at)
+
+
+class ClockSync:
+    """Maps time.monotonic() time to gesture time, stretching or compressing it to stay in sync with a clock.
+
+    Gesture time advances at the clock's rate, estimated over the time since it was last in sync, so a clock running
+    steadily fast or slow doesn't keep causing drift. Once gesture time drifts from the clock by more than the
+    tolerance anyway, its rate is also changed in proportion to the drift (within max_stretch of normal speed) until
+    the drift is back under half the tolerance. Drift past RESYNC_ERROR is fixed by jumping straight to the clock.
+    """
+
+    def __init__(self, clock, tolerance=SYNC_TOLERANCE, max_stretch=MAX_STRETCH):
+        """Initializes the sync.
+
+        Args:
+            clock (Clock): The clock to follow.
+            tolerance (float, optional): Defaults to SYNC_TOLERANCE. Maximum drift in seconds before stretching.
+            max_stretch (float, optional): Defaults to MAX_STRETCH. Largest change in rate, as a fraction of normal speed.
+        """
+        self.clock = clock
+        self.tolerance = tolerance
+        self.max_stretch = max_stretch
+
+        # Current gesture time in seconds (None until the clock starts), and its rate relative to real time
+        self.position = None
+        self.rate = 1.0
+
+        self._correcting = False
+        self._updated_at = None
+
+        # Clock time and time.monotonic() time of the last sync, to estimate the clock's rate from
+        self._anchor = None
+
+    def update(self, now):
+        """Advances gesture time to a time, adjusting the rate to follow the clock.
+
+        Args:
+            now (float): The time.monotonic() time to advance to.
+
+        Returns:
+            float: Gesture time in seconds, or None if the clock hasn't reached the start of the gesture yet.
+        """
+        clock_time = self.clock.time()
+
+        if self.position is None:
+            if clock_time is None or clock_time < 0:
+                return None
+            self.position = clock_time
+            self._updated_at = now
+            self._anchor = (clock_time, now)
+            return self.position
+
+        self.position += self.rate * (now - self._updated_at)
+        self._updated_at = now
+
+        if clock_time is None:
+            # The reference stopped, carry on at normal speed
+            self.rate = 1.0
+            self._correcting = False
+            self._anchor = None
+            return self.position
+
+        drift = clock_time - self.position
+        if self._anchor is None or abs(drift) > RESYNC_ERROR:
+            self.position = clock_time
+            self.rate = 1.0
+            self._correcting = False
+            self._anchor = (clock_time, now)
+            return self.position
+
+        clock_rate = 1.0
+        anchor_time, anchor_now = self._anchor
+        if now - anchor_now > RATE_WINDOW:
+            clock_rate = (clock_time - anchor_time) / (now - anchor_now)
+
+        if abs(drift) > self.tolerance or (self._correcting and abs(drift) > self.tolerance / 2):
+            clock_rate += drift / CATCH_UP_TIME
+            self._correcting = True
+        else:
+            self._correcting = False
+        self.rate = float(np.clip(clock_rate, 1.0 - self.max_stretch, 1.0 + self.max_stretch))
+
+        return self.position
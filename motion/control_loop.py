@@ -0,0 +1,174 @@
+from utils.threads import ParkableThread
+from motion.metrics import motion_metrics
+import threading
+import time
+import os
+
+# Torque limit (in percent of max torque) sent alongside goal position and speed
+TORQUE_LIMIT = 100.0
+
+
+class ControlLoop(ParkableThread):
+    """A fixed rate control loop that owns all writes to Shimi's motors.
+
+    Every tick, each registered task (e.g. a Move) is given the chance to stage new goal positions and moving
+    speeds. All staged values are then sent to the motors in one multi-motor sync write, instead of each task
+    issuing its own serial transactions.
+    """
+
+    def __init__(self, shimi, freq=0.01, torque_limit=TORQUE_LIMIT):
+        """Initializes the control loop.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            freq (float, optional): Defaults to 0.01. The interval time in seconds between ticks of the loop.
+            torque_limit (float, optional): Defaults to TORQUE_LIMIT. Torque limit sent with every combined write.
+        """
+        self.shimi = shimi
+        self.freq = freq
+        self.torque_limit = torque_limit
+
+        self._tasks = []
+        self._lock = threading.Lock()
+
+        # Last commanded [goal position, moving speed] per motor, and motors with values to be sent
+        self._commanded = {}
+        self._dirty = set()
+
+        # Threads don't survive a fork, so remember which process owns the loop
+        self._pid = None
+
+        self.ticks = 0
+        self.overruns = 0
+        self.writes = 0
+
+        ParkableThread.__init__(self,
+                                 setup=self.setup,
+                                 target=self.run,
+                                 teardown=self.teardown)
+
+    @property
+    def active(self):
+        """bool: Whether the loop is running and able to service tasks from this process."""
+        return self.running and self._pid == os.getpid()
+
+    def setup(self):
+        self._pid = os.getpid()
+
+    def add_task(self, task):
+        """Registers a task to be ticked by the loop.
+
+        Args:
+            task (object): An object with a tick(now) method, returning False when it no longer needs ticking.
+        """
+        with self._lock:
+            if task not in self._tasks:
+                self._tasks.append(task)
+
+    def remove_task(self, task):
+        """Unregisters a task from the loop.
+
+        Args:
+            task (object): A task previously added with add_task.
+        """
+        with self._lock:
+            if task in self._tasks:
+                self._tasks.remove(task)
+
+    def set_goal_position(self, positions):
+        """Stages goal positions to be sent on the next tick.
+
+        Args:
+            positions (dict): Goal positions in degrees, keyed by motor ID.
+        """
+        with self._lock:
+            for motor, position in positions.items():
+                self._commanded.setdefault(motor, [None, None])[0] = position
+                self._dirty.add(motor)
+
+    def set_moving_speed(self, speeds):
+        """Stages moving speeds to be sent on the next tick.
+
+        Args:
+            speeds (dict): Moving speeds in degrees per second, keyed by motor ID.
+        """
+        with self._lock:
+            for motor, speed in speeds.items():
+                self._commanded.setdefault(motor, [None, None])[1] = speed
+                self._dirty.add(motor)
+
+    def run(self):
+        """Ticks all tasks and flushes their staged commands at a fixed rate."""
+        next_tick = time.monotonic()
+        while not self.should_stop():
+            if self.should_pause():
+                self.wait_to_resume()
+                next_tick = time.monotonic()
+                continue
+
+            now = time.monotonic()
+
+            with self._lock:
+                tasks = list(self._tasks)
+
+            for task in tasks:
+                try:
+                    keep = task.tick(now)
+                except Exception as e:
+                    print("Control loop task failed, removing it.", e)
+                    keep = False
+                    if hasattr(task, 'abort'):
+                        task.abort()
+                if not keep:
+                    self.remove_task(task)
+
+            self.flush()
+            self.ticks += 1
+
+            # Sleep until the next deadline, skipping ticks that were missed entirely
+            next_tick += self.freq
+            sleep_time = next_tick - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                self.overruns += 1
+                next_tick = time.monotonic()
+
+    def flush(self):
+        """Sends all staged goal positions and speeds to the motors in as few writes as possible."""
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty = self._dirty
+            self._dirty = set()
+            commands = {m: tuple(self._commanded[m]) for m in dirty}
+
+        controller = self.shimi.controller
+
+        # Motors with both a known goal and speed can be sent in one combined sync write
+        combined = {m: (goal, speed, self.torque_limit) for m, (goal, speed) in commands.items()
+                    if goal is not None and speed is not None}
+
+        telemetry = getattr(self.shimi, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.record_commands(time.monotonic(),
+                                      {m: goal for m, (goal, speed) in commands.items() if goal is not None},
+                                      {m: speed for m, (goal, speed) in commands.items() if speed is not None})
+        if combined:
+            sent = time.monotonic()
+            controller.set_goal_position_speed_load(combined)
+            rtt = time.monotonic() - sent
+            for m in combined:
+                motion_metrics.record('command_rtt', m, 'control_loop', rtt)
+            self.writes += 1
+
+        # Anything missing a value goes out on its own
+        speeds = {m: speed for m, (goal, speed) in commands.items() if goal is None and speed is not None}
+        if speeds:
+            controller.set_moving_speed(speeds)
+            self.writes += 1
+
+        goals = {m: goal for m, (goal, speed) in commands.items() if goal is not None and speed is None}
+        if goals:
+            controller.set_goal_position(goals)
+            self.writes += 1
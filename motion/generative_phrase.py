@@ -5,27 +5,34 @@ sys.path.insert(1, os.path.join(sys.path[0], '..'))
 from shimi import Shimi
 from posenet.posenet import PoseNet
 from utils.utils import Point, normalize_position, denormalize_position, denormalize_to_range, quantize, normalize_to_range
-from audio.midi_analysis import MidiAnalysis
-from motion.move import Move
+from audio.midi_cache import midi_analysis_cache
+from motion.phrase_plans import phrase_plan_store
+from motion.move import Move, Segment
+from motion.timeline import Timeline
 import pygame.mixer as mixer
 import random
 import time
-import numpy as np
 
 
 class GenerativePhrase:
     """Moves Shimi according to a MIDI phrase and music/movement research."""
 
-    def __init__(self, shimi=None, posenet=False):
+    def __init__(self, shimi=None, posenet=False, midi_cache=None, plan_store=phrase_plan_store, audio=True):
         """Initializes Shimi motor controller and PoseNet skeleton detection if needed.
             shimi (Shimi, optional): Defaults to None. An instance of the Shimi motor controller class.
             posenet (bool, optional): Defaults to False. Determines whether PoseNet skeleton detection should be used.
+            midi_cache (MidiAnalysisCache, optional): Defaults to None. Cache of MIDI file analyses, or None for the shared one.
+            plan_store (PhrasePlanStore, optional): Defaults to phrase_plan_store. Store of planned gestures to play from, or None to always plan.
+            audio (bool, optional): Defaults to True. Determines whether to initialize the mixer, which only planning doesn't need.
         """
         if shimi is not None:
             self.shimi = shimi
         else:
             self.shimi = Shimi()
 
+        self.midi_cache = midi_cache if midi_cache is not None else midi_analysis_cache
+        self.plan_store = plan_store
+
         self.posenet = None
         if posenet:
             self.posenet = PoseNet(
@@ -36,7 +43,8 @@ class GenerativePhrase:
         self.update_freq = 0.1
         self.last_update = time.time()
         self.last_pos = 0.5
-        mixer.init()
+        if audio:
+            mixer.init()
 
     def on_posenet_prediction(self, pose, fps):
         """Called when a PoseNet prediction is made.
@@ -75,7 +83,7 @@ class GenerativePhrase:
 
                     # Calculate speed based on how far to move
                     current_pos = normalize_position(self.shimi.neck_lr,
-                                                     self.shimi.controller.get_present_speed([self.shimi.neck_lr])[0])
+                                                     self.shimi.state.get_position(self.shimi.neck_lr))
                     vel = max(MIN_VEL + abs(current_pos - pos) *
                               MAX_VEL, MIN_VEL)
 
@@ -91,25 +99,24 @@ class GenerativePhrase:
 
                     self.last_update = time.time()
 
-    def generate(self, midi_path, valence, arousal, doa_value=None, wav_path=None, both=False, mute=False,
-                 random_movement=False, seed=None):
-        """Compute and actuate generative gesture for a given MIDI phrase and emotion.
+    def plan(self, midi_path, valence, arousal, doa_value=None, random_movement=False, seed=None, with_neck_lr=True):
+        """Computes the generative gesture for a given MIDI phrase and emotion, without actuating it.
+
+        The moves are planned lazily, a lookahead window ahead of where they're playing, as they play.
 
         Args:
             midi_path (str): Path to the MIDI file to generate gestures for.
             valence (float): Valence value in range [-1.0, 1.0].
             arousal (float): Arouse value in range [-1.0, 1.0].
             doa_value (float, optional): Defaults to None. The current measurement of input direction of arrival from Shimi's microphone array.
-            wav_path (str, optional): Defaults to None. The path to a WAV file to be played when gestures are actuated.
-            both (bool, optional): Defaults to False. Determines whether or not to play synthesized MIDI file with WAV file, if present.
-            mute (bool, optional): Defaults to False. Determines whether to not play audio, even if file paths are given.
             random_movement (bool, optional): Defaults to False. Determines whether or not to substitute random movement over the MIDI duration.
             seed (str, optional): Defaults to None. A seed for the RNG in order to make generation system deterministic.
-        """
-
-        t = time.time()
+            with_neck_lr (bool, optional): Defaults to True. Determines whether to plan neck left/right movement, which face tracking takes over when PoseNet is used.
 
-        self.midi_analysis = MidiAnalysis(midi_path)
+        Returns:
+            List[Move]: The moves of each motor, ready to start.
+        """
+        self.midi_analysis = self.midi_cache.analyze(midi_path)
         tempo = self.midi_analysis.get_tempo()
         length = self.midi_analysis.get_length()
 
@@ -132,24 +139,76 @@ class GenerativePhrase:
                 self.shimi.neck_lr, length, seed + int(seed / 11))
             moves.append(neck_lr)
         else:
+            # Planners draw from their own RNGs, as they're run lazily and in any order as the moves play
+            rng = random.Random(seed)
+
             foot = self.foot_movement(tempo, length, valence, arousal)
             moves.append(foot)
             torso = self.torso_movement(valence, arousal)
             moves.append(torso)
-            neck_ud = self.neck_ud_movement(length, valence, arousal, torso)
+            neck_ud = self.neck_ud_movement(tempo, length, valence, arousal, self.torso_segments(valence, arousal), rng)
             moves.append(neck_ud)
             phone = self.phone_movement_onsets(tempo, length, valence, arousal)
             moves.append(phone)
 
-            if not self.posenet:
+            if with_neck_lr:
                 if not doa_value:
                     neck_lr = self.neck_lr_movement(
                         tempo, length, valence, arousal)
                 else:
                     neck_lr = self.neck_lr_doa_movement(
-                        tempo, length, doa_value, valence, arousal)
+                        tempo, length, doa_value, valence, arousal,
+                        random.Random(None if seed is None else seed + int(seed / 11)))
                 moves.append(neck_lr)
 
+        return moves
+
+    def generate(self, midi_path, valence, arousal, doa_value=None, wav_path=None, both=False, mute=False,
+                 random_movement=False, seed=None):
+        """Compute and actuate generative gesture for a given MIDI phrase and emotion.
+
+        Seeded gestures not depending on direction of arrival are looked up in the plan store first, and otherwise
+        planned as they play and stored once played in full, so only unseen phrases, emotions and seeds pay the
+        planning cost, and even they start moving after their first movements are planned. Unseeded gestures are planned fresh
+        every time, so they keep varying.
+
+        Args:
+            midi_path (str): Path to the MIDI file to generate gestures for.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            doa_value (float, optional): Defaults to None. The current measurement of input direction of arrival from Shimi's microphone array.
+            wav_path (str, optional): Defaults to None. The path to a WAV file to be played when gestures are actuated.
+            both (bool, optional): Defaults to False. Determines whether or not to play synthesized MIDI file with WAV file, if present.
+            mute (bool, optional): Defaults to False. Determines whether to not play audio, even if file paths are given.
+            random_movement (bool, optional): Defaults to False. Determines whether or not to substitute random movement over the MIDI duration.
+            seed (str, optional): Defaults to None. A seed for the RNG in order to make generation system deterministic.
+        """
+
+        t = time.time()
+
+        # Plans that aren't stored yet are stored once played, so they don't have to be planned before moving
+        key = None
+        unplayed = []
+        if doa_value or seed is None or self.plan_store is None:
+            moves = self.plan(midi_path, valence, arousal, doa_value, random_movement, seed,
+                              with_neck_lr=not self.posenet)
+        else:
+            key = self.plan_store.key(midi_path, valence, arousal, seed, random_movement)
+            plan = self.plan_store.get(key)
+            if plan is None:
+                moves = self.plan(midi_path, valence, arousal, random_movement=random_movement, seed=seed)
+                for move in moves:
+                    move.record()
+            else:
+                key = None
+                self.midi_analysis = self.midi_cache.analyze(midi_path)
+                moves = [Move.from_dict(self.shimi, data) for data in plan]
+
+            # Face tracking moves the neck left and right instead
+            if self.posenet and not random_movement:
+                unplayed = [move for move in moves if move.motor == self.shimi.neck_lr]
+                moves = [move for move in moves if move.motor != self.shimi.neck_lr]
+
         # Load wav file if given
         if wav_path:
             mixer.music.load(wav_path)
@@ -178,7 +237,12 @@ class GenerativePhrase:
         self.face_track = False  # Turn off face tracking
         self.shimi.initial_position()
 
-    def neck_lr_doa_movement(self, tempo, length, doa_value, valence, arousal):
+        if key is not None:
+            plan = [move.recorded() for move in moves] + [move.to_dict() for move in unplayed]
+            if all(data is not None for data in plan):
+                self.plan_store.put(key, plan)
+
+    def neck_lr_doa_movement(self, tempo, length, doa_value, valence, arousal, rng=random):
         """Moves neck left and right according to where the microphone detects input.
 
         Args:
@@ -187,10 +251,28 @@ class GenerativePhrase:
             doa_value (float): The current measurement of input direction of arrival from Shimi's microphone array.
             valence (float): Valence value in range [-1.0, 1.0].
             arousal (float): Arouse value in range [-1.0, 1.0].
+            rng (random.Random, optional): Defaults to random. The random number generator to plan with.
 
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.neck_lr,
+                                  self.neck_lr_doa_segments(tempo, length, doa_value, valence, arousal, rng))
+
+    def neck_lr_doa_segments(self, tempo, length, doa_value, valence, arousal, rng=random):
+        """Plans neck_lr_doa_movement(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            doa_value (float): The current measurement of input direction of arrival from Shimi's microphone array.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            rng (random.Random, optional): Defaults to random. The random number generator to plan with.
+
+        Yields:
+            Segment: The next movement.
+        """
         # 120 left, 30 right
         normalized_doa = normalize_to_range(doa_value, 120, 30)
         normalized_arousal = (arousal + 1) / 2
@@ -198,27 +280,24 @@ class GenerativePhrase:
         print("::: DOA: %f, normalized: %f :::" % (doa_value, normalized_doa))
 
         move_dur = 2 * tempo * ((1 - normalized_arousal) + 0.25)
-        neck_lr_move = Move(self.shimi, self.shimi.neck_lr,
-                            normalized_doa, move_dur)
+        yield Segment(normalized_doa, move_dur)
 
         t = tempo
         delay = 0.0
-        while t < length:
-            rest = random.choice([True, False])
+        while length is None or t < length:
+            rest = rng.choice([True, False])
             if rest:  # Occasionally don't move, makes gesture seem more realistic
-                rest_dur = 2 * tempo * random.random()
+                rest_dur = 2 * tempo * rng.random()
                 delay += rest_dur
                 t += rest_dur
             else:  # Move to approximate DOA location with emotion-dependent speed
                 new_pos = normalized_doa + \
-                    (random.choice([-1, 1]) * ((1 + valence) / 2) * 0.3)
+                    (rng.choice([-1, 1]) * ((1 + valence) / 2) * 0.3)
                 move_dur = 2 * tempo * ((1 - normalized_arousal) + 0.25)
-                neck_lr_move.add_move(new_pos, move_dur, delay=delay)
+                yield Segment(new_pos, move_dur, delay=delay)
                 delay = 0.0
                 t += move_dur
 
-        return neck_lr_move
-
     def neck_lr_movement(self, tempo, length, valence, arousal):
         """Moves neck left and right according to music and movement research.
 
@@ -231,6 +310,21 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.neck_lr,
+                                  self.neck_lr_segments(tempo, length, valence, arousal))
+
+    def neck_lr_segments(self, tempo, length, valence, arousal):
+        """Plans neck_lr_movement(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+
+        Yields:
+            Segment: The next movement.
+        """
         # Toiviainen (2-beat rotation of upper torso)
         # Burger (High valence -> more rotation)
         # Sievers (High valence and high arousal -> smoothness)
@@ -255,34 +349,51 @@ class GenerativePhrase:
 
         # To keep deterministic for experiments, look in positive directions first
         initial_pos = 0.5 + (rot_range / 2)
-        neck_lr_move = Move(self.shimi, self.shimi.neck_lr,
-                            initial_pos, two_beat_dur / 2, vel_algo=vel_algo)
+        yield Segment(initial_pos, two_beat_dur / 2, vel_algo)
 
         t = two_beat_dur / 2
         dir = -1
 
-        while t < length:
+        while length is None or t < length:
             new_pos = 0.5 + ((dir * rot_range) / 2)
-            neck_lr_move.add_move(new_pos, two_beat_dur, delay=delay)
+            yield Segment(new_pos, two_beat_dur, delay=delay)
             t += (delay + two_beat_dur)
             dir = dir * -1
 
-        return neck_lr_move
-
-    def neck_ud_movement(self, length, valence, arousal, torso):
+    def neck_ud_movement(self, tempo, length, valence, arousal, torso_segments, rng=random):
         """Moves neck up and down according to music and movement research.
 
         Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
             length (float): Length of the MIDI file in seconds.
             valence (float): Valence value in range [-1.0, 1.0].
             arousal (float): Arouse value in range [-1.0, 1.0].
-            torso (Move): Sequenced movements of the torso.
+            torso_segments (Iterable[Segment]): Planned movements of the torso, e.g. from torso_segments().
+            rng (random.Random, optional): Defaults to random. The random number generator to plan with.
 
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.neck_ud,
+                                  self.neck_ud_segments(tempo, length, valence, arousal, torso_segments, rng))
+
+    def neck_ud_segments(self, tempo, length, valence, arousal, torso_segments, rng=random):
+        """Plans neck_ud_movement(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            torso_segments (Iterable[Segment]): Planned movements of the torso, pulled only as far as the neck is planned.
+            rng (random.Random, optional): Defaults to random. The random number generator to plan with.
+
+        Yields:
+            Segment: The next movement.
+        """
         # Note: ~0.2 of neck movement accounts for torso
         # looking straight: tor 0.7 neck 0.7, tor 0.8 neck 0.5, tor 0.9, neck 0.3
+        torso = Timeline(torso_segments)
 
         # Higher valence --> more tendency to look up (correct for leaning forward)
         adjusted_valence = (valence + 1) / 2
@@ -292,7 +403,7 @@ class GenerativePhrase:
         adjusted_arousal = (arousal + 1) / 2
 
         # Wait between half a beat and 2 beats to nod
-        half_beat = (self.midi_analysis.get_tempo() / 2)
+        half_beat = tempo / 2
         nod_wait = half_beat * denormalize_to_range(adjusted_arousal, 4, 1)
 
         # Start direction
@@ -320,47 +431,44 @@ class GenerativePhrase:
             t += half_beat
 
         pos = self.calculate_neck_ud_position(
-            t, torso, torso_offset, pos_range, direction)
-        neck_ud_move = Move(self.shimi, self.shimi.neck_ud,
-                            pos, t, vel_algo=vel_algo)
+            torso.position_at(t), torso_offset, pos_range, direction, rng)
+        yield Segment(pos, t, vel_algo)
         last_move = t
         direction = not direction
 
-        while t < length:
+        while length is None or t < length:
             if t < last_move + nod_wait:
                 t += half_beat
             else:
                 pos = self.calculate_neck_ud_position(
-                    t, torso, torso_offset, pos_range, direction)
-                neck_ud_move.add_move(pos, t - last_move)
+                    torso.position_at(t), torso_offset, pos_range, direction, rng)
+                # Times only increase, so torso movements that are over won't be asked about again
+                torso.forget_before(t)
+                yield Segment(pos, t - last_move)
                 last_move = t
                 direction = not direction
 
-        return neck_ud_move
-
-    def calculate_neck_ud_position(self, t, torso, torso_offset, pos_range, direction):
+    def calculate_neck_ud_position(self, torso_position, torso_offset, pos_range, direction, rng=random):
         """Helper to calculate neck position based on offset from torso position.
 
         Args:
-            t (float): Time in seconds at which to calculate neck position.
-            torso (Move): Sequenced movements of the torso.
+            torso_position (float): Normalized position of the torso at the time of the neck position.
             torso_offset (float): Amount neck position should be offset due to the torso.
             pos_range (float): Normalized absolute value of the range of motion for the neck.
             direction (bool): Determines the direction of movement.
+            rng (random.Random, optional): Defaults to random. The random number generator to vary the distance with.
 
         Returns:
             float: The position at which to set the neck.
         """
         # Torso offset to make it look up when bending forward
-        torso_timestamps = torso.get_timestamps()
-        torso_position = np.interp(t, torso_timestamps, torso.positions)
         offset = (1 - torso_position) * 10 * torso_offset
 
         half_range = pos_range / 2
 
         # Vary the distance by 20% of possible moving distance
         pos_in_range = half_range + \
-            (direction * (half_range - (0.2 * random.random() * half_range)))
+            (direction * (half_range - (0.2 * rng.random() * half_range)))
 
         return 1 - (offset + pos_in_range)
 
@@ -374,8 +482,25 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.torso, self.torso_segments(valence, arousal))
+
+    def torso_segments(self, valence, arousal, notes=None, shortest_note_length=None, longest_note_length=None):
+        """Plans torso_movement(), one movement at a time.
+
+        Args:
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            notes (Iterable[dict], optional): Defaults to None. Notes with norm_pitch, start and end, or None for the MIDI file's pitch contour.
+            shortest_note_length (float, optional): Defaults to None. Length in seconds of the shortest note, or None for the MIDI file's.
+            longest_note_length (float, optional): Defaults to None. Length in seconds of the longest note, or None for the MIDI file's.
+
+        Yields:
+            Segment: The next movement.
+        """
         # Sievers (Valence --> leaning, derived from generated music contour, which inherently features this)
-        contour_notes = self.midi_analysis.get_normalized_pitch_contour()
+        if notes is None:
+            notes = self.midi_analysis.get_normalized_pitch_contour()
+        contour_notes = iter(notes)
 
         # Higher valence --> more rapid matching to pitch contour
         smoothing_time = 0
@@ -383,8 +508,10 @@ class GenerativePhrase:
             valence = 0
 
         if valence >= 0:
-            shortest_note_length = self.midi_analysis.get_shortest_note_length()
-            longest_note_length = self.midi_analysis.get_longest_note_length()
+            if shortest_note_length is None:
+                shortest_note_length = self.midi_analysis.get_shortest_note_length()
+            if longest_note_length is None:
+                longest_note_length = self.midi_analysis.get_longest_note_length()
             difference = longest_note_length - shortest_note_length
             smoothing_time = shortest_note_length + \
                 ((1 - valence) * difference)
@@ -395,52 +522,34 @@ class GenerativePhrase:
         torso_min = 0.7 + (0.10 * (1.0 - adjusted_arousal))
         torso_max = 0.95 + (0.05 * adjusted_arousal)
 
-        # Keep track of timeline
-        t = 0
-
-        # Handle first note
-        first_note = contour_notes.pop(0)
-        initial_delay = 0
-
         # Find the first note to move to, per smoothing
-        while first_note["start"] < smoothing_time:
-            initial_delay += (first_note["end"] - t)
-            t = first_note["end"]
-            first_note = contour_notes.pop(0)
-
-        torso_move = Move(self.shimi, self.shimi.torso,
-                          denormalize_to_range(
-                              first_note["norm_pitch"], torso_min, torso_max),
-                          smoothing_time,
-                          initial_delay=first_note["start"] - smoothing_time,
-                          vel_algo='constant')
-
-        t = first_note["start"]
-        last_move = t
+        for first_note in contour_notes:
+            if first_note["start"] >= smoothing_time:
+                break
+        else:
+            return
 
-        delay = 0
-        while len(contour_notes) > 0:
-            note = contour_notes.pop(0)
+        # Each movement is held back until the next is planned, as the first and last are smoothed if there are several
+        pending = Segment(denormalize_to_range(first_note["norm_pitch"], torso_min, torso_max),
+                          smoothing_time, 'constant', delay=first_note["start"] - smoothing_time)
+        num_segments = 1
 
+        last_move = first_note["start"]
+        for note in contour_notes:
             if note["start"] > last_move + smoothing_time:
-                # Do move
-                torso_move.add_move(denormalize_to_range(note["norm_pitch"], torso_min, torso_max),
-                                    note["start"] - last_move,
-                                    vel_algo='constant',
-                                    delay=0)
+                if num_segments == 1:
+                    pending = pending._replace(vel_algo='linear_a')
+                yield pending
 
-                t = note["start"]
-                last_move = t
-                delay = 0
-            else:
-                delay += (note["start"] - t)
-                t = note["start"]
-
-        if len(torso_move.vel_algos) > 1:
-            torso_move.vel_algos[0] = 'linear_a'
-            torso_move.vel_algos[-1] = 'linear_d'
+                # Do move
+                pending = Segment(denormalize_to_range(note["norm_pitch"], torso_min, torso_max),
+                                  note["start"] - last_move, 'constant')
+                num_segments += 1
+                last_move = note["start"]
 
-        return torso_move
+        if num_segments > 1:
+            pending = pending._replace(vel_algo='linear_d')
+        yield pending
 
     def foot_movement(self, tempo, length, valence, arousal):
         """Moves foot up and down according to music and movement research.
@@ -454,6 +563,21 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.foot, self.foot_segments(tempo, length, valence, arousal),
+                                  freq=0.04)
+
+    def foot_segments(self, tempo, length, valence, arousal):
+        """Plans foot_movement(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+
+        Yields:
+            Segment: The next movement.
+        """
 
         # Calculate how often it taps its foot based on arousal
         quantized_arousals = [-1, -0.2, 0, 1]
@@ -478,33 +602,19 @@ class GenerativePhrase:
             move_wait = (beat_period / 2) - move_dur
 
         # Params for the linear accel/decel moves
-        up_change_time = 0.7
-        down_change_time = 0.4
+        up = Segment(move_dist, move_dur, 'linear_a', {'change_time': 0.7}, move_wait)
+        down = Segment(0.0, move_dur, 'linear_d', {'change_time': 0.4}, move_wait)
 
         # Wait half of a beat to start, so the ictus is on foot down
-        move = Move(self.shimi, self.shimi.foot, move_dist, move_dur,
-                    vel_algo='linear_a',
-                    vel_algo_kwarg={'change_time': up_change_time},
-                    freq=0.04, initial_delay=(beat_period / 2))
-        move.add_move(0.0, move_dur,
-                      vel_algo='linear_d',
-                      vel_algo_kwarg={'change_time': down_change_time},
-                      delay=move_wait)
+        yield up._replace(delay=beat_period / 2)
+        yield down
         t = 2 * (move_dur + move_wait)
 
-        while t < length:
-            move.add_move(move_dist, move_dur,
-                          vel_algo='linear_a',
-                          vel_algo_kwarg={'change_time': up_change_time},
-                          delay=move_wait)
-            move.add_move(0.0, move_dur,
-                          vel_algo='linear_d',
-                          vel_algo_kwarg={'change_time': down_change_time},
-                          delay=move_wait)
+        while length is None or t < length:
+            yield up
+            yield down
             t += 2 * (move_dur + move_wait)
 
-        return move
-
     def phone_movement(self, tempo, length, valence, arousal):
         """Twists the phone cradle DoF in a swaying motion according to music and movement research.
 
@@ -517,6 +627,20 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.phone, self.phone_segments(tempo, length, valence, arousal))
+
+    def phone_segments(self, tempo, length, valence, arousal):
+        """Plans phone_movement(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+
+        Yields:
+            Segment: The next movement.
+        """
         # Calculate tempo of "sway" based on arousal
         quantized_arousals = [-1, -0.5, 0, 1]
         quantized_arousal = quantize(arousal, quantized_arousals)
@@ -552,18 +676,14 @@ class GenerativePhrase:
         # dir = random.choice([True, False])
         dir = True  # To keep deterministic for experiments
 
-        move = Move(self.shimi, self.shimi.phone, 0.5 + (sway_width * [1, -1][int(dir)]), move_dur, vel_algo=vel_algo,
-                    initial_delay=sway_period - move_dur)
+        yield Segment(0.5 + (sway_width * [1, -1][int(dir)]), move_dur, vel_algo, delay=sway_period - move_dur)
 
         t = move_dur
-        while t < (length - sway_period):
+        while length is None or t < (length - sway_period):
             dir = not dir
-            move.add_move(0.5 + (sway_width * [1, -1][int(dir)]), move_dur, delay=sway_period - move_dur,
-                          vel_algo=vel_algo)
+            yield Segment(0.5 + (sway_width * [1, -1][int(dir)]), move_dur, vel_algo, delay=sway_period - move_dur)
             t += sway_period
 
-        return move
-
     def phone_movement_onsets(self, tempo, length, valence, arousal):
         """Twists the phone cradle DoF based on musical onsets and according to music and movement research.
 
@@ -576,8 +696,25 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
-        contour_notes = self.midi_analysis.get_normalized_pitch_contour()
-        onsets = [n["start"] for n in contour_notes]
+        return Move.from_segments(self.shimi, self.shimi.phone,
+                                  self.phone_onset_segments(tempo, length, valence, arousal))
+
+    def phone_onset_segments(self, tempo, length, valence, arousal, onsets=None):
+        """Plans phone_movement_onsets(), one movement at a time.
+
+        Args:
+            tempo (float): Tempo of the MIDI file in seconds per beat.
+            length (float): Length of the MIDI file in seconds, or None to keep moving indefinitely.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            onsets (Iterable[float], optional): Defaults to None. Note onset times in seconds, in ascending order, or None for the MIDI file's.
+
+        Yields:
+            Segment: The next movement.
+        """
+        if onsets is None:
+            onsets = (n["start"] for n in self.midi_analysis.get_normalized_pitch_contour())
+        onsets = iter(onsets)
 
         # first component of speed
         move_dist = denormalize_to_range((1 - abs(valence)), 0.2, 0.8)
@@ -607,22 +744,18 @@ class GenerativePhrase:
         else:
             vel_algo = 'constant'
 
-        move = Move(self.shimi, self.shimi.phone,
-                    start_pos, move_dur, vel_algo=vel_algo)
+        yield Segment(start_pos, move_dur, vel_algo)
         t = move_dur
-        while t < length:
-            while onsets and onsets[0] < t:
-                onsets.pop(0)
-            if onsets:
-                delay = onsets[0] - t
-                move.add_move(end_pos, move_dur, delay=delay)
-                move.add_move(start_pos, move_dur * 2)
-                t += delay + (3 * move_dur)
-                onsets.pop(0)
-            else:
-                t = length
+        while length is None or t < length:
+            # Next onset not already passed
+            onset = next((o for o in onsets if o >= t), None)
+            if onset is None:
+                return
 
-        return move
+            delay = onset - t
+            yield Segment(end_pos, move_dur, delay=delay)
+            yield Segment(start_pos, move_dur * 2)
+            t += delay + (3 * move_dur)
 
     def random_movement(self, motor, length, seed):
         """Generates a sequence of random movements for the length of the MIDI file for one motor.
@@ -635,26 +768,34 @@ class GenerativePhrase:
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, motor, self.random_segments(motor, length, random.Random(seed)))
 
-        random.seed(seed)
+    def random_segments(self, motor, length, rng):
+        """Plans random_movement(), one movement at a time.
 
+        Args:
+            motor (int): The motor ID to generate random movements for.
+            length (float): Length of the MIDI file in seconds. Random durations scale with it, so it can't be None.
+            rng (random.Random): The random number generator to plan with.
+
+        Yields:
+            Segment: The next movement.
+        """
         if motor == self.shimi.torso:
-            move_pos = 0.3 + (random.random() * 0.7)
+            move_pos = 0.3 + (rng.random() * 0.7)
         else:
-            move_pos = random.random()
-        move_dur = random.random() * (length / 2)
+            move_pos = rng.random()
+        move_dur = rng.random() * (length / 2)
 
         t = move_dur
 
-        rand_move = Move(self.shimi, motor, move_pos, move_dur)
+        yield Segment(move_pos, move_dur)
 
         while t < length:
             if motor == self.shimi.torso:
-                move_pos = 0.5 + (random.random() * 0.5)
+                move_pos = 0.5 + (rng.random() * 0.5)
             else:
-                move_pos = random.random()
-            move_dur = random.random() * (length / 2)
-            rand_move.add_move(move_pos, move_dur)
+                move_pos = rng.random()
+            move_dur = rng.random() * (length / 2)
+            yield Segment(move_pos, move_dur)
             t += move_dur
-
-        return rand_move
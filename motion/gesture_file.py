@@ -0,0 +1,188 @@
+import numpy as np
+import argparse
+import pickle
+import struct
+import json
+import zlib
+import os
+
+# File extension of gesture files
+GESTURE_EXTENSION = ".gesture"
+
+# Identifies gesture files and the version of their layout
+MAGIC = b"SHIMIGST"
+VERSION = 1
+
+# Magic, version and header length
+PREAMBLE = struct.Struct("<8sHI")
+
+# Column data starts on a multiple of this many bytes, so it can be memory-mapped efficiently
+ALIGNMENT = 64
+
+UNITS = {
+    "timestamps": "s",
+    "positions": "degrees",
+    "velocities": "degrees/s"
+}
+
+
+class Gesture:
+    """The contents of a gesture file: timestamps, and positions and velocities per motor."""
+
+    def __init__(self, motors, timestamps, positions, velocities, duration=None, freq=None):
+        """Initializes the gesture data.
+
+        Args:
+            motors (List[int]): Motor IDs, in the column order of positions and velocities.
+            timestamps (np.ndarray): Time in seconds of each sample, shaped (n_samples,).
+            positions (np.ndarray): Positions in degrees, shaped (n_samples, n_motors).
+            velocities (np.ndarray): Velocities in degrees per second, shaped (n_samples, n_motors).
+            duration (float, optional): Defaults to None. Length of the gesture in seconds, or None for the last timestamp.
+            freq (float, optional): Defaults to None. The interval time in seconds between samples if they are evenly spaced, otherwise None.
+        """
+        self.motors = list(motors)
+        self.timestamps = timestamps
+        self.positions = positions
+        self.velocities = velocities
+        self.duration = float(duration) if duration is not None else float(timestamps[-1]) if len(timestamps) else 0.0
+        self.freq = freq
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def save_gesture(path, gesture, compress=False):
+    """Writes a gesture file.
+
+    The file is a preamble (magic, version, header length), a JSON header describing the gesture, and then the
+    timestamp, position and velocity columns as contiguous float32 arrays, zlib compressed if compress is set.
+
+    Args:
+        path (str): The path of the file to write.
+        gesture (Gesture): The gesture to save.
+        compress (bool, optional): Defaults to False. Compresses the columns, which makes files smaller but means they can't be memory-mapped.
+    """
+    num_samples = len(gesture)
+    num_motors = len(gesture.motors)
+
+    # One column per row: timestamps, then a position column and a velocity column per motor
+    columns = np.empty((1 + 2 * num_motors, num_samples), dtype=np.float32)
+    columns[0] = gesture.timestamps
+    if num_motors:
+        columns[1:1 + num_motors] = np.asarray(gesture.positions, dtype=np.float32).reshape(num_samples, num_motors).T
+        columns[1 + num_motors:] = np.asarray(gesture.velocities, dtype=np.float32).reshape(num_samples, num_motors).T
+
+    data = columns.tobytes()
+    if compress:
+        data = zlib.compress(data)
+
+    header = {
+        "motors": gesture.motors,
+        "num_samples": num_samples,
+        "duration": gesture.duration,
+        "freq": gesture.freq,
+        "units": UNITS,
+        "dtype": "float32",
+        "compression": "zlib" if compress else None
+    }
+    header = json.dumps(header).encode("utf-8")
+
+    # Pad the header so the columns are aligned
+    unpadded = PREAMBLE.size + len(header)
+    header += b" " * (-unpadded % ALIGNMENT)
+
+    with open(path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(data)
+
+
+def read_header(path):
+    """Reads the header of a gesture file.
+
+    Args:
+        path (str): The path of the gesture file.
+
+    Returns:
+        Tuple[dict, int]: The header, and the offset in bytes of the column data.
+    """
+    with open(path, "rb") as f:
+        magic, version, header_length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a gesture file." % path)
+        if version > VERSION:
+            raise ValueError("%s is gesture file version %d, only up to %d is supported." % (path, version, VERSION))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    return header, PREAMBLE.size + header_length
+
+
+def load_gesture(path, mmap=True):
+    """Loads a gesture file.
+
+    Args:
+        path (str): The path of the gesture file.
+        mmap (bool, optional): Defaults to True. Memory-maps uncompressed files instead of reading them, so loading is near-instant and only the parts used are read.
+
+    Returns:
+        Gesture: The loaded gesture. Its arrays are read-only if memory-mapped.
+    """
+    header, offset = read_header(path)
+    num_samples = header["num_samples"]
+    num_motors = len(header["motors"])
+    shape = (1 + 2 * num_motors, num_samples)
+
+    if header["compression"] == "zlib":
+        with open(path, "rb") as f:
+            f.seek(offset)
+            columns = np.frombuffer(zlib.decompress(f.read()), dtype=np.float32).reshape(shape)
+    elif mmap and num_samples:
+        columns = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=shape)
+    else:
+        # Seek rather than passing offset, which older numpy's fromfile doesn't take
+        with open(path, "rb") as f:
+            f.seek(offset)
+            columns = np.fromfile(f, dtype=np.float32, count=shape[0] * shape[1]).reshape(shape)
+
+    # Views into the columns, with samples along the first axis like the rest of the codebase
+    return Gesture(header["motors"], columns[0], columns[1:1 + num_motors].T, columns[1 + num_motors:].T,
+                   duration=header["duration"], freq=header["freq"])
+
+
+def convert_pickle(pickle_path, gesture_path=None, compress=False):
+    """Converts a gesture pickled by older versions of Recorder.save to a gesture file.
+
+    Args:
+        pickle_path (str): The path of the .p file.
+        gesture_path (str, optional): Defaults to None. The path of the gesture file to write, or None for pickle_path with GESTURE_EXTENSION.
+        compress (bool, optional): Defaults to False. Compresses the columns.
+
+    Returns:
+        str: The path of the gesture file written.
+    """
+    if gesture_path is None:
+        gesture_path = os.path.splitext(pickle_path)[0] + GESTURE_EXTENSION
+
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    num_motors = len(data["motors"])
+    gesture = Gesture(data["motors"],
+                      np.array(data["timestamps"], dtype=np.float64),
+                      np.array(data["positions"], dtype=np.float64).reshape(-1, num_motors),
+                      np.array(data["velocities"], dtype=np.float64).reshape(-1, num_motors),
+                      duration=data["duration"])
+    save_gesture(gesture_path, gesture, compress)
+
+    return gesture_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Converts pickled gestures (.p) to gesture files.")
+    parser.add_argument('paths', nargs='+', type=str, help="The .p files to convert.")
+    parser.add_argument('-c', '--compress', action='store_true', help="Compress the converted files.")
+    args = parser.parse_args()
+
+    for pickle_path in args.paths:
+        gesture_path = convert_pickle(pickle_path, compress=args.compress)
+        print("%s -> %s (%d -> %d bytes)" % (pickle_path, gesture_path, os.path.getsize(pickle_path),
+                                             os.path.getsize(gesture_path)))
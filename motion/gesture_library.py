@@ -0,0 +1,155 @@
+from config.definitions import PLAN_CACHE_DIR
+from motion.gesture_file import GESTURE_EXTENSION
+from motion.playback import plan_playback, load_playback_plan
+from motion.playback_worker import worker_for
+from motion.keyframes import reduce_plan
+from motion.recorder import load_recorder
+from collections import OrderedDict
+import threading
+import hashlib
+import os
+
+# Bump when plan_playback changes what it computes, so plans cached by older versions aren't used
+PLAN_VERSION = 2
+
+
+class GestureLibrary:
+    """Loads saved gestures once and keeps their playback plans, so repeat playbacks start right away.
+
+    Plans are keyed on a hash of the gesture file's content, kept in a bounded in-memory LRU cache, and saved to an
+    on-disk cache that survives restarts. Plans can be reduced to keyframes, trading a bounded positional error for far
+    fewer writes to the motors during playback.
+    """
+
+    def __init__(self, path="saved_gestures", cache_dir=PLAN_CACHE_DIR, capacity=8, keyframe_tolerance=None):
+        """Initializes the caches.
+
+        Args:
+            path (str, optional): Defaults to "saved_gestures". The path to the directory of the gesture files.
+            cache_dir (str, optional): Defaults to PLAN_CACHE_DIR. Directory of the on-disk plan cache, or None to only cache in memory.
+            capacity (int, optional): Defaults to 8. The most plans to keep in memory.
+            keyframe_tolerance (float, optional): Defaults to None. If set, plans are reduced to keyframes within this many degrees of the smoothed gesture. See reduce_plan().
+        """
+        self.path = path
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.keyframe_tolerance = keyframe_tolerance
+
+        self._plans = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def gesture_path(self, name):
+        """Gets the path of a gesture's file, preferring gesture files over pickles.
+
+        Args:
+            name (str): Name of the gesture, with no extension.
+
+        Returns:
+            str: The path of the file.
+        """
+        gesture_path = os.path.join(self.path, str(name) + GESTURE_EXTENSION)
+        if os.path.exists(gesture_path):
+            return gesture_path
+        return os.path.join(self.path, str(name) + ".p")
+
+    def key(self, name):
+        """Gets the cache key of a gesture, hashing its file only if it has changed since it was last hashed.
+
+        Args:
+            name (str): Name of the gesture, with no extension.
+
+        Returns:
+            str: Hex digest of the file content, plan version and keyframe tolerance.
+        """
+        path = self.gesture_path(name)
+        stat = os.stat(path)
+        stamp = (path, stat.st_mtime, stat.st_size)
+
+        key = self._hashes.get(stamp)
+        if key is None:
+            digest = hashlib.sha1(str(PLAN_VERSION).encode("utf-8"))
+            if self.keyframe_tolerance is not None:
+                digest.update(("keyframes:%r" % self.keyframe_tolerance).encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+            key = digest.hexdigest()
+            self._hashes[stamp] = key
+
+        return key
+
+    def plan(self, name):
+        """Gets the playback plan of a gesture, from memory, disk, or by computing it.
+
+        Args:
+            name (str): Name of the gesture, with no extension.
+
+        Returns:
+            PlaybackPlan: The gesture's playback plan.
+        """
+        key = self.key(name)
+
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        cache_path = os.path.join(self.cache_dir, key + ".npz") if self.cache_dir else None
+        plan = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                plan = load_playback_plan(cache_path)
+            except Exception as e:
+                print("Unable to read cached plan for %s, recomputing it." % name, e)
+
+        if plan is None:
+            r = load_recorder(None, name, path=self.path)
+            plan = plan_playback(r.motors, r.duration, r.timestamps, r.positions, r.velocities)
+            if self.keyframe_tolerance is not None:
+                plan = reduce_plan(plan, self.keyframe_tolerance)
+
+            if cache_path:
+                try:
+                    if not os.path.exists(self.cache_dir):
+                        os.makedirs(self.cache_dir)
+                    plan.save(cache_path)
+                except Exception as e:
+                    print("Unable to cache plan for %s." % name, e)
+
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.capacity:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def play(self, shimi, name, callback=None, start_time=None, clock=None):
+        """Plays back a gesture on the Shimi's playback worker, blocking until it finishes.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            name (str): Name of the gesture, with no extension.
+            callback (function, optional): Defaults to None. A function called when movement starts.
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start movement (after moving to the initial position), or None to start as soon as possible.
+            clock (Clock, optional): Defaults to None. A clock to keep the gesture in sync with, e.g. a MixerClock for the song it goes with. See execute_playback().
+
+        Returns:
+            Playback: The finished playback.
+        """
+        worker = worker_for(shimi)
+        handle = worker.load(self.plan(name), handle=self.key(name))
+        playback = worker.play(handle, start_time, callback, clock)
+        playback.wait()
+        return playback
+
+    def clear(self):
+        """Empties the in-memory cache. The on-disk cache is kept."""
+        with self._lock:
+            self._plans.clear()
+
+
+# Shared so gestures are only planned once per process
+gesture_library = GestureLibrary()
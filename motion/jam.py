@@ -3,7 +3,8 @@ import sys
 
 sys.path.insert(1, os.path.join(sys.path[0], '..'))
 from pypot.utils import StoppableThread
-from motion.move import Move
+from motion.move import Move, Segment
+from motion.trajectory import BLEND_TIME
 import random
 from utils.utils import denormalize_to_range, quantize
 
@@ -11,20 +12,23 @@ from utils.utils import denormalize_to_range, quantize
 class Jam(StoppableThread):
     """General \"music appreciation\" movement for moving with audio."""
 
-    def __init__(self, shimi, tempo, length, energy=None):
-        """Generates sequenced movements.
+    def __init__(self, shimi, tempo, length, energy=None, blend=BLEND_TIME):
+        """Sets up the movements, which are planned as they play.
 
         Args:
             shimi (Shimi): An instance of the Shimi motor controller class.
             tempo (float): Tempo of the audio file in seconds per beat.
-            length (float): Length of the audio file in seconds.
+            length (float): Length of the audio file in seconds, or None to jam until stopped.
             energy (float, optional): Defaults to None. A normalized measure of energy in the audio file.
+            blend (float, optional): Defaults to BLEND_TIME. Time in seconds to blend from whatever Shimi is doing into the gesture.
         """
 
         self.shimi = shimi
         self.tempo = tempo
         self.length = length
         self.energy = energy
+        self.blend = blend
+        self.player = None
 
         self.foot = self.foot_move(self.energy)
         self.torso = self.torso_move(self.energy)
@@ -37,25 +41,42 @@ class Jam(StoppableThread):
                                  teardown=self.teardown)
 
     def run(self):
-        """Starts the gesture."""
-        self.foot.start()
-        self.torso.start()
-        self.neck_ud.start()
-        self.neck_lr.start()
-
-        self.foot.join()
-        self.torso.join()
-        self.neck_ud.join()
-        self.neck_lr.join()
-
-        self.shimi.initial_position()
-
-    def stop(self):
-        """Stops the gesture."""
-        self.foot.stop()
-        self.torso.stop()
-        self.neck_ud.stop()
-        self.neck_lr.stop()
+        """Starts the gesture, preempting any gesture Shimi is already performing."""
+        moves = [self.foot, self.torso, self.neck_ud, self.neck_lr]
+
+        if self.length is None:
+            # Endless movements can't be compiled into a trajectory, so play them as they're planned
+            for move in moves:
+                move.start()
+            for move in moves:
+                move.join()
+            return
+
+        self.player = self.shimi.perform(moves, blend=self.blend)
+        if self.should_stop():
+            self.player.stop()
+
+        self.player.join()
+
+        # Only go back to the initial position if the gesture played out, not if it was stopped or replaced
+        if not self.should_stop() and not self.player.preempted:
+            self.shimi.initial_position()
+
+    def stop(self, wait=True):
+        """Stops the gesture, leaving Shimi where it is so the next gesture can blend in from there.
+
+        Args:
+            wait (bool, optional): Defaults to True. Whether to wait for the gesture to stop.
+        """
+        # Signal the stop before the player ends, so run() knows not to go back to the initial position
+        if self.started:
+            self._running.clear()
+        if self.player is not None:
+            self.player.stop()
+        if self.length is None:
+            for move in [self.foot, self.torso, self.neck_ud, self.neck_lr]:
+                move.stop(wait)
+        StoppableThread.stop(self, wait)
 
     def foot_move(self, energy):
         """Moves the foot up and down according to the tempo and potentially energy of the audio file.
@@ -66,6 +87,17 @@ class Jam(StoppableThread):
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.foot, self.foot_segments(energy))
+
+    def foot_segments(self, energy):
+        """Plans foot_move(), one movement at a time.
+
+        Args:
+            energy (float): A normalized measure of energy in the audio file.
+
+        Yields:
+            Segment: The next movement.
+        """
         foot_dir = True
 
         tap_period = self.tempo
@@ -77,21 +109,19 @@ class Jam(StoppableThread):
             tap_period = tap_periods[quantized_energies.index(
                 quantized_energy)]
 
-        foot = Move(self.shimi, self.shimi.foot, 1.0, tap_period / 2)
+        yield Segment(1.0, tap_period / 2)
 
         t = tap_period / 2
 
-        while t < self.length:
+        while self.length is None or t < self.length:
             if foot_dir:
-                foot.add_move(0.0, tap_period / 2)
+                yield Segment(0.0, tap_period / 2)
             else:
-                foot.add_move(1.0, tap_period / 2)
+                yield Segment(1.0, tap_period / 2)
 
             t += tap_period / 2
             foot_dir = not foot_dir
 
-        return foot
-
     def torso_move(self, energy):
         """Moves the torso forward and back according to the tempo and potentially energy of the audio file.
 
@@ -101,6 +131,17 @@ class Jam(StoppableThread):
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.torso, self.torso_segments(energy))
+
+    def torso_segments(self, energy):
+        """Plans torso_move(), one movement at a time.
+
+        Args:
+            energy (float): A normalized measure of energy in the audio file.
+
+        Yields:
+            Segment: The next movement.
+        """
         torso_dir = True
 
         torso_period = self.tempo * 8
@@ -114,23 +155,20 @@ class Jam(StoppableThread):
 
         randomness = 0.1 * random.random() * random.choice([-1, 1])
 
-        torso = Move(self.shimi, self.shimi.torso, 0.7
-                     + randomness, torso_period / 2, vel_algo='linear_ad')
+        yield Segment(0.7 + randomness, torso_period / 2, 'linear_ad')
 
         t = torso_period / 2
 
-        while t < self.length:
+        while self.length is None or t < self.length:
             randomness = 0.1 * random.random() * random.choice([-1, 1])
             if torso_dir:
-                torso.add_move(0.9 + randomness, torso_period / 2)
+                yield Segment(0.9 + randomness, torso_period / 2)
             else:
-                torso.add_move(0.7 + randomness, torso_period / 2)
+                yield Segment(0.7 + randomness, torso_period / 2)
 
             t += torso_period / 2
             torso_dir = not torso_dir
 
-        return torso
-
     def neck_ud_move(self, energy):
         """Moves the neck up and down according to the tempo and potentially energy of the audio file.
 
@@ -140,6 +178,17 @@ class Jam(StoppableThread):
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.neck_ud, self.neck_ud_segments(energy))
+
+    def neck_ud_segments(self, energy):
+        """Plans neck_ud_move(), one movement at a time.
+
+        Args:
+            energy (float): A normalized measure of energy in the audio file.
+
+        Yields:
+            Segment: The next movement.
+        """
         num_move = 3
         num_dont_move = 2
 
@@ -153,19 +202,19 @@ class Jam(StoppableThread):
                 quantized_energy)]
 
         neck_ud_dir = True
-        neck_ud = Move(self.shimi, self.shimi.neck_ud, 0.2, self.tempo / 2)
+        yield Segment(0.2, self.tempo / 2)
 
         t = self.tempo / 2
         delay = 0.0
 
-        while t < self.length:
+        while self.length is None or t < self.length:
             should_move = random.choice([True for _ in range(
                 num_move)] + [False for _ in range(num_dont_move)])
             if should_move:
                 if neck_ud_dir:
-                    neck_ud.add_move(0.9, self.tempo / 2, delay=delay)
+                    yield Segment(0.9, self.tempo / 2, delay=delay)
                 else:
-                    neck_ud.add_move(0.2, self.tempo / 2, delay=delay)
+                    yield Segment(0.2, self.tempo / 2, delay=delay)
                 neck_ud_dir = not neck_ud_dir
                 delay = 0.0
             else:
@@ -173,8 +222,6 @@ class Jam(StoppableThread):
 
             t += self.tempo / 2
 
-        return neck_ud
-
     def neck_lr_move(self, energy):
         """Moves the neck left and right according to the tempo and potentially energy of the audio file.
 
@@ -184,6 +231,17 @@ class Jam(StoppableThread):
         Returns:
             Move: A Thread of properly sequenced movements.
         """
+        return Move.from_segments(self.shimi, self.shimi.neck_lr, self.neck_lr_segments(energy))
+
+    def neck_lr_segments(self, energy):
+        """Plans neck_lr_move(), one movement at a time.
+
+        Args:
+            energy (float): A normalized measure of energy in the audio file.
+
+        Yields:
+            Segment: The next movement.
+        """
         delay_max = 3  # Maximum delay in seconds
 
         if energy is not None:
@@ -193,19 +251,15 @@ class Jam(StoppableThread):
             delay_max = delay_maxes[quantized_energies.index(quantized_energy)]
 
         t = 0.5 + random.random()
-        neck_lr = Move(self.shimi, self.shimi.neck_lr,
-                       0.5, t, vel_algo='linear_ad')
+        yield Segment(0.5, t, 'linear_ad')
 
         delay = 0.0
         prev_pos = 0.5
 
-        while t < self.length:
+        while self.length is None or t < self.length:
             delay += self.tempo * delay_max * random.random()
             pos = denormalize_to_range(random.random(), 0.1, 0.9)
             dur = (1 / abs(prev_pos - pos)) * self.tempo * 0.5
             dur = min(self.tempo * 8, dur)
-            neck_lr.add_move(pos, dur, delay=delay)
+            yield Segment(pos, dur, delay=delay)
             t += delay + dur
-
-        return neck_lr
-
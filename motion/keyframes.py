@@ -0,0 +1,85 @@
+from motion.playback import PlaybackPlan, INTERP_FREQ
+from motion.trajectory import MIN_SPEED
+import numpy as np
+
+# Default largest distance in degrees a reduced gesture may stray from the original
+KEYFRAME_TOLERANCE = 0.5
+
+
+def simplify(times, positions, tolerance=KEYFRAME_TOLERANCE):
+    """Picks the keyframes of a curve with the Ramer-Douglas-Peucker algorithm.
+
+    Moving in a straight line from each keyframe to the next stays within tolerance of every original position at its
+    time. The first and last positions are always keyframes.
+
+    Args:
+        times (np.ndarray): Time of each position, in ascending order.
+        positions (np.ndarray): Positions in degrees.
+        tolerance (float, optional): Defaults to KEYFRAME_TOLERANCE. Largest distance in degrees allowed from the original positions.
+
+    Returns:
+        np.ndarray: Indices of the keyframes, in ascending order.
+    """
+    num_positions = len(positions)
+    if num_positions < 3:
+        return np.arange(num_positions)
+
+    keep = np.zeros(num_positions, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Segments still to check, as (first, last) indices
+    segments = [(0, num_positions - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+
+        span = times[last] - times[first]
+        fraction = (times[first + 1:last] - times[first]) / span if span > 0 else 0.0
+        line = positions[first] + fraction * (positions[last] - positions[first])
+        errors = np.abs(positions[first + 1:last] - line)
+
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            segments.append((first, split))
+            segments.append((split, last))
+
+    return np.flatnonzero(keep)
+
+
+def reduce_plan(plan, tolerance=KEYFRAME_TOLERANCE):
+    """Reduces a playback plan to keyframes, so commands are only sent when a motor starts a new segment.
+
+    Each motor's smoothed positions are simplified separately. At each keyframe, the motor is sent the next keyframe
+    as its goal, at the constant speed that reaches it by that keyframe's time, and nothing is sent in between.
+
+    Args:
+        plan (PlaybackPlan): A plan from plan_playback().
+        tolerance (float, optional): Defaults to KEYFRAME_TOLERANCE. Largest distance in degrees allowed from the smoothed positions.
+
+    Returns:
+        PlaybackPlan: The reduced plan, with speeds and goals NaN on ticks without commands.
+    """
+    timestamps = np.asarray(plan.timestamps, dtype=np.float64)
+    pos_matrix = np.asarray(plan.pos_matrix, dtype=np.float64)
+
+    speeds = np.full(plan.speeds.shape, np.nan)
+    goals = np.full(plan.goals.shape, np.nan)
+    last_tick = len(plan) - 1
+    for i, _ in enumerate(plan.motors):
+        keyframes = simplify(timestamps, pos_matrix[:, i], tolerance)
+        times = timestamps[keyframes]
+        positions = pos_matrix[keyframes, i]
+
+        # Segment from each keyframe to the next, starting on the keyframe's tick
+        durations = np.maximum(np.diff(times), INTERP_FREQ)
+        segment_speeds = np.maximum(np.abs(np.diff(positions)) / durations, MIN_SPEED)
+        ticks = np.clip(np.rint(times[:-1] / INTERP_FREQ).astype(int), 0, last_tick)
+
+        # Keyframes closer together than a tick share it, the later one wins like it would have replaced the goal
+        speeds[ticks, i] = segment_speeds
+        goals[ticks, i] = positions[1:]
+
+    return PlaybackPlan(plan.motors, plan.duration, plan.timestamps, plan.pos_matrix, plan.vel_matrix, speeds, goals)
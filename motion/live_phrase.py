@@ -0,0 +1,433 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+from motion.metrics import Histogram
+from motion.motor_state import ANY_AGE
+from utils.utils import denormalize_position, denormalize_to_range, quantize
+from collections import deque
+from queue import Queue, Empty, Full
+import numpy as np
+import threading
+import argparse
+import time
+
+# Default worst-case time in seconds from a note arriving to the motion it causes being sent; later notes are skipped
+LIVE_LATENCY = 0.05
+
+# Number of recent inter-onset intervals tempo is estimated from
+TEMPO_WINDOW = 8
+
+# Number of recent notes the pitch range is estimated from
+PITCH_WINDOW = 16
+
+# Onsets closer together than this many seconds are one onset, e.g. the notes of a chord
+CHORD_TIME = 0.05
+
+# Range of beat lengths in seconds inter-onset intervals are folded into (200 down to 50 BPM)
+MIN_BEAT = 0.3
+MAX_BEAT = 1.2
+
+# MIDI status bytes, without the channel
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+
+
+class TempoEstimator:
+    """Estimates tempo from the intervals between the most recent note onsets."""
+
+    def __init__(self, window=TEMPO_WINDOW, default=0.5):
+        """Initializes the estimator.
+
+        Args:
+            window (int, optional): Defaults to TEMPO_WINDOW. Number of recent inter-onset intervals to estimate from.
+            default (float, optional): Defaults to 0.5. Tempo in seconds per beat before there are any intervals.
+        """
+        self.default = default
+        self.intervals = deque(maxlen=window)
+        self.last_onset = None
+
+    def onset(self, t):
+        """Adds a note onset.
+
+        Args:
+            t (float): Time of the onset in seconds.
+
+        Returns:
+            bool: Whether it's a new onset, rather than part of the previous one.
+        """
+        if self.last_onset is not None:
+            interval = t - self.last_onset
+            if interval < CHORD_TIME:
+                return False
+            # Pauses longer than a bar aren't a tempo
+            if interval <= 4 * MAX_BEAT:
+                self.intervals.append(interval)
+        self.last_onset = t
+        return True
+
+    @property
+    def beat(self):
+        """float: Tempo in seconds per beat, the median interval folded into MIN_BEAT to MAX_BEAT."""
+        if not self.intervals:
+            return self.default
+
+        beat = float(np.median(self.intervals))
+        while beat < MIN_BEAT:
+            beat *= 2
+        while beat > MAX_BEAT:
+            beat /= 2
+        return beat
+
+    @property
+    def shortest(self):
+        """float: The shortest recent interval in seconds, or half the beat if there are none."""
+        return min(self.intervals) if self.intervals else self.default / 2
+
+    @property
+    def longest(self):
+        """float: The longest recent interval in seconds, or the beat if there are none."""
+        return max(self.intervals) if self.intervals else self.default
+
+
+class PitchRangeEstimator:
+    """Estimates the range of the melody from the most recent notes."""
+
+    def __init__(self, window=PITCH_WINDOW):
+        """Initializes the estimator.
+
+        Args:
+            window (int, optional): Defaults to PITCH_WINDOW. Number of recent notes to estimate from.
+        """
+        self.pitches = deque(maxlen=window)
+
+    def add(self, pitch):
+        """Adds a note.
+
+        Args:
+            pitch (int): MIDI pitch of the note.
+        """
+        self.pitches.append(pitch)
+
+    def normalize(self, pitch):
+        """Normalizes a pitch to the recent range.
+
+        Args:
+            pitch (int): MIDI pitch.
+
+        Returns:
+            float: The pitch in range [0.0, 1.0] of the recent range, or 0.5 if there isn't one yet.
+        """
+        if not self.pitches:
+            return 0.5
+        lowest, highest = min(self.pitches), max(self.pitches)
+        if highest == lowest:
+            return 0.5
+        return float(np.clip((pitch - lowest) / (highest - lowest), 0.0, 1.0))
+
+
+class LivePhrase:
+    """Moves Shimi along with MIDI notes as they are played, like GenerativePhrase does for MIDI files.
+
+    Notes lean the torso toward their pitch in the recent range, onsets flick the phone, and the foot taps along at the
+    estimated tempo. Notes are queued by on_midi() and reacted to on the next tick of Shimi's control loop (or of this
+    phrase's own thread without one), so their motion goes out in that tick's write. Notes still waiting after the
+    latency bound are counted as late and only update the estimators, so any motion is sent within the bound of its
+    note arriving. Notes arriving with the queue full are counted as dropped.
+    """
+
+    def __init__(self, shimi, valence=0.0, arousal=0.0, latency=LIVE_LATENCY, queue_size=64, freq=0.005, foot=True):
+        """Initializes the phrase.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            valence (float, optional): Defaults to 0.0. Valence value in range [-1.0, 1.0].
+            arousal (float, optional): Defaults to 0.0. Arousal value in range [-1.0, 1.0].
+            latency (float, optional): Defaults to LIVE_LATENCY. Worst-case time in seconds from a note arriving to its motion being sent.
+            queue_size (int, optional): Defaults to 64. The most notes waiting to be reacted to.
+            freq (float, optional): Defaults to 0.005. The interval time in seconds between ticks, without a control loop.
+            foot (bool, optional): Defaults to True. Determines whether the foot taps along.
+        """
+        self.shimi = shimi
+        self.valence = valence
+        self.arousal = arousal
+        self.latency = latency
+        self.freq = freq
+        self.foot = foot
+
+        self.tempo = TempoEstimator()
+        self.pitch_range = PitchRangeEstimator()
+
+        self._events = Queue(maxsize=queue_size)
+        self._note_starts = {}
+        self._running = threading.Event()
+        self._thread = None
+        self._loop = None
+
+        # Motion state, in time.monotonic() time
+        self._last_torso = None
+        self._phone_return = None
+        self._phone_free = 0.0
+        self._foot_up = False
+        self._next_tap = None
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clears the counts of notes and the latency histogram."""
+        self.received = 0
+        self.dropped = 0
+        self.late = 0
+        self.reacted = 0
+        self.latencies = Histogram(0.0, 4 * self.latency)
+
+    def stats(self):
+        """Summarizes how notes were handled.
+
+        Returns:
+            dict: Numbers of notes received, dropped (queue full), late (past the latency bound) and reacted to, and a summary of the reaction latencies in seconds.
+        """
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "late": self.late,
+            "reacted": self.reacted,
+            "latency": self.latencies.summary()
+        }
+
+    def on_midi(self, status, note, velocity, device_id=None):
+        """Queues a MIDI message, e.g. as a PyoClient MIDI handler. Safe to call from any thread.
+
+        Args:
+            status (int): MIDI status byte.
+            note (int): MIDI pitch.
+            velocity (int): Note velocity. Note ons with velocity 0 are note offs.
+            device_id (int, optional): Defaults to None. The device the message came from.
+        """
+        kind = status & 0xF0
+        if kind not in (NOTE_ON, NOTE_OFF):
+            return
+
+        self.received += 1
+        try:
+            self._events.put_nowait((time.monotonic(), kind == NOTE_ON and velocity > 0, note))
+        except Full:
+            self.dropped += 1
+
+    def start(self):
+        """Starts reacting to notes, on Shimi's control loop if it is running, otherwise on a thread."""
+        if self._running.is_set():
+            return
+        self._running.set()
+
+        loop = getattr(self.shimi, 'control_loop', None)
+        if loop is not None and loop.active:
+            if loop.freq >= self.latency:
+                print("WARNING, control loop interval %.3fs doesn't fit the %.3fs latency bound." %
+                      (loop.freq, self.latency))
+            self._loop = loop
+            loop.add_task(self)
+        else:
+            self._loop = None
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stops reacting to notes, holding the motors where they are."""
+        if not self._running.is_set():
+            return
+        self._running.clear()
+
+        if self._loop is not None:
+            self._loop.remove_task(self)
+        elif self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        motors = [self.shimi.torso, self.shimi.phone] + ([self.shimi.foot] if self.foot else [])
+        self._write({m: self.shimi.state.get_position(m) for m in motors}, {})
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self._running.is_set():
+            self.tick(time.monotonic())
+            next_tick += self.freq
+            time.sleep(max(next_tick - time.monotonic(), 0))
+
+    def abort(self):
+        """Called by the control loop if ticking this phrase fails."""
+        self._running.clear()
+
+    def tick(self, now):
+        """Reacts to the notes that arrived since the last tick. Motor state is only read from the cache.
+
+        Args:
+            now (float): The current time, from time.monotonic().
+
+        Returns:
+            bool: Whether the phrase needs to keep being ticked.
+        """
+        if not self._running.is_set():
+            return False
+
+        goals = {}
+        speeds = {}
+
+        while True:
+            try:
+                arrived, note_on, pitch = self._events.get_nowait()
+            except Empty:
+                break
+
+            if not note_on:
+                self._note_starts.pop(pitch, None)
+                continue
+
+            self._note_starts[pitch] = arrived
+            self.pitch_range.add(pitch)
+            new_onset = self.tempo.onset(arrived)
+
+            if now - arrived > self.latency:
+                self.late += 1
+                continue
+
+            self._react_torso(arrived, pitch, goals, speeds)
+            if new_onset:
+                self._react_phone(now, goals, speeds)
+            self.reacted += 1
+            self.latencies.record(now - arrived)
+
+        self._update_phone(now, goals, speeds)
+        if self.foot:
+            self._update_foot(now, goals, speeds)
+
+        if goals or speeds:
+            self._write(goals, speeds)
+        return True
+
+    def _react_torso(self, arrived, pitch, goals, speeds):
+        """Leans the torso toward a note's pitch, like GenerativePhrase.torso_segments()."""
+        # Higher valence --> more rapid matching to pitch contour
+        valence = max(self.valence, 0)
+        shortest, longest = self.tempo.shortest, self.tempo.longest
+        smoothing_time = shortest + ((1 - valence) * (longest - shortest))
+
+        if self._last_torso is not None and arrived <= self._last_torso + smoothing_time:
+            return
+        self._last_torso = arrived
+
+        # Higher arousal --> larger range of motion
+        adjusted_arousal = (self.arousal + 1) / 2
+        torso_min = 0.7 + (0.10 * (1.0 - adjusted_arousal))
+        torso_max = 0.95 + (0.05 * adjusted_arousal)
+
+        motor = self.shimi.torso
+        goal = denormalize_position(motor, denormalize_to_range(self.pitch_range.normalize(pitch),
+                                                                torso_min, torso_max))
+        goals[motor] = goal
+        speeds[motor] = max(abs(goal - self.shimi.state.get_position(motor, ANY_AGE)) / max(smoothing_time, 0.1), 1)
+
+    def _phone_move(self):
+        """Gets the start and end positions in degrees, and the duration, of the phone's onset flick."""
+        move_dist = denormalize_to_range((1 - abs(self.valence)), 0.2, 0.8)
+
+        quantized_arousals = [-1, -0.6, 0.6, 1]
+        quantized_arousal = quantize(self.arousal, quantized_arousals)
+        beat = self.tempo.beat
+        move_dur = [2 * beat, 1 * beat, 0.5 * beat, 0.25 * beat][quantized_arousals.index(quantized_arousal)]
+
+        side_dist = (1 - move_dist) / 2
+        motor = self.shimi.phone
+        return denormalize_position(motor, side_dist), denormalize_position(motor, 1 - side_dist), move_dur
+
+    def _react_phone(self, now, goals, speeds):
+        """Flicks the phone on an onset, unless it's still flicking, like GenerativePhrase.phone_onset_segments()."""
+        if now < self._phone_free:
+            return
+
+        start_pos, end_pos, move_dur = self._phone_move()
+        goals[self.shimi.phone] = end_pos
+        speeds[self.shimi.phone] = abs(end_pos - start_pos) / move_dur
+        self._phone_return = now + move_dur
+        self._phone_free = now + 3 * move_dur
+
+    def _update_phone(self, now, goals, speeds):
+        """Brings the phone back once its flick is done."""
+        if self._phone_return is None or now < self._phone_return:
+            return
+
+        start_pos, end_pos, move_dur = self._phone_move()
+        goals[self.shimi.phone] = start_pos
+        speeds[self.shimi.phone] = abs(end_pos - start_pos) / (2 * move_dur)
+        self._phone_return = None
+
+    def _update_foot(self, now, goals, speeds):
+        """Taps the foot at a subdivision of the estimated tempo, like GenerativePhrase.foot_segments()."""
+        if self.tempo.last_onset is None:
+            return
+
+        # Higher arousal --> smaller subdivision of tapping
+        quantized_arousals = [-1, -0.2, 0, 1]
+        quantized_arousal = quantize(self.arousal, quantized_arousals)
+        beat = self.tempo.beat
+        half_period = [4 * beat, 2 * beat, beat, 0.5 * beat][quantized_arousals.index(quantized_arousal)] / 2
+
+        if self._next_tap is None or now - self._next_tap > half_period:
+            # Start (or after falling behind, restart) in time with the last onset
+            self._next_tap = self.tempo.last_onset
+            while self._next_tap < now:
+                self._next_tap += half_period
+            self._foot_up = False
+            return
+
+        if now < self._next_tap:
+            return
+
+        motor = self.shimi.foot
+        self._foot_up = not self._foot_up
+        goal = denormalize_position(motor, 1.0 if self._foot_up else 0.0)
+        goals[motor] = goal
+        speeds[motor] = max(abs(goal - self.shimi.state.get_position(motor, ANY_AGE)) / half_period, 1)
+        self._next_tap += half_period
+
+    def _write(self, goals, speeds):
+        """Sends commands through the control loop if running on it, otherwise straight to the motors."""
+        if self._loop is not None:
+            self._loop.set_moving_speed(speeds)
+            self._loop.set_goal_position(goals)
+            return
+
+        if speeds:
+            self.shimi.controller.set_moving_speed(speeds)
+        if goals:
+            self.shimi.controller.set_goal_position(goals)
+        telemetry = getattr(self.shimi, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.record_commands(time.monotonic(), goals, speeds)
+
+
+if __name__ == '__main__':
+    from shimi import Shimi
+    from audio.pyo_client import PyoClient
+
+    parser = argparse.ArgumentParser(description="Moves Shimi along with a MIDI keyboard.")
+    parser.add_argument('-v', '--valence', type=float, default=0.0, help="Valence in range [-1, 1].")
+    parser.add_argument('-a', '--arousal', type=float, default=0.0, help="Arousal in range [-1, 1].")
+    parser.add_argument('-l', '--latency', type=float, default=LIVE_LATENCY,
+                        help="Worst-case note to motion latency in seconds.")
+    args = parser.parse_args()
+
+    shimi = Shimi()
+    phrase = LivePhrase(shimi, args.valence, args.arousal, args.latency)
+    client = PyoClient(audio=False, midi=True, prompt_for_midi_devices=True)
+    client.midi_handlers.append(phrase.on_midi)
+    phrase.start()
+
+    try:
+        while True:
+            time.sleep(5)
+            print(phrase.stats())
+    except KeyboardInterrupt:
+        phrase.stop()
+        shimi.initial_position()
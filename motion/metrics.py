@@ -0,0 +1,212 @@
+from config.definitions import *
+import numpy as np
+import json
+import time
+
+# Histogram ranges in seconds for each metric
+METRIC_RANGES = {
+    'start_latency': (0.0, 0.5),  # Scheduled start of a movement to its goal being sent
+    'tick_jitter': (-0.1, 0.1),  # Actual minus planned time between velocity updates
+    'command_rtt': (0.0, 0.05),  # Time a write to the motors takes
+    'duration_error': (-0.5, 0.5)  # Actual minus planned duration of a movement
+}
+
+# Velocity algorithms, plus 'control_loop' for loop writes and 'playback' for execute_playback() ticks
+VEL_ALGOS = ['constant', 'linear_ad', 'linear_a', 'linear_d', 'control_loop', 'playback']
+
+
+class Histogram:
+    """A fixed-bin histogram with preallocated counts, cheap enough to record from motion loops."""
+
+    def __init__(self, low, high, bins=250):
+        """Allocates the bins.
+
+        Args:
+            low (float): The lowest value with its own bin.
+            high (float): The highest value with its own bin.
+            bins (int, optional): Defaults to 250. Number of bins between low and high.
+        """
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+
+        # First and last bins count values below low and above high
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Clears all recorded values."""
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def record(self, value):
+        """Records a value.
+
+        Args:
+            value (float): The value to record.
+        """
+        if value < self.low:
+            index = 0
+        elif value >= self.high:
+            index = self.bins + 1
+        else:
+            index = int((value - self.low) / self.width) + 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Adds the values recorded in another histogram with the same bins to this one.
+
+        Args:
+            other (Histogram): The histogram to merge in.
+        """
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q):
+        """Estimates a percentile from the bins.
+
+        Args:
+            q (float): Percentile in range [0, 100].
+
+        Returns:
+            float: The upper edge of the bin containing the percentile, or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.count))
+        if index == 0:
+            return self.min
+        elif index >= self.bins + 1:
+            return self.max
+        return min(self.low + index * self.width, self.max)
+
+    def summary(self):
+        """Summarizes recorded values.
+
+        Returns:
+            dict: Count, mean, min, max, 50th/95th/99th percentiles and how many values fell outside the bins.
+        """
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "out_of_range": int(self.counts[0] + self.counts[-1])
+        }
+
+
+class MotionMetrics:
+    """Timing histograms for motion, per metric, motor and velocity algorithm."""
+
+    def __init__(self, motors=None, bins=250, enabled=True):
+        """Preallocates a histogram for every metric, motor and velocity algorithm.
+
+        Args:
+            motors (List[int], optional): Defaults to None. Motor IDs to track, or None for all of Shimi's motors.
+            bins (int, optional): Defaults to 250. Number of bins per histogram.
+            enabled (bool, optional): Defaults to True. Determines whether record() does anything.
+        """
+        if motors is None:
+            motors = [TORSO, NECK_LR, NECK_UD, PHONE, FOOT]
+        self.enabled = enabled
+        self.histograms = {}
+        for metric, (low, high) in METRIC_RANGES.items():
+            for motor in motors:
+                for vel_algo in VEL_ALGOS:
+                    self.histograms[(metric, motor, vel_algo)] = Histogram(low, high, bins)
+
+    def record(self, metric, motor, vel_algo, value):
+        """Records a timing value.
+
+        Args:
+            metric (str): One of the keys of METRIC_RANGES.
+            motor (int): The motor ID the value is for.
+            vel_algo (str): The velocity algorithm of the movement, 'control_loop' for loop writes or 'playback' for playback ticks.
+            value (float): The value in seconds.
+        """
+        if not self.enabled:
+            return
+
+        histogram = self.histograms.get((metric, motor, vel_algo))
+        if histogram is not None:
+            histogram.record(value)
+
+    def query(self, metric, motor=None, vel_algo=None):
+        """Gets recorded values of a metric, merged over any motors or velocity algorithms not specified.
+
+        Args:
+            metric (str): One of the keys of METRIC_RANGES.
+            motor (int, optional): Defaults to None. A motor ID, or None for all motors.
+            vel_algo (str, optional): Defaults to None. A velocity algorithm, or None for all of them.
+
+        Returns:
+            Histogram: The merged histogram.
+        """
+        low, high = METRIC_RANGES[metric]
+        merged = None
+        for (m, mo, va), histogram in self.histograms.items():
+            if m == metric and (motor is None or mo == motor) and (vel_algo is None or va == vel_algo):
+                if merged is None:
+                    merged = Histogram(low, high, histogram.bins)
+                merged.merge(histogram)
+        return merged
+
+    def summary(self):
+        """Summarizes every histogram with recorded values.
+
+        Returns:
+            List[dict]: A summary per metric, motor and velocity algorithm.
+        """
+        rows = []
+        for (metric, motor, vel_algo), histogram in sorted(self.histograms.items(), key=lambda i: str(i[0])):
+            if histogram.count:
+                row = {"metric": metric, "motor": motor, "vel_algo": vel_algo}
+                row.update(histogram.summary())
+                rows.append(row)
+        return rows
+
+    def dump(self, path=None):
+        """Prints a summary of all metrics, or writes it as JSON.
+
+        Args:
+            path (str, optional): Defaults to None. A file path to write JSON to, or None to print.
+        """
+        rows = self.summary()
+        if path:
+            with open(path, "w") as f:
+                json.dump({"time": time.time(), "metrics": rows}, f, indent=2)
+            return
+
+        for row in rows:
+            print("%s motor %s %s: n=%d mean=%.4f p95=%.4f max=%.4f" %
+                  (row["metric"], row["motor"], row["vel_algo"], row["count"], row["mean"], row["p95"], row["max"]))
+
+    def reset(self):
+        """Clears all histograms."""
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+
+# Shared by all Moves and the control loop
+motion_metrics = MotionMetrics()
@@ -0,0 +1,129 @@
+from utils.threads import ParkableThread
+import time
+import os
+
+# Indices into the (position, speed, load) tuples of the state table
+POSITION = 0
+SPEED = 1
+LOAD = 2
+
+# A max_age accepting any cached value, for readers that mustn't wait on the bus, like control loop tasks
+ANY_AGE = float('inf')
+
+
+class MotorState(ParkableThread):
+    """Mirrors the position, speed and load of Shimi's motors by bulk reading them in the background.
+
+    The state table is a single (timestamp, values) tuple that is replaced wholesale on every poll, so readers
+    never need a lock and always see values read at the same instant. While the poller is paused, reads are served
+    from the table however old it is, so they stay off the bus.
+    """
+
+    def __init__(self, shimi, motors, freq=0.02, max_age=0.1):
+        """Initializes the state mirror.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            motors (List[int]): Motor IDs to poll.
+            freq (float, optional): Defaults to 0.02. The interval time in seconds between bulk reads.
+            max_age (float, optional): Defaults to 0.1. The oldest, in seconds, a cached value can be before it is read directly from the motors instead. None accepts any cached value.
+        """
+        self.shimi = shimi
+        self.motors = list(motors)
+        self.freq = freq
+        self.max_age = max_age
+
+        self._table = None
+        self._pid = None
+
+        self.reads = 0
+
+        ParkableThread.__init__(self,
+                                 setup=self.setup,
+                                 target=self.run,
+                                 teardown=self.teardown)
+
+    @property
+    def active(self):
+        """bool: Whether the poller is running and updating the table for this process."""
+        return self.running and self._pid == os.getpid()
+
+    def setup(self):
+        self._pid = os.getpid()
+
+    def run(self):
+        """Bulk reads all motors at a fixed rate into the state table."""
+        next_poll = time.monotonic()
+        while not self.should_stop():
+            if self.should_pause():
+                self.wait_to_resume()
+                next_poll = time.monotonic()
+                continue
+
+            try:
+                self.poll()
+            except Exception as e:
+                print("Unable to read motor state.", e)
+
+            next_poll += self.freq
+            sleep_time = next_poll - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_poll = time.monotonic()
+
+    def poll(self):
+        """Reads position, speed and load of all motors in one transaction and publishes them to the table."""
+        values = self.shimi.controller.get_present_position_speed_load(self.motors)
+        self._table = (time.monotonic(), dict(zip(self.motors, values)))
+        self.reads += 1
+
+        telemetry = getattr(self.shimi, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.record_state(*self._table)
+
+    @property
+    def timestamp(self):
+        """float: The time.monotonic() time of the latest bulk read, or None if there hasn't been one."""
+        table = self._table
+        return table[0] if table is not None else None
+
+    def get(self, motor, max_age=None):
+        """Gets the position, speed and load of a motor.
+
+        Args:
+            motor (int): The motor ID.
+            max_age (float, optional): Defaults to self.max_age. The oldest a cached value can be, in seconds, before the motor is read directly.
+
+        Returns:
+            tuple: Position in degrees, speed in degrees per second and load in percent of max torque.
+        """
+        if max_age is None:
+            max_age = self.max_age
+
+        table = self._table
+        if self.active and self.paused:
+            # Someone else has the bus, e.g. a playback worker, so don't contend with it for a fresh read
+            if table is None or motor not in table[1]:
+                self._resume.wait()
+                table = self._table
+            if table is not None and motor in table[1]:
+                return table[1][motor]
+        elif self.active and table is not None and motor in table[1]:
+            if max_age is None or time.monotonic() - table[0] <= max_age:
+                return table[1][motor]
+
+        # Nothing fresh enough cached, so pay for the round trip
+        return self.shimi.controller.get_present_position_speed_load([motor])[0]
+
+    def get_position(self, motor, max_age=None):
+        """Gets the position of a motor in degrees. See get() for arguments."""
+        return self.get(motor, max_age)[POSITION]
+
+    def get_speed(self, motor, max_age=None):
+        """Gets the speed of a motor in degrees per second. See get() for arguments."""
+        return self.get(motor, max_age)[SPEED]
+
+    def get_load(self, motor, max_age=None):
+        """Gets the load of a motor in percent of max torque. See get() for arguments."""
+        return self.get(motor, max_age)[LOAD]
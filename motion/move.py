@@ -1,15 +1,68 @@
 from pypot.utils import StoppableThread
+from utils.threads import WaitableThread
 from config.definitions import STARTING_POSITIONS
 from utils.utils import normalize_position
+from motion.metrics import motion_metrics
+from motion.timeline import Timeline
+from motion.motor_state import ANY_AGE
 import time
 import utils.utils as utils
 import random
-from numpy import cumsum
+import threading
+from collections import namedtuple
 
 VERBOSE = False
 
+# Default time in seconds of movements a Move keeps queued ahead of the one playing, when pulling them from a source
+LOOKAHEAD = 2.0
+
+# One movement of a Move, as yielded by a planner. A vel_algo of None (or an empty vel_algo_kwarg) keeps the previous one.
+Segment = namedtuple("Segment", ["position", "duration", "vel_algo", "vel_algo_kwarg", "delay"])
+Segment.__new__.__defaults__ = (None, {}, 0.0)
+
+
+def profile_velocity(vel_algo, t, duration, distance, **kwargs):
+    """Computes the velocity of a move at a point in time, per its velocity algorithm.
+
+    Args:
+        vel_algo (str): The velocity algorithm of the move, one of 'constant', 'linear_ad', 'linear_a' or 'linear_d'.
+        t (float): Time in seconds since the move began.
+        duration (float): The duration the movement should last.
+        distance (float): The absolute distance in degrees the movement covers.
+        **kwargs (dict): Keyword arguments for the velocity algorithm, as described in Move.
+
+    Returns:
+        float: The velocity in degrees per second at time t.
+    """
+    if duration <= 0:
+        return 0.0
+
+    if vel_algo == 'linear_ad':
+        min_vel = kwargs.get("min_vel", 20)
+        max_vel = 2 * ((distance / 2 - (min_vel * (duration / 2))) / ((duration / 2) ** 2))
+        rel_pos = abs(duration / 2 - t)
+        return (max_vel * (2 * (1.0 - rel_pos / duration) - 1)) + min_vel
+    elif vel_algo == 'linear_a':
+        change_time = kwargs.get("change_time", 0.5)
+        max_vel = distance / (change_time * duration)
+        if t < (change_time * duration):
+            vel = max_vel * (t / (change_time * duration))
+        else:
+            vel = max_vel
+        return max(vel, 1)
+    elif vel_algo == 'linear_d':
+        change_time = kwargs.get("change_time", 0.5)
+        max_vel = distance / ((1 - change_time) * duration)
+        if t < (change_time * duration):
+            vel = max_vel
+        else:
+            vel = max_vel * ((duration - t) / ((1 - change_time) * duration))
+        return max(vel, 1)
+    else:
+        return distance / duration
 
-class Move(StoppableThread):
+
+class Move(WaitableThread):
     def __init__(self, shimi, motor, position, duration, vel_algo='constant', vel_algo_kwarg={}, initial_delay=0.0,
                  freq=0.1,
                  stop_check_freq=0.005,
@@ -29,7 +82,7 @@ class Move(StoppableThread):
             vel_algo_kwarg (dict, optional): Defaults to {}. Keyword arguments if needed for a velocity algorithm.
             initial_delay (float, optional): Defaults to 0.0. The time to wait before starting the move when the thread is started.
             freq (float, optional): Defaults to 0.1. The interval time in seconds a new velocity value should be sent to the motors.
-            stop_check_freq (float, optional): Defaults to 0.005. The time in seconds of how often the StoppableThread should check if it should be stopped.
+            stop_check_freq (float, optional): Defaults to 0.005. Unused, kept for compatibility; Moves now wake up as soon as they are stopped.
             normalized_positions (bool, optional): Defaults to True. Determines whether pos should be interpeted as a value [0.0, 1.0] or as an angle in degrees.
         """
         self.shimi = shimi
@@ -56,21 +109,213 @@ class Move(StoppableThread):
 
         self.delays = [initial_delay]
 
+        # Iterator of further Segments, pulled lookahead seconds ahead of the playing movement
+        self.source = None
+        self.lookahead = LOOKAHEAD
+
+        # Every movement queued since record(), and whether the source has been pulled from completely since
+        self.history = None
+        self._source_done = False
+
         self.freq = freq
         self.stop_check_freq = stop_check_freq
         self.norm = normalized_positions
 
-        StoppableThread.__init__(self,
-                                 setup=self.setup,
-                                 target=self.run,
-                                 teardown=self.teardown)
+        # State for running on Shimi's control loop instead of a thread
+        self._loop = None
+        self._done = threading.Event()
+        self._phase = None
+        self._paused_at = None
+
+        # Timing statistics
+        self._scheduled_start = None
+        self._last_speed_time = None
+
+        WaitableThread.__init__(self,
+                                setup=self.setup,
+                                target=self.run,
+                                teardown=self.teardown)
+
+    def start(self):
+        """Starts the move on Shimi's control loop if it is running, otherwise on its own thread."""
+        # Don't fight the initial homing moves if Shimi is still starting up
+        if hasattr(self.shimi, 'wait_until_ready'):
+            self.shimi.wait_until_ready()
+
+        loop = getattr(self.shimi, 'control_loop', None)
+        if loop is not None and loop.active:
+            if self._loop is not None and self.running:
+                self.stop()
+
+            self._loop = loop
+            self._phase = None
+            self._paused_at = None
+            self._segment_end = time.monotonic()
+            self._done.clear()
+
+            self._started.set()
+            self._resume.set()
+            self._running.set()
+
+            loop.add_task(self)
+        else:
+            self._loop = None
+            WaitableThread.start(self)
+
+    def stop(self, wait=True):
+        """Stops the move, holding the motor at its current position.
+
+        Args:
+            wait (bool, optional): Defaults to True. Whether to wait for the move to finish stopping.
+        """
+        if self._loop is None:
+            WaitableThread.stop(self, wait)
+            return
+
+        if self.started:
+            self._running.clear()
+            self._resume.set()
+
+            # The loop can't wait on its own tasks
+            if wait and threading.current_thread() is not getattr(self._loop, '_thread', None):
+                while not self._done.wait(0.1):
+                    if not self._loop.active:
+                        break
+
+            self._started.clear()
+            self._resume.clear()
+
+    def join(self):
+        """Waits for the move to finish."""
+        if self._loop is None:
+            WaitableThread.join(self)
+            return
+
+        while not self._done.wait(0.1):
+            if not self._loop.active:
+                break
+
+    def tick(self, now):
+        """Advances the move by one tick of Shimi's control loop.
+
+        Args:
+            now (float): The current time of the control loop, from time.monotonic().
+
+        Returns:
+            bool: Whether the move needs to keep being ticked.
+        """
+        if self.should_stop():
+            if self._phase == 'move':
+                self.stop_move()
+            self._finish()
+            return False
+
+        if self.should_pause():
+            if self._paused_at is None:
+                self._paused_at = now
+                if self._phase == 'move':
+                    self._pause_speed = abs(self.shimi.state.get_speed(self.motor, ANY_AGE))
+                    self._loop.set_goal_position(
+                        {self.motor: self.shimi.state.get_position(self.motor, ANY_AGE)})
+            return True
+
+        if self._paused_at is not None:
+            # Shift the schedule by the time spent paused, and continue to goal
+            paused = now - self._paused_at
+            self._segment_end += paused
+            if self._phase is not None:
+                self._phase_end += paused
+            if self._phase == 'move':
+                self._phase_start += paused
+                self._next_update += paused
+                self._loop.set_goal_position({self.motor: self.pos})
+                self._loop.set_moving_speed({self.motor: self._pause_speed})
+            self._paused_at = None
+
+        while True:
+            if self._phase is None:
+                self.fill(self.lookahead)
+                if len(self.positions) == 0:
+                    self._finish()
+                    return False
+
+                # Delays are relative to the scheduled end of the previous movement, so ticks don't drift
+                self._phase = 'delay'
+                self._phase_end = self._segment_end + self.delays.pop(0)
+
+            if self._phase == 'delay':
+                if now < self._phase_end:
+                    return True
+                self._begin_segment(self._phase_end, now)
+
+            if now >= self._phase_end:
+                self.time_stats(self._wall_start, self.dur)
+                self._segment_end = self._phase_end
+                self._phase = None
+                continue
+
+            # Update velocity at freq
+            if self.vel_algo != 'constant' and now >= self._next_update:
+                vel = profile_velocity(self.vel_algo, now - self._phase_start, self.dur, self._distance,
+                                       **self.vel_algo_kwarg)
+                self._loop.set_moving_speed({self.motor: vel})
+                motion_metrics.record('tick_jitter', self.motor, self.vel_algo,
+                                      (now - self._last_speed_time) - self.freq)
+                self._last_speed_time = now
+                self._next_update += self.freq
+
+            return True
+
+    def _begin_segment(self, start, now):
+        """Pops the next queued movement and stages its goal position and initial velocity on the control loop.
+
+        Args:
+            start (float): The scheduled start time of the movement.
+            now (float): The current time of the control loop.
+        """
+        self.pos = self.positions.pop(0)
+        self.dur = self.durations.pop(0)
+
+        if len(self.vel_algos) > 0:
+            self.vel_algo = self.vel_algos.pop(0)
+        if len(self.vel_algo_kwargs) > 0:
+            self.vel_algo_kwarg = self.vel_algo_kwargs.pop(0)
+
+        # Runs on the control loop, so take whatever is cached rather than holding up every task on a read
+        starting_position = self.shimi.state.get_position(self.motor, ANY_AGE)
+
+        # Convert normalized position to degrees
+        if self.norm:
+            self.pos = utils.denormalize_position(self.motor, self.pos)
+
+        self._distance = abs(self.pos - starting_position)
+        self._phase = 'move'
+        self._phase_start = start
+        self._phase_end = start + self.dur
+        self._next_update = now + self.freq
+        self._last_speed_time = now
+        self._wall_start = time.time() - (now - start)
+        motion_metrics.record('start_latency', self.motor, self.vel_algo, now - start)
+
+        vel = profile_velocity(self.vel_algo, now - start, self.dur, self._distance, **self.vel_algo_kwarg)
+        self._loop.set_moving_speed({self.motor: vel})
+        self._loop.set_goal_position({self.motor: self.pos})
+
+    def _finish(self):
+        """Marks a move running on the control loop as finished."""
+        self._phase = None
+        self._running.clear()
+        self._done.set()
+
+    def abort(self):
+        """Called by the control loop if ticking this move fails."""
+        self._finish()
 
     def constant_vel(self, **kwargs):
         """Executes a Move with constant velocity."""
         start_time = time.time()
 
-        starting_position = self.shimi.controller.get_present_position([self.motor])[
-            0]
+        starting_position = self.shimi.state.get_position(self.motor)
 
         # Convert normalized position to degrees
         if self.norm:
@@ -80,18 +325,16 @@ class Move(StoppableThread):
         vel = abs(self.pos - starting_position) / self.dur
 
         # Set the velocity
-        self.shimi.controller.set_moving_speed({self.motor: vel})
+        self._send_speed(vel)
 
         # Set the goal position
-        self.shimi.controller.set_goal_position({self.motor: self.pos})
+        self._send_goal(self.pos)
 
-        # Sleep off the duration, allowing for stopping
-        while time.time() <= start_time + self.dur and not self.should_stop():
-            time.sleep(self.stop_check_freq)
+        # Sleep off the duration, waking up immediately if stopped
+        self.sleep(start_time + self.dur - time.time())
 
-        if VERBOSE:
-            # Print time statistics
-            self.time_stats(start_time, self.dur)
+        # Record time statistics
+        self.time_stats(start_time, self.dur)
 
         # If this was stopped, stop movement at current position
         if self.should_stop():
@@ -109,8 +352,7 @@ class Move(StoppableThread):
         if "min_vel" in kwargs:
             min_vel = kwargs["min_vel"]
 
-        starting_position = self.shimi.controller.get_present_position([self.motor])[
-            0]
+        starting_position = self.shimi.state.get_position(self.motor)
 
         # Convert normalized position to degrees
         if self.norm:
@@ -122,8 +364,8 @@ class Move(StoppableThread):
                 (self.dur / 2) ** 2))
 
         # Set the goal position and initial speed of min_vel
-        self.shimi.controller.set_moving_speed({self.motor: min_vel})
-        self.shimi.controller.set_goal_position({self.motor: self.pos})
+        self._send_speed(min_vel)
+        self._send_goal(self.pos)
 
         # Adjust duration based off of this computation time
         #   Getting the current position can take a non-trivial amount of time
@@ -141,14 +383,13 @@ class Move(StoppableThread):
 
             # Calculate the velocity at this point in time, relative to the max_vel at position/2
             vel = (max_vel * (2 * (1.0 - rel_pos / self.dur) - 1)) + min_vel
-            self.shimi.controller.set_moving_speed({self.motor: vel})
+            self._send_speed(vel)
 
             # Wait to update again
-            time.sleep(self.freq)
+            self.sleep(self.freq)
 
-        if VERBOSE:
-            # Print time statistics
-            self.time_stats(start_time, self.dur)
+        # Record time statistics
+        self.time_stats(start_time, self.dur)
 
         # If this was stopped, stop movement at current position
         if self.should_stop():
@@ -171,12 +412,11 @@ class Move(StoppableThread):
             self.pos = utils.denormalize_position(self.motor, self.pos)
 
         # Calculate the max velocity
-        current_pos = self.shimi.controller.get_present_position([self.motor])[
-            0]
+        current_pos = self.shimi.state.get_position(self.motor)
         max_vel = abs(current_pos - self.pos) / (change_time * self.dur)
 
         # Set the goal position
-        self.shimi.controller.set_goal_position({self.motor: self.pos})
+        self._send_goal(self.pos)
 
         # Increment speed over time at freq
         while time.time() <= start_time + self.dur and not self.should_stop():
@@ -196,22 +436,21 @@ class Move(StoppableThread):
                 vel = 1
 
             # Update velocity
-            self.shimi.controller.set_moving_speed({self.motor: vel})
+            self._send_speed(vel)
 
             # Sleep only as much as there is time left
             time_left = (start_time + self.dur) - time.time()
             if self.freq > time_left:
                 if time_left > 0:
-                    time.sleep(time_left)
+                    self.sleep(time_left)
                 else:
                     break
             else:
                 # Wait to update again
-                time.sleep(self.freq)
+                self.sleep(self.freq)
 
-        if VERBOSE:
-            # Print time statistics
-            self.time_stats(start_time, self.dur)
+        # Record time statistics
+        self.time_stats(start_time, self.dur)
 
         # If this was stopped, stop movement at current position
         if self.should_stop():
@@ -234,12 +473,11 @@ class Move(StoppableThread):
             self.pos = utils.denormalize_position(self.motor, self.pos)
 
         # Calculate the max velocity
-        current_pos = self.shimi.controller.get_present_position([self.motor])[
-            0]
+        current_pos = self.shimi.state.get_position(self.motor)
         max_vel = abs(current_pos - self.pos) / ((1 - change_time) * self.dur)
 
         # Set the goal position
-        self.shimi.controller.set_goal_position({self.motor: self.pos})
+        self._send_goal(self.pos)
 
         # Increment speed over time at freq
         while time.time() <= start_time + self.dur and not self.should_stop():
@@ -260,22 +498,21 @@ class Move(StoppableThread):
                 vel = 1
 
             # Update velocity
-            self.shimi.controller.set_moving_speed({self.motor: vel})
+            self._send_speed(vel)
 
             # Sleep only as much as there is time left
             time_left = (start_time + self.dur) - time.time()
             if self.freq > time_left:
                 if time_left > 0:
-                    time.sleep(time_left)
+                    self.sleep(time_left)
                 else:
                     break
             else:
                 # Wait to update again
-                time.sleep(self.freq)
+                self.sleep(self.freq)
 
-        if VERBOSE:
-            # Print time statistics
-            self.time_stats(start_time, self.dur)
+        # Record time statistics
+        self.time_stats(start_time, self.dur)
 
         # If this was stopped, stop movement at current position
         if self.should_stop():
@@ -292,19 +529,18 @@ class Move(StoppableThread):
         """
 
         # Capture moving speed
-        pause_speed = abs(
-            self.shimi.controller.get_present_speed([self.motor])[0])
+        pause_speed = abs(self.shimi.state.get_speed(self.motor))
 
         # Stop the movement
         self.shimi.controller.set_goal_position(
-            {self.motor: self.shimi.controller.get_present_position([self.motor])[0]})
+            {self.motor: self.shimi.state.get_position(self.motor)})
 
         # Capture what time in the path it paused at
         elapsed = time.time() - start_time
 
-        # Update the "start time" so that when unpaused, it resumes at the same time in the move
-        while self.should_pause():
-            start_time = time.time() - (self.dur - elapsed)
+        # Block until resumed (or stopped), then update the "start time" so it resumes at the same time in the move
+        self.wait_to_resume()
+        start_time = time.time() - (self.dur - elapsed)
 
         # Continue to goal
         self.shimi.controller.set_goal_position({self.motor: self.pos})
@@ -314,19 +550,32 @@ class Move(StoppableThread):
 
     def stop_move(self):
         """Stops the currently executing move."""
-        self.shimi.controller.set_goal_position(
-            {self.motor: self.shimi.controller.get_present_position([self.motor])[0]})
+        # On the control loop, take whatever is cached rather than holding up every task on a read
+        goal = {self.motor: self.shimi.state.get_position(self.motor, ANY_AGE if self._loop is not None else None)}
+        if self._loop is not None:
+            self._loop.set_goal_position(goal)
+        else:
+            self.shimi.controller.set_goal_position(goal)
 
         # Clear all queued moves
+        self.source = None
         self.delays = []
         self.positions = []
         self.durations = []
 
     def run(self):
         """Actuates the motor in accordance with the specified parameters."""
-        while len(self.positions) > 0:
+        while True:
+            self.fill(self.lookahead)
+            if len(self.positions) == 0:
+                break
+
             # Sleep for delay time
-            time.sleep(self.delays.pop(0))
+            self.sleep(self.delays.pop(0))
+
+            # Note when this movement should have started, for timing statistics
+            self._scheduled_start = time.time()
+            self._last_speed_time = None
 
             # Set position and duration for this move
             self.pos = self.positions.pop(0)
@@ -341,9 +590,9 @@ class Move(StoppableThread):
             self.vel_algo_map[self.vel_algo](**self.vel_algo_kwarg)
 
     def time_stats(self, start_time, duration):
-        """Prints the difference between how long the move actually took vs. how long it was supposed to take. 
+        """Records the difference between how long the move actually took vs. how long it was supposed to take.
 
-        Used for diagnostic purposes only. To be called upon completion of a Move.
+        Used for diagnostic purposes only. To be called upon completion of a Move. Also prints the difference if VERBOSE.
 
         Args:
             start_time (float): Time in seconds when the Move began.
@@ -351,8 +600,45 @@ class Move(StoppableThread):
         """
 
         time_taken = time.time() - start_time
-        print("duration: %.4f\ntime taken: %.4f\n difference: %.4f" %
-              (duration, time_taken, duration - time_taken))
+        motion_metrics.record('duration_error', self.motor, self.vel_algo, time_taken - duration)
+
+        if VERBOSE:
+            print("duration: %.4f\ntime taken: %.4f\n difference: %.4f" %
+                  (duration, time_taken, duration - time_taken))
+
+    def _send_speed(self, vel):
+        """Sets the moving speed of the motor from this Move's thread, recording timing statistics.
+
+        Args:
+            vel (float): The moving speed in degrees per second.
+        """
+        sent = time.time()
+        self.shimi.controller.set_moving_speed({self.motor: vel})
+        motion_metrics.record('command_rtt', self.motor, self.vel_algo, time.time() - sent)
+        self._record_command(speeds={self.motor: vel})
+
+        if self._last_speed_time is not None:
+            motion_metrics.record('tick_jitter', self.motor, self.vel_algo,
+                                  (sent - self._last_speed_time) - self.freq)
+        self._last_speed_time = sent
+
+    def _send_goal(self, position):
+        """Sets the goal position of the motor from this Move's thread, recording timing statistics.
+
+        Args:
+            position (float): The goal position in degrees.
+        """
+        sent = time.time()
+        self.shimi.controller.set_goal_position({self.motor: position})
+        motion_metrics.record('command_rtt', self.motor, self.vel_algo, time.time() - sent)
+        motion_metrics.record('start_latency', self.motor, self.vel_algo, sent - self._scheduled_start)
+        self._record_command(goals={self.motor: position})
+
+    def _record_command(self, goals=None, speeds=None):
+        """Records a command sent from this Move's thread to Shimi's telemetry, if it's recording."""
+        telemetry = getattr(self.shimi, 'telemetry', None)
+        if telemetry is not None:
+            telemetry.record_commands(time.monotonic(), goals, speeds)
 
     def add_move(self, position, duration, vel_algo=None, vel_algo_kwarg={}, delay=0.0):
         """Adds a new position, duration, and velocity parameters to the current Move sequence.
@@ -384,15 +670,142 @@ class Move(StoppableThread):
         else:
             self.vel_algo_kwargs.append(self.vel_algo_kwargs[-1])
 
+        if self.history is not None:
+            self.history["positions"].append(float(position))
+            self.history["durations"].append(float(duration))
+            self.history["vel_algos"].append(self.vel_algos[-1])
+            self.history["vel_algo_kwargs"].append(dict(self.vel_algo_kwargs[-1]))
+            self.history["delays"].append(float(delay))
+
+    def to_dict(self):
+        """Gets the queued movements as plain data, e.g. to store a planned move. A source is pulled from completely.
+
+        Returns:
+            dict: The motor ID, and the positions, durations, velocity algorithms and their arguments, and delays of each movement.
+        """
+        self.fill()
+        return self._queued_dict()
+
+    def record(self):
+        """Starts keeping every movement queued, including those queued already.
+
+        Unlike to_dict(), this doesn't pull the whole source up front, so a move can start playing right away and be
+        stored once it has played. See recorded().
+        """
+        self.history = self._queued_dict()
+        self._source_done = self.source is None
+
+    def recorded(self):
+        """Gets the movements kept since record().
+
+        Returns:
+            dict: The movements as to_dict() data, or None if the source wasn't pulled from completely, e.g. because the move was stopped.
+        """
+        if self.history is None or not self._source_done:
+            return None
+        return self.history
+
+    def _queued_dict(self):
+        return {
+            "motor": self.motor,
+            "positions": [float(p) for p in self.positions],
+            "durations": [float(d) for d in self.durations],
+            "vel_algos": list(self.vel_algos),
+            "vel_algo_kwargs": [dict(kwargs) for kwargs in self.vel_algo_kwargs],
+            "delays": [float(d) for d in self.delays],
+            "freq": self.freq,
+            "normalized_positions": self.norm
+        }
+
+    @classmethod
+    def from_segments(cls, shimi, motor, segments, lookahead=LOOKAHEAD, freq=0.1, normalized_positions=True):
+        """Creates a move that pulls its movements from a planner as it plays, instead of queuing them all up front.
+
+        Only the first movement is planned before the move can start, and only lookahead seconds of movements are
+        queued at a time, so planners can be arbitrarily long or endless.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            motor (int): The motor ID to move.
+            segments (Iterable[Segment]): The movements, e.g. a generator. Must yield at least one.
+            lookahead (float, optional): Defaults to LOOKAHEAD. Time in seconds of movements to keep queued.
+            freq (float, optional): Defaults to 0.1. The interval time in seconds a new velocity value should be sent to the motors.
+            normalized_positions (bool, optional): Defaults to True. Determines whether positions should be interpeted as values [0.0, 1.0] or as angles in degrees.
+
+        Returns:
+            Move: The move, ready to start.
+        """
+        segments = iter(segments)
+        first = next(segments)
+        move = cls(shimi, motor, first.position, first.duration, vel_algo=first.vel_algo or 'constant',
+                   vel_algo_kwarg=first.vel_algo_kwarg, initial_delay=first.delay, freq=freq,
+                   normalized_positions=normalized_positions)
+        move.source = segments
+        move.lookahead = lookahead
+        return move
+
+    def fill(self, horizon=None):
+        """Queues movements from the source until enough are queued, or it runs out.
+
+        Args:
+            horizon (float, optional): Defaults to None. Time in seconds of queued movements (including delays) to fill up to, or None to pull every movement, which never returns for endless sources.
+        """
+        if self.source is None:
+            return
+
+        queued = sum(self.durations) + sum(self.delays)
+        while horizon is None or queued < horizon:
+            try:
+                segment = next(self.source)
+            except StopIteration:
+                self.source = None
+                self._source_done = True
+                break
+            self.add_move(*segment)
+            queued += segment.duration + segment.delay
+
+    @classmethod
+    def from_dict(cls, shimi, data):
+        """Creates a move queued with the movements from to_dict().
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            data (dict): The movements, as returned by to_dict().
+
+        Returns:
+            Move: The move, ready to start.
+        """
+        move = cls(shimi, data["motor"], data["positions"][0], data["durations"][0],
+                   vel_algo=data["vel_algos"][0], vel_algo_kwarg=data["vel_algo_kwargs"][0],
+                   initial_delay=data["delays"][0], freq=data["freq"],
+                   normalized_positions=data["normalized_positions"])
+        move.positions = list(data["positions"])
+        move.durations = list(data["durations"])
+        move.vel_algos = list(data["vel_algos"])
+        move.vel_algo_kwargs = [dict(kwargs) for kwargs in data["vel_algo_kwargs"]]
+        move.delays = list(data["delays"])
+        return move
+
+    def get_timeline(self):
+        """Gets the schedule of the queued movements, including their delays.
+
+        Returns:
+            Timeline: The queued movements, from the start of the first one's delay.
+        """
+        timeline = Timeline(capacity=max(len(self.durations), 1))
+        for position, duration, delay in zip(self.positions, self.durations, self.delays):
+            timeline.append(position, duration, delay)
+        return timeline
+
     def get_timestamps(self):
-        """Returns the timestamps of each sequenced movement."""
+        """Returns the time each queued movement ends, including delays."""
         if len(self.durations) == 0:
             return []
         else:
-            return cumsum(self.durations)
+            return self.get_timeline().ends
 
 
-class Thinking(StoppableThread):
+class Thinking(WaitableThread):
     """Moves Shimi in a way to suggest Shimi is thinking about something."""
     def __init__(self, shimi, **kwargs):
         # Seed RNG
@@ -431,15 +844,15 @@ class Thinking(StoppableThread):
 
         self.state = -1
 
-        StoppableThread.__init__(self,
-                                 setup=self.setup,
-                                 target=self.run,
-                                 teardown=self.teardown)
+        WaitableThread.__init__(self,
+                                setup=self.setup,
+                                target=self.run,
+                                teardown=self.teardown)
 
     def run(self):
         while not self.should_stop():
             # Wait between states some
-            time.sleep(1.0 * random.random())
+            self.sleep(1.0 * random.random())
 
             # Check for stop after sleeping
             if self.should_stop():
@@ -0,0 +1,129 @@
+from config.definitions import PHRASE_PLAN_DIR
+from audio.midi_cache import midi_analysis_cache
+from collections import OrderedDict
+import threading
+import tempfile
+import hashlib
+import json
+import os
+
+# Bump when GenerativePhrase changes what it plans, so plans stored by older versions aren't used
+PHRASE_PLAN_VERSION = 3
+
+# Seed that show-time gestures are planned with, so precompute_phrases.py can plan them ahead of time
+PHRASE_SEED = 0
+
+
+class PhrasePlanStore:
+    """Keeps planned generative gestures, so a phrase is only planned once for a given emotion and seed.
+
+    A plan is the list of per-motor moves GenerativePhrase.plan() makes for a seed, as Move.to_dict() data. Unseeded
+    plans are meant to differ every time, so aren't stored. Plans are keyed on a
+    hash of the MIDI file's content, the valence and arousal, the seed and whether the movement is random, kept in a
+    bounded in-memory LRU cache, and saved as JSON to an on-disk store that survives restarts.
+    """
+
+    def __init__(self, cache_dir=PHRASE_PLAN_DIR, capacity=64, midi_cache=None):
+        """Initializes the caches.
+
+        Args:
+            cache_dir (str, optional): Defaults to PHRASE_PLAN_DIR. Directory of the on-disk store, or None to only keep plans in memory.
+            capacity (int, optional): Defaults to 64. The most plans to keep in memory.
+            midi_cache (MidiAnalysisCache, optional): Defaults to None. The cache whose MIDI file hashes are reused, or None for the shared one.
+        """
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.midi_cache = midi_cache if midi_cache is not None else midi_analysis_cache
+
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, midi_path, valence, arousal, seed=None, random_movement=False):
+        """Gets the key of a plan.
+
+        Args:
+            midi_path (str): Path to the MIDI file the gesture is for.
+            valence (float): Valence value in range [-1.0, 1.0].
+            arousal (float): Arouse value in range [-1.0, 1.0].
+            seed (int, optional): Defaults to None. The seed the gesture was planned with.
+            random_movement (bool, optional): Defaults to False. Whether the gesture is random movement.
+
+        Returns:
+            str: Hex digest of the MIDI file content, emotion, seed and plan version.
+        """
+        digest = hashlib.sha1(str(PHRASE_PLAN_VERSION).encode("utf-8"))
+        digest.update(self.midi_cache.key(midi_path).encode("utf-8"))
+        digest.update(json.dumps([float(valence), float(arousal), seed, bool(random_movement)]).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Gets a stored plan, from memory or disk.
+
+        Args:
+            key (str): The plan's key from key().
+
+        Returns:
+            List[dict]: Move.to_dict() data of each move, or None if the plan isn't stored.
+        """
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        path = os.path.join(self.cache_dir, key + ".json") if self.cache_dir else None
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "r") as f:
+                plan = json.load(f)
+        except Exception as e:
+            print("Unable to read stored plan %s." % key, e)
+            return None
+
+        self._remember(key, plan)
+        return plan
+
+    def put(self, key, plan):
+        """Stores a plan.
+
+        Args:
+            key (str): The plan's key from key().
+            plan (List[dict]): Move.to_dict() data of each move.
+        """
+        self._remember(key, plan)
+
+        if self.cache_dir:
+            try:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                # Write somewhere else first and rename, so other processes never read a partly written plan
+                fd, partial = tempfile.mkstemp(suffix=".json", dir=self.cache_dir)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(plan, f)
+                os.replace(partial, os.path.join(self.cache_dir, key + ".json"))
+            except Exception as e:
+                print("Unable to store plan %s." % key, e)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._plans:
+                return True
+        return bool(self.cache_dir) and os.path.exists(os.path.join(self.cache_dir, key + ".json"))
+
+    def _remember(self, key, plan):
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.capacity:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        """Empties the in-memory cache. The on-disk store is kept."""
+        with self._lock:
+            self._plans.clear()
+
+
+# Shared so phrases are only planned once per process
+phrase_plan_store = PhrasePlanStore()
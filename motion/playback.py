@@ -1,16 +1,77 @@
 import numpy as np
 from scipy.interpolate import UnivariateSpline
 from motion.move import Move
+from motion.clock import ClockSync, SYNC_TOLERANCE, CLOCK_START_TIMEOUT
+from motion.metrics import motion_metrics
+from queue import Queue
+import itertools
+import threading
 import time
 
 # Constants
-TIME_INDEX = 0
-POS_INDEX = 1
 ERROR = 0.00001
 INTERP_FREQ = 0.01
 
+# Length in seconds of the windows stream_playback() smooths at a time, and how far each fit reaches past its window
+SMOOTHING_WINDOW = 2.0
+SMOOTHING_OVERLAP = 0.5
+
+class PlaybackPlan:
+    """Everything playback needs that can be computed ahead of time, laid out on the grid of playback ticks.
+
+    Tick k happens INTERP_FREQ * k seconds into playback. At each tick, motors whose speeds[k] isn't NaN are sent that
+    moving speed, and motors whose goals[k] isn't NaN are sent that goal position.
+    """
+
+    def __init__(self, motors, duration, timestamps, pos_matrix, vel_matrix, speeds, goals):
+        """Initializes the plan.
+
+        Args:
+            motors (List[int]): Motor IDs, in the column order of the matrices.
+            duration (float): Length of the playback in seconds.
+            timestamps (np.ndarray): The timestamps of the position and velocity data.
+            pos_matrix (np.ndarray): The (smoothed) position data for each motor.
+            vel_matrix (np.ndarray): The (smoothed) velocity data for each motor, at least 1.0 everywhere.
+            speeds (np.ndarray): Moving speed for each motor at each tick, or NaN to leave it, shaped (n_ticks, n_motors).
+            goals (np.ndarray): New goal position for each motor at each tick, or NaN to leave it, shaped (n_ticks, n_motors).
+        """
+        self.motors = list(motors)
+        self.duration = duration
+        self.timestamps = timestamps
+        self.pos_matrix = pos_matrix
+        self.vel_matrix = vel_matrix
+        self.speeds = speeds
+        self.goals = goals
+
+    def __len__(self):
+        return self.speeds.shape[0]
+
+    def save(self, path):
+        """Saves the plan to a .npz file.
+
+        Args:
+            path (str): The path of the file to save.
+        """
+        np.savez(path, motors=np.array(self.motors), duration=np.array(self.duration), timestamps=self.timestamps,
+                 pos_matrix=self.pos_matrix, vel_matrix=self.vel_matrix, speeds=self.speeds, goals=self.goals)
+
+
+def load_playback_plan(path):
+    """Loads a plan saved with PlaybackPlan.save.
+
+    Args:
+        path (str): The path of the .npz file.
+
+    Returns:
+        PlaybackPlan: The loaded plan.
+    """
+    with np.load(path) as data:
+        return PlaybackPlan([int(m) for m in data["motors"]], float(data["duration"]), data["timestamps"],
+                            data["pos_matrix"], data["vel_matrix"], data["speeds"], data["goals"])
+
+
 def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax=None, vel_ax=None,
-             use_pos_spl=True, use_vel_spl=False, callback=None):
+             use_pos_spl=True, use_vel_spl=False, callback=None, window=None, clock=None):
     """Actuates motors based on input positions and velocities.
     
     Args:
@@ -25,6 +86,35 @@ def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax
         use_pos_spl (bool, optional): Defaults to True. Determines whether to us univariate spline smoothing on position data.
         use_vel_spl (bool, optional): Defaults to False. Determines whether to us univariate spline smoothing on velocity data.
         callback (function, optional): Defaults to None. A function called when movement starts.
+        window (float, optional): Defaults to None. If set, smooths windows of this many seconds with stream_playback() while playing, instead of fitting the whole recording first. Plotting is skipped.
+        clock (Clock, optional): Defaults to None. A clock to keep the playback in sync with. See execute_playback().
+    """
+    if window is not None:
+        plan = stream_playback(motors, duration, timestamps, pos_matrix, vel_matrix, use_pos_spl, use_vel_spl,
+                               window=window)
+    else:
+        plan = plan_playback(motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax, vel_ax, use_pos_spl,
+                             use_vel_spl)
+    execute_playback(shimi, plan, callback, clock=clock)
+
+
+def plan_playback(motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax=None, vel_ax=None,
+                  use_pos_spl=True, use_vel_spl=False):
+    """Smooths input positions and velocities and schedules goal position changes, without moving any motors.
+
+    Args:
+        motors (List[int]): Motors IDs on which to playback the recorded gesture.
+        duration (float): Length of the playback in seconds.
+        timestamps (List[float]): The timestamps of the position and velocity data.
+        pos_matrix (List[List[float]]): The position data for each motor.
+        vel_matrix (List[List[float]]): The velocity data for each motor.
+        pos_ax (matplotlib.pyplot.axis, optional): Defaults to None. An axis to plot position data on through pyplot.
+        vel_ax (matplotlib.pyplot.axis, optional): Defaults to None. An axis to plot velocity data on through pyplot.
+        use_pos_spl (bool, optional): Defaults to True. Determines whether to us univariate spline smoothing on position data.
+        use_vel_spl (bool, optional): Defaults to False. Determines whether to us univariate spline smoothing on velocity data.
+
+    Returns:
+        PlaybackPlan: The plan to pass to execute_playback().
     """
 
     # Ensure all inputs are np arrays
@@ -32,7 +122,7 @@ def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax
         timestamps = np.array(timestamps)
     if not isinstance(pos_matrix, np.ndarray):
         pos_matrix = np.array(pos_matrix)
-    if vel_matrix and not isinstance(vel_matrix, np.ndarray):
+    if vel_matrix is not None and not isinstance(vel_matrix, np.ndarray):
         vel_matrix = np.array(vel_matrix)
 
     # Helper for making the legend
@@ -63,7 +153,8 @@ def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax
             np.place(vel_spline, vel_spline < 0.0, abs(vel_spline))
 
             vel_splines.append(vel_spline)
-        else:
+        elif use_vel_spl or vel_ax:
+            # Only fit the velocity spline if it's going to be used, it's as slow to fit as the position one
             vel_spline_obj = UnivariateSpline(timestamps, vel_matrix[:,i])
             vel_spline = vel_spline_obj(timestamps)
             vel_spline = vel_spline.reshape(vel_spline.shape[0], 1)
@@ -97,6 +188,351 @@ def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax
     if use_vel_spl:
         vel_matrix = np.concatenate(tuple(vel_splines), axis=1)
 
+    # Make sure no speeds are 0.0 (which means move-as-fast-as-possible)
+    # Set to 1.0 degree per second, which is very slow, but won't cause jerkiness
+    #   due to changing the goal position when velocity is 0.0
+    np.place(vel_matrix, vel_matrix < 1.0, 1.0)
+
+    # Playback ticks, and the times at which direction changes are looked for
+    num_ticks = int(np.floor(duration / INTERP_FREQ + ERROR)) + 1
+    tick_times = np.arange(num_ticks) * INTERP_FREQ
+    search_times = np.arange(1, max(int(np.ceil(duration / INTERP_FREQ)), 2)) * INTERP_FREQ
+    search_times = search_times[(search_times < duration) | (np.arange(len(search_times)) == 0)]
+
+    speeds = np.empty((num_ticks, len(motors)))
+    goals = np.full((num_ticks, len(motors)), np.nan)
+    for i, _ in enumerate(motors):
+        speeds[:, i] = np.interp(tick_times, timestamps, vel_matrix[:, i])
+
+        # Positions interpolated to INTERP_FREQ [s] increments, from INTERP_FREQ on
+        grid_positions = np.interp(search_times, timestamps, pos_matrix[:, i])
+        zero_pos = np.interp(0, timestamps, pos_matrix[:, i])
+        increasing = not (grid_positions[0] - zero_pos < 0)
+
+        change_times, change_positions = direction_changes(search_times, grid_positions, increasing)
+
+        # Add initial time (which should correspond to the first position change)
+        # Add final position (which should correspond to the last position change time)
+        change_times = np.concatenate(([0.0], change_times))
+        change_positions = np.concatenate((change_positions, [pos_matrix[-1, i]]))
+
+        goals[np.rint(change_times / INTERP_FREQ).astype(int), i] = change_positions
+
+    return PlaybackPlan(motors, duration, timestamps, pos_matrix, vel_matrix, speeds, goals)
+
+
+def direction_changes(times, positions, increasing):
+    """Finds where a motor changes direction, with the same hysteresis as stepping through the positions one by one.
+
+    Stepping from the second position on, a change is found when the motor was increasing and moves less than
+    0.009 degrees down, or was decreasing and moves more than 0.009 degrees down. The direction flips at every change,
+    so changes happen at the first step of each run of steps meeting the alternating condition.
+
+    Args:
+        times (np.ndarray): Times of the positions.
+        positions (np.ndarray): Positions in degrees, evenly spaced in time.
+        increasing (bool): Whether the motor is moving up at the first position.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The time of each change, and the position before it.
+    """
+    drops = positions[:-1] - positions[1:]
+
+    # 1 where a change is found when increasing, -1 when decreasing, 0 for neither
+    conditions = np.where(drops < 0.009, 1, np.where(drops > 0.009, -1, 0))
+    steps = np.flatnonzero(conditions)
+    if len(steps) == 0:
+        return times[:0], positions[:0]
+    conditions = conditions[steps]
+
+    run_starts = np.flatnonzero(np.concatenate(([True], conditions[1:] != conditions[:-1])))
+    if len(run_starts) and conditions[0] != (1 if increasing else -1):
+        run_starts = run_starts[1:]
+
+    steps = steps[run_starts]
+    return times[steps + 1], positions[steps]
+
+
+def _fit_window(timestamps, values, start, end):
+    """Fits a smoothing spline to the samples between two times, and the one either side of them."""
+    last = min(np.searchsorted(timestamps, end, side='right') + 1, len(timestamps))
+    first = max(min(np.searchsorted(timestamps, start, side='left') - 1, last - 2), 0)
+
+    # A cubic spline needs more than 3 samples, fall back to a lower degree near very sparse data
+    degree = min(3, last - first - 1)
+    return UnivariateSpline(timestamps[first:last], values[first:last], k=degree)
+
+
+def stream_playback(motors, duration, timestamps, pos_matrix, vel_matrix, use_pos_spl=True, use_vel_spl=False,
+                    window=SMOOTHING_WINDOW, overlap=SMOOTHING_OVERLAP, lookahead=None):
+    """Plans playback a window at a time, yielding each part of the plan as soon as it's final.
+
+    Rather than one spline over the whole recording, each window of ticks gets its own splines, fit to the samples
+    in the window and overlap seconds either side of it, and cross-faded from the previous window's over its first
+    overlap seconds. Goal positions are scheduled like plan_playback() does, except that a motor that keeps moving the
+    same way for longer than lookahead seconds gets an intermediate goal every lookahead seconds, since its next
+    direction change isn't known yet. At most a window and a lookahead's worth of ticks are held at a time, so neither
+    memory use nor the time until the first part is ready depend on the length of the recording.
+
+    Args:
+        motors (List[int]): Motors IDs on which to playback the recorded gesture.
+        duration (float): Length of the playback in seconds.
+        timestamps (List[float]): The timestamps of the position and velocity data.
+        pos_matrix (List[List[float]]): The position data for each motor.
+        vel_matrix (List[List[float]]): The velocity data for each motor.
+        use_pos_spl (bool, optional): Defaults to True. Determines whether to us univariate spline smoothing on position data.
+        use_vel_spl (bool, optional): Defaults to False. Determines whether to us univariate spline smoothing on velocity data.
+        window (float, optional): Defaults to SMOOTHING_WINDOW. Length in seconds of each window.
+        overlap (float, optional): Defaults to SMOOTHING_OVERLAP. Time in seconds each fit reaches past its window, and that consecutive windows are cross-faded over.
+        lookahead (float, optional): Defaults to None. Longest time in seconds to wait for a motor's next direction change, or None for window.
+
+    Yields:
+        PlaybackPlan: Consecutive parts of the plan, together covering every tick once. Pass the generator to execute_playback().
+    """
+    num_motors = len(motors)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    pos_matrix = np.asarray(pos_matrix, dtype=np.float64).reshape(len(timestamps), num_motors)
+
+    # Without measured velocities, they come from the position splines
+    measured = vel_matrix is not None and len(vel_matrix) > 0 and np.asarray(vel_matrix).any()
+    if measured:
+        vel_matrix = np.asarray(vel_matrix, dtype=np.float64).reshape(len(timestamps), num_motors)
+
+    if lookahead is None:
+        lookahead = window
+
+    num_ticks = int(np.floor(duration / INTERP_FREQ + ERROR)) + 1
+    window_ticks = max(int(round(window / INTERP_FREQ)), 1)
+    lookahead_ticks = max(int(round(lookahead / INTERP_FREQ)), 1)
+
+    # Ticks at which direction changes are looked for, the same as plan_playback()'s search times
+    num_search = max(int(np.ceil(duration / INTERP_FREQ)), 2)
+    is_search = lambda k: (k >= 1) & (k < num_search) & ((k * INTERP_FREQ < duration) | (k == 1))
+
+    def fit(start, end):
+        """Fits a window's splines to the samples between start and end, as a function of tick times."""
+        pos_splines = [_fit_window(timestamps, pos_matrix[:, i], start, end) for i in range(num_motors)]
+        if not measured:
+            vel_splines = [spline.derivative() for spline in pos_splines]
+        elif use_vel_spl:
+            vel_splines = [_fit_window(timestamps, vel_matrix[:, i], start, end) for i in range(num_motors)]
+
+        def smoothed(tick_times):
+            positions = np.empty((len(tick_times), num_motors))
+            speeds = np.empty((len(tick_times), num_motors))
+            for i in range(num_motors):
+                if use_pos_spl:
+                    positions[:, i] = pos_splines[i](tick_times)
+                else:
+                    positions[:, i] = np.interp(tick_times, timestamps, pos_matrix[:, i])
+
+                if not measured:
+                    speeds[:, i] = np.abs(vel_splines[i](tick_times))
+                elif use_vel_spl:
+                    speeds[:, i] = vel_splines[i](tick_times)
+                else:
+                    speeds[:, i] = np.interp(tick_times, timestamps, vel_matrix[:, i])
+            return positions, speeds
+
+        return smoothed
+
+    # Ticks not yet yielded, from tick emitted on
+    emitted = 0
+    positions = np.empty((0, num_motors))
+    speeds = np.empty((0, num_motors))
+    goals = np.empty((0, num_motors))
+
+    # Per motor, the tick whose goal is the next direction change, and the state of the direction change search
+    pending = [0 for _ in motors]
+    last_positions = [None for _ in motors]
+    increasing = [True for _ in motors]
+
+    def set_pending_goal(i, tick, position):
+        goals[pending[i] - emitted, i] = position
+        pending[i] = tick
+
+    previous = None
+    for first in range(0, num_ticks, window_ticks):
+        ticks = np.arange(first, min(first + window_ticks, num_ticks))
+        tick_times = ticks * INTERP_FREQ
+        start, end = tick_times[0], tick_times[-1] + INTERP_FREQ
+        smoothed = fit(start - overlap, end + overlap)
+        window_positions, window_speeds = smoothed(tick_times)
+
+        # Fade in from the previous window's splines, so there are no steps at the seams
+        if previous is not None:
+            fading = tick_times < start + overlap
+            fade = (tick_times[fading] - start) / overlap
+            fade = (3 * fade ** 2 - 2 * fade ** 3)[:, np.newaxis]
+            previous_positions, previous_speeds = previous(tick_times[fading])
+            window_positions[fading] = (1 - fade) * previous_positions + fade * window_positions[fading]
+            window_speeds[fading] = (1 - fade) * previous_speeds + fade * window_speeds[fading]
+        previous = smoothed
+
+        # Make sure no speeds are 0.0 (which means move-as-fast-as-possible), like plan_playback()
+        np.place(window_speeds, window_speeds < 1.0, 1.0)
+
+        positions = np.concatenate((positions, window_positions))
+        speeds = np.concatenate((speeds, window_speeds))
+        goals = np.concatenate((goals, np.full(window_positions.shape, np.nan)))
+
+        searched = is_search(ticks)
+        for i in range(num_motors):
+            search_ticks = ticks[searched]
+            search_positions = window_positions[searched, i]
+
+            if last_positions[i] is None and len(search_ticks):
+                # The first search position sets the initial direction, compared to the position at 0
+                increasing[i] = not (search_positions[0] - positions[0, i] < 0)
+                last_positions[i] = search_positions[0]
+                search_ticks = search_ticks[1:]
+                search_positions = search_positions[1:]
+
+            if len(search_ticks):
+                # Carry on the search from the last position of the previous window
+                change_times, change_positions = direction_changes(
+                    np.concatenate(([0.0], search_ticks * INTERP_FREQ)),
+                    np.concatenate(([last_positions[i]], search_positions)), increasing[i])
+                increasing[i] = increasing[i] != (len(change_times) % 2 == 1)
+                last_positions[i] = search_positions[-1]
+            else:
+                change_times, change_positions = np.empty(0), np.empty(0)
+
+            for change_time, change_position in zip(change_times, change_positions):
+                change_tick = int(np.rint(change_time / INTERP_FREQ))
+
+                # Intermediate goals along the way if the change took too long to come
+                while change_tick - pending[i] > lookahead_ticks:
+                    waypoint = pending[i] + lookahead_ticks
+                    set_pending_goal(i, waypoint, positions[waypoint - emitted, i])
+
+                set_pending_goal(i, change_tick, change_position)
+
+            while ticks[-1] - pending[i] >= lookahead_ticks:
+                waypoint = pending[i] + lookahead_ticks
+                set_pending_goal(i, waypoint, positions[waypoint - emitted, i])
+
+        if ticks[-1] == num_ticks - 1:
+            # Finish with the final position, like plan_playback()
+            final_positions, _ = smoothed(timestamps[-1:])
+            for i in range(num_motors):
+                goals[pending[i] - emitted, i] = final_positions[0, i]
+            ready = num_ticks
+        else:
+            # Ticks before the earliest goal still waiting on a direction change are final
+            ready = min(pending)
+
+        if ready > emitted:
+            count = ready - emitted
+            yield PlaybackPlan(motors, duration, np.arange(emitted, ready) * INTERP_FREQ, positions[:count],
+                               speeds[:count], speeds[:count], goals[:count])
+            positions = positions[count:]
+            speeds = speeds[count:]
+            goals = goals[count:]
+            emitted = ready
+
+
+def _prefetch(parts, size=2):
+    """Runs a generator of plan parts in a thread, so the next parts are planned while the current one plays."""
+    queue = Queue(size)
+
+    def produce():
+        try:
+            for part in parts:
+                queue.put(part)
+        except Exception as e:
+            print("Unable to plan the rest of the playback.", e)
+        queue.put(None)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+
+    while True:
+        part = queue.get()
+        if part is None:
+            return
+        yield part
+
+
+class _PlanCursor:
+    """Steps through the ticks of a plan given as consecutive parts, possibly skipping some."""
+
+    def __init__(self, parts):
+        self._parts = iter(parts)
+        self._part = next(self._parts)
+        self._first = 0
+        self.tick = -1
+
+    def advance(self, tick):
+        """Moves on to a tick, or stays on the current one if it's already past it.
+
+        Args:
+            tick (int): The tick to move to.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The latest speed and goal of each motor (NaN for none) on the ticks moved past, or the speeds of the current tick if staying on it, or None once past the end of the plan.
+        """
+        from_tick = self.tick
+        speeds = np.full(len(self._part.motors), np.nan)
+        goals = np.full(len(self._part.motors), np.nan)
+        while True:
+            end = self._first + len(self._part)
+            if tick > self.tick and self.tick + 1 < end:
+                taken = min(tick, end - 1)
+                rows = slice(self.tick + 1 - self._first, taken + 1 - self._first)
+
+                # Only the latest command of skipped ticks matters
+                _take_latest(self._part.speeds[rows], speeds)
+                _take_latest(self._part.goals[rows], goals)
+                self.tick = taken
+
+            if tick < end:
+                break
+
+            part = next(self._parts, None)
+            if part is None:
+                if self.tick == from_tick:
+                    return None
+                break
+            self._first = end
+            self._part = part
+
+        if self.tick == from_tick:
+            speeds = np.array(self._part.speeds[max(self.tick - self._first, 0)])
+        return speeds, goals
+
+
+def _take_latest(rows, latest):
+    """Copies the last value that isn't NaN in each column of rows into latest."""
+    found = ~np.isnan(rows)
+    last = rows.shape[0] - 1 - np.argmax(found[::-1], axis=0)
+    found = found.any(axis=0)
+    latest[found] = rows[last, np.arange(rows.shape[1])][found]
+
+
+def execute_playback(shimi, plan, callback=None, start_time=None, clock=None, tolerance=SYNC_TOLERANCE,
+                     state_freq=None, clock_timeout=CLOCK_START_TIMEOUT):
+    """Actuates motors according to a playback plan.
+
+    Args:
+        shimi (Shimi): An instance of the Shimi motor controller class.
+        plan (PlaybackPlan or Iterable[PlaybackPlan]): A plan from plan_playback(), or the parts of one from stream_playback(), which are planned ahead in a thread while playing.
+        callback (function, optional): Defaults to None. A function called when movement starts.
+        start_time (float, optional): Defaults to None. The time.monotonic() time at which to start movement (after moving to the initial position), or None to start as soon as possible.
+        clock (Clock, optional): Defaults to None. A clock to keep the playback in sync with, e.g. a MixerClock for the song it goes with. Movement starts when the clock reaches 0, and the plan is stretched or compressed as needed to stay in sync. None plays at normal speed.
+        tolerance (float, optional): Defaults to SYNC_TOLERANCE. Maximum drift in seconds from the clock before stretching.
+        state_freq (float, optional): Defaults to None. If set, polls shimi.state every this many seconds between ticks, for when its own thread can't (e.g. in the playback worker).
+        clock_timeout (float, optional): Defaults to CLOCK_START_TIMEOUT. Longest time in seconds to wait for the clock to start, e.g. if its song fails to play, before giving up on the playback.
+    """
+    parts = iter([plan]) if isinstance(plan, PlaybackPlan) else _prefetch(plan)
+    first = next(parts, None)
+    if first is None:
+        return
+
+    motors = first.motors
+    pos_matrix = first.pos_matrix
+
     # Start the gesture at the initial position it read
     moves = []
     for i, m in enumerate(motors):
@@ -111,88 +547,72 @@ def playback(shimi, motors, duration, timestamps, pos_matrix, vel_matrix, pos_ax
     for move in moves:
         move.join()
 
-    # Make sure no speeds are 0.0 (which means move-as-fast-as-possible)
-    # Set to 1.0 degree per second, which is very slow, but won't cause jerkiness
-    #   due to changing the goal position when velocity is 0.0
-    np.place(vel_matrix, vel_matrix < 1.0, 1.0)
-
-    # Find the positions at which direction change happens, interpolated to INTERP_FREQ [s] increments
-    times_positions = [[[], []] for _ in motors]
-    for i, _ in enumerate(motors):
-        zero_pos = np.interp(0, timestamps, pos_matrix[:, i])
-        first_pos = np.interp(INTERP_FREQ, timestamps, pos_matrix[:, i])
-        if first_pos - zero_pos < 0:
-            increasing = False
-        else:
-            increasing = True
-
-        t = 2 * INTERP_FREQ
-        last_pos = first_pos
-        while t < duration:
-            pos = np.interp(t, timestamps, pos_matrix[:, i])
-            if increasing and last_pos - pos < 0.009:
-                times_positions[i][TIME_INDEX].append(t)
-                times_positions[i][POS_INDEX].append(last_pos)
-                increasing = not increasing
-            if not increasing and last_pos - pos > 0.009:
-                times_positions[i][TIME_INDEX].append(t)
-                times_positions[i][POS_INDEX].append(last_pos)
-                increasing = not increasing
-            last_pos = pos
-
-            t += INTERP_FREQ
-
-    # Add initial time (which should correspond to the first position change)
-    # Add final position (which should correspond to the last position change time)
-    for i, _ in enumerate(motors):
-        times_positions[i][TIME_INDEX].insert(0, 0.0)
-        times_positions[i][POS_INDEX].append(pos_matrix[-1, i])
+    # Wait for the requested start
+    if start_time is not None and start_time > time.monotonic():
+        time.sleep(start_time - time.monotonic())
 
     # Use callback to alert start of playback
     if callback is not None:
         print("Starting motion, calling back...")
         callback()
 
-    # Using the times and positions, and the captured speeds, set goal position on change and update speed
-    t = 0
-    while t <= duration:
-        # Measure the time it takes for updating in order to make the sleep time such that update occurs
-        #   as close to INTERP_FREQ as possible
-        compute_time = time.time()
-
-        # Queues for setting multiple values at the same time
-        motor_pos_to_set = []
-        pos_to_set = []
-        motor_vel_to_set = []
-        vel_to_set = []
-
-        for i, m in enumerate(motors):
-            # Set a new goal pos if needed
-            if len(times_positions[i][TIME_INDEX]) > 0 and abs(times_positions[i][TIME_INDEX][0] - t) <= ERROR:
-                # Note which motor needs to be moved
-                motor_pos_to_set.append(m)
-
-                # Add position to set queue
-                pos_to_set.append(times_positions[i][POS_INDEX].pop(0))
-
-                # Remove this position change time
-                times_positions[i][TIME_INDEX].pop(0)
-
-            # Calculate velocity at this point
-            motor_vel_to_set.append(m)
-            vel_to_set.append(np.interp(t, timestamps, vel_matrix[:, i]))
-
-        # Set speeds for all motors
-        shimi.controller.set_moving_speed(dict(zip(motor_vel_to_set, vel_to_set)))
-
-        # Set new goal positions for those that need it
-        if len(motor_pos_to_set) > 0:
-            # print("Setting positions {}".format(dict(zip(motor_pos_to_set, pos_to_set))))
-            shimi.controller.set_goal_position(dict(zip(motor_pos_to_set, pos_to_set)))
-
-        # Sleep for INTERP_FREQ [s] minus compute time
-        if INTERP_FREQ - (time.time() - compute_time) > 0:
-            time.sleep(INTERP_FREQ - (time.time() - compute_time))
+    # Every tick just indexes the plan, against deadlines so lateness doesn't accumulate
+    sync = ClockSync(clock, tolerance) if clock is not None else None
+    cursor = _PlanCursor(itertools.chain([first], parts))
+    start_time = time.monotonic()
+    next_poll = start_time
+    tick = 0
+    while True:
+        if sync is None:
+            step = cursor.advance(tick)
+            rate = 1.0
+        else:
+            position = sync.update(time.monotonic())
+            step = cursor.advance(int(np.floor(position / INTERP_FREQ + ERROR))) if position is not None else None
+            rate = sync.rate
+
+        if step is not None:
+            speeds, goals = step
+
+            # Set speeds for all motors that have one, scaled with the playback rate
+            has_speeds = ~np.isnan(speeds)
+            speed_commands = None
+            if has_speeds.all():
+                speed_commands = dict(zip(motors, (speeds * rate).tolist()))
+            elif has_speeds.any():
+                speed_commands = {m: float(speeds[i] * rate) for i, m in enumerate(motors) if has_speeds[i]}
+            if speed_commands:
+                shimi.controller.set_moving_speed(speed_commands)
+
+            # Set new goal positions for those that need it
+            has_goals = ~np.isnan(goals)
+            goal_commands = None
+            if has_goals.any():
+                goal_commands = {m: float(goals[i]) for i, m in enumerate(motors) if has_goals[i]}
+                shimi.controller.set_goal_position(goal_commands)
+
+            telemetry = getattr(shimi, 'telemetry', None)
+            if telemetry is not None and (speed_commands or goal_commands):
+                telemetry.record_commands(time.monotonic(), goal_commands, speed_commands)
+        elif sync is None or sync.position is not None:
+            break
+        elif time.monotonic() - start_time > clock_timeout:
+            print("Clock didn't start within %.1fs, stopping playback." % clock_timeout)
+            break
+
+        if state_freq is not None and time.monotonic() >= next_poll:
+            try:
+                shimi.state.poll()
+            except Exception as e:
+                print("Unable to read motor state.", e)
+            next_poll += state_freq
+
+        # Sleep until the next tick
+        tick += 1
+        sleep_time = start_time + tick * INTERP_FREQ - time.monotonic()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
         else:
-            print("Didn't sleep.")
-        t += INTERP_FREQ
+            # Record how late the tick is rather than printing, which would only make it later
+            for m in motors:
+                motion_metrics.record('tick_jitter', m, 'playback', -sleep_time)
@@ -0,0 +1,340 @@
+from motion.playback import PlaybackPlan, execute_playback
+from motion.clock import SharedClock, SYNC_TOLERANCE
+from motion.telemetry import Telemetry
+from multiprocessing import Process, Pipe
+import numpy as np
+import threading
+import weakref
+import tempfile
+import hashlib
+import shutil
+import atexit
+import json
+import os
+
+# Plans are shared with the worker as memory-mapped files, in RAM-backed /dev/shm where available
+SHARED_DIR = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "shimi_plans")
+
+PLAN_ARRAYS = ["timestamps", "pos_matrix", "vel_matrix", "speeds", "goals"]
+
+
+def plan_handle(plan):
+    """Gets a handle for a plan from a hash of its content.
+
+    Args:
+        plan (PlaybackPlan): The plan.
+
+    Returns:
+        str: Hex digest identifying the plan.
+    """
+    digest = hashlib.sha1(json.dumps([plan.motors, plan.duration]).encode("utf-8"))
+    for name in PLAN_ARRAYS:
+        digest.update(np.ascontiguousarray(getattr(plan, name)).tobytes())
+    return digest.hexdigest()
+
+
+def share_plan(plan, handle):
+    """Writes a plan to the shared directory, unless it is already there.
+
+    Args:
+        plan (PlaybackPlan): The plan to share.
+        handle (str): The handle to share it under.
+
+    Returns:
+        str: The directory the plan is in.
+    """
+    path = os.path.join(SHARED_DIR, handle)
+    if os.path.exists(path):
+        return path
+
+    if not os.path.exists(SHARED_DIR):
+        os.makedirs(SHARED_DIR, exist_ok=True)
+
+    # Write somewhere else first and rename, so the worker never sees a partly written plan
+    partial = tempfile.mkdtemp(dir=SHARED_DIR)
+    json.dump({"motors": plan.motors, "duration": plan.duration}, open(os.path.join(partial, "plan.json"), "w"))
+    for name in PLAN_ARRAYS:
+        np.save(os.path.join(partial, name + ".npy"), np.ascontiguousarray(getattr(plan, name)))
+
+    try:
+        os.rename(partial, path)
+    except OSError:
+        # Shared by someone else in the meantime
+        shutil.rmtree(partial, ignore_errors=True)
+
+    return path
+
+
+def attach_plan(path):
+    """Memory-maps a plan written by share_plan.
+
+    Args:
+        path (str): The directory of the plan.
+
+    Returns:
+        PlaybackPlan: The plan, backed by the shared files.
+    """
+    info = json.load(open(os.path.join(path, "plan.json"), "r"))
+    arrays = [np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in PLAN_ARRAYS]
+    return PlaybackPlan(info["motors"], info["duration"], *arrays)
+
+
+class Playback:
+    """A playback requested from a PlaybackWorker."""
+
+    def __init__(self, id, callback=None, clock=None):
+        self.id = id
+        self.callback = callback
+        self.clock = clock
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+        # Telemetry data recorded by the worker, if the Shimi was recording telemetry when the playback was requested
+        self.telemetry = None
+
+    def wait(self, timeout=None):
+        """Blocks until the playback finishes.
+
+        Args:
+            timeout (float, optional): Defaults to None. Maximum time in seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            bool: Whether the playback finished.
+        """
+        return self.done.wait(timeout)
+
+
+class PlaybackWorker:
+    """A long-lived process that plays back plans, instead of forking a new process for every playback.
+
+    Plans are loaded once, shared through memory-mapped files, and referred to by handle afterwards, so a playback is
+    triggered by a small message. The worker is forked once and uses the Shimi's motor connection, like the per-play
+    processes did. While it plays, the Shimi's state poller and control loop are paused so they stay off the bus.
+
+    Clocks, like the position of a song playing in this process, can't be read from the worker, so they are sampled
+    into a SharedClock for it. If the Shimi is recording telemetry, the worker records its own during the playback,
+    taking over the paused state poller's reads, and sends it back to be added to the Shimi's.
+
+    With a simulated Shimi, the worker moves its own copy of the simulated motors, so the positions seen in this
+    process don't change during worker playbacks.
+    """
+
+    def __init__(self, shimi):
+        """Starts the worker process.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+        """
+        self.shimi = shimi
+        self.handles = set()
+
+        self._conn, child_conn = Pipe()
+        self._send_lock = threading.Lock()
+        self._playbacks = {}
+        self._next_id = 0
+        self._playing = 0
+        self._clock = SharedClock()
+
+        # Fork with the bus threads parked and the bus held, so nothing is mid-transaction in the copy the worker gets
+        bus_threads = [t for t in [shimi.state, shimi.control_loop] if t is not None and not t.paused]
+        for thread in bus_threads:
+            thread.park()
+        serial_lock = getattr(shimi.controller, "_serial_lock", None)
+        if serial_lock is not None:
+            serial_lock.acquire()
+        try:
+            self._process = Process(target=self._serve, args=(child_conn,))
+            self._process.daemon = True
+            self._process.start()
+        finally:
+            if serial_lock is not None:
+                serial_lock.release()
+            for thread in bus_threads:
+                thread.resume()
+        child_conn.close()
+
+        self._listener = threading.Thread(target=self._listen)
+        self._listener.daemon = True
+        self._listener.start()
+
+        atexit.register(self.close)
+
+    def _send(self, message):
+        with self._send_lock:
+            self._conn.send(message)
+
+    def load(self, plan, handle=None):
+        """Shares a plan with the worker, which keeps it for any number of playbacks.
+
+        Args:
+            plan (PlaybackPlan): The plan to load.
+            handle (str, optional): Defaults to None. A handle to refer to the plan by, or None to derive one from its content.
+
+        Returns:
+            str: The handle to pass to play().
+        """
+        if handle is None:
+            handle = plan_handle(plan)
+        if handle not in self.handles:
+            self._send({"command": "load", "handle": handle, "path": share_plan(plan, handle)})
+            self.handles.add(handle)
+        return handle
+
+    def play(self, handle, start_time=None, callback=None, clock=None, tolerance=SYNC_TOLERANCE):
+        """Plays a loaded plan.
+
+        Args:
+            handle (str): The handle returned by load().
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start movement (after moving to the initial position), or None to start as soon as possible.
+            callback (function, optional): Defaults to None. A function called (in this process) when movement starts.
+            clock (Clock, optional): Defaults to None. A clock (read in this process) to keep the playback in sync with. See execute_playback().
+            tolerance (float, optional): Defaults to SYNC_TOLERANCE. Maximum drift in seconds from the clock before stretching.
+
+        Returns:
+            Playback: The playback, which can be waited on.
+        """
+        with self._send_lock:
+            playback = Playback(self._next_id, callback, clock)
+            self._next_id += 1
+            self._playbacks[playback.id] = playback
+
+            if clock is not None:
+                self._clock.follow(clock)
+
+            self._pause_bus_threads()
+            self._conn.send({"command": "play", "id": playback.id, "handle": handle, "start_time": start_time,
+                             "clock": clock is not None, "tolerance": tolerance,
+                             "telemetry": getattr(self.shimi, 'telemetry', None) is not None})
+
+        return playback
+
+    def _pause_bus_threads(self):
+        # Wait for the threads to finish any transaction in progress, so the worker has the bus to itself
+        self._playing += 1
+        for thread in [self.shimi.state, self.shimi.control_loop]:
+            if thread is not None and not thread.park():
+                print("WARNING, %s didn't pause before playback." % type(thread).__name__)
+
+    def _resume_bus_threads(self):
+        self._playing -= 1
+        if self._playing == 0:
+            for thread in [self.shimi.state, self.shimi.control_loop]:
+                if thread is not None:
+                    thread.resume()
+
+    def _listen(self):
+        """Dispatches events from the worker."""
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                break
+
+            playback = self._playbacks.get(message["id"])
+            if playback is None:
+                continue
+
+            if message["event"] == "started":
+                playback.started.set()
+                if playback.callback is not None:
+                    try:
+                        playback.callback()
+                    except Exception as e:
+                        print("Playback callback failed.", e)
+            elif message["event"] == "done":
+                playback.telemetry = message.get("telemetry")
+                telemetry = getattr(self.shimi, 'telemetry', None)
+                if playback.telemetry is not None and telemetry is not None:
+                    telemetry.extend(playback.telemetry)
+
+                with self._send_lock:
+                    del self._playbacks[playback.id]
+                    self._resume_bus_threads()
+                    if playback.clock is not None:
+                        self._clock.stop()
+                playback.started.set()
+                playback.done.set()
+
+        # The worker is gone, so nothing else will finish or give the bus back
+        with self._send_lock:
+            playbacks = list(self._playbacks.values())
+            self._playbacks.clear()
+            for playback in playbacks:
+                self._resume_bus_threads()
+                if playback.clock is not None:
+                    self._clock.stop()
+        for playback in playbacks:
+            playback.started.set()
+            playback.done.set()
+
+    def _serve(self, conn):
+        """Runs in the worker process, playing plans as requested."""
+        # The bus was held for the fork, so this copy of its lock is still acquired
+        serial_lock = getattr(self.shimi.controller, "_serial_lock", None)
+        if serial_lock is not None:
+            serial_lock.release()
+
+        plans = {}
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if message["command"] == "load":
+                plans[message["handle"]] = attach_plan(message["path"])
+            elif message["command"] == "play":
+                id = message["id"]
+                plan = plans[message["handle"]]
+
+                # The Shimi's telemetry here is a stale copy of the parent's, so record into a fresh one
+                self.shimi.telemetry = Telemetry(plan.motors) if message["telemetry"] else None
+                state_freq = self.shimi.state.freq if message["telemetry"] and self.shimi.state else None
+                try:
+                    execute_playback(self.shimi, plan,
+                                     callback=lambda: conn.send({"event": "started", "id": id}),
+                                     start_time=message["start_time"],
+                                     clock=self._clock if message["clock"] else None,
+                                     tolerance=message["tolerance"],
+                                     state_freq=state_freq)
+                except Exception as e:
+                    print("Playback failed.", e)
+
+                telemetry = self.shimi.telemetry.data() if self.shimi.telemetry is not None else None
+                self.shimi.telemetry = None
+                conn.send({"event": "done", "id": id, "telemetry": telemetry})
+            elif message["command"] == "close":
+                break
+
+    def close(self):
+        """Stops the worker process and removes the plans it shared."""
+        if self._process.is_alive():
+            try:
+                self._send({"command": "close"})
+            except Exception:
+                pass
+            self._process.join(1.0)
+
+        for handle in self.handles:
+            shutil.rmtree(os.path.join(SHARED_DIR, handle), ignore_errors=True)
+        self.handles = set()
+
+
+# One worker per Shimi, started the first time it's needed
+_workers = weakref.WeakKeyDictionary()
+
+
+def worker_for(shimi):
+    """Gets the playback worker of a Shimi, starting it if needed.
+
+    Args:
+        shimi (Shimi): An instance of the Shimi motor controller class.
+
+    Returns:
+        PlaybackWorker: The Shimi's playback worker.
+    """
+    worker = _workers.get(shimi)
+    if worker is None or not worker._process.is_alive():
+        worker = PlaybackWorker(shimi)
+        _workers[shimi] = worker
+    return worker
@@ -0,0 +1,130 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+from config.definitions import PHRASE_PLAN_DIR
+from motion.phrase_plans import PhrasePlanStore, PHRASE_SEED
+from multiprocessing import Pool
+import numpy as np
+import argparse
+import time
+
+# Planner used by each process of the pool
+_planner = None
+
+
+def _init_planner(cache_dir):
+    """Creates the planner of a pool process, on a simulated Shimi since planning only needs its motor IDs."""
+    global _planner
+
+    from shimi import Shimi
+    from motion.generative_phrase import GenerativePhrase
+
+    shimi = Shimi(silent=True, simulate=True, use_control_loop=False, poll_state=False)
+    _planner = GenerativePhrase(shimi=shimi, plan_store=PhrasePlanStore(cache_dir), audio=False)
+
+
+def _plan(job):
+    """Plans and stores one gesture in a pool process.
+
+    Args:
+        job (tuple): The key, MIDI path, valence, arousal, seed and whether the movement is random.
+
+    Returns:
+        tuple: The key and the time in seconds planning took, or the key and the error if it failed.
+    """
+    key, midi_path, valence, arousal, seed, random_movement = job
+    start = time.time()
+    try:
+        moves = _planner.plan(midi_path, valence, arousal, random_movement=random_movement, seed=seed)
+        _planner.plan_store.put(key, [move.to_dict() for move in moves])
+    except Exception as e:
+        return key, e
+    return key, time.time() - start
+
+
+def precompute(midi_paths, valences, arousals, seeds=(PHRASE_SEED,), random_movement=False, cache_dir=PHRASE_PLAN_DIR,
+               processes=None):
+    """Plans generative gestures for every combination of MIDI file, emotion and seed, skipping ones already stored.
+
+    Args:
+        midi_paths (List[str]): Paths to the MIDI files.
+        valences (List[float]): Valence values in range [-1.0, 1.0].
+        arousals (List[float]): Arousal values in range [-1.0, 1.0].
+        seeds (List[int], optional): Defaults to (PHRASE_SEED,). Seeds to plan each gesture with. Unseeded gestures are planned fresh every time, so aren't stored.
+        random_movement (bool, optional): Defaults to False. Determines whether to plan random movement instead.
+        cache_dir (str, optional): Defaults to PHRASE_PLAN_DIR. Directory of the plan store.
+        processes (int, optional): Defaults to None. Number of planning processes, or None for one per CPU.
+
+    Returns:
+        dict: Numbers of gestures already stored, planned and failed.
+    """
+    store = PhrasePlanStore(cache_dir)
+
+    jobs = []
+    skipped = 0
+    for midi_path in midi_paths:
+        for valence in valences:
+            for arousal in arousals:
+                for seed in seeds:
+                    if seed is None:
+                        continue
+                    key = store.key(midi_path, valence, arousal, seed, random_movement)
+                    if key in store:
+                        skipped += 1
+                    else:
+                        jobs.append((key, midi_path, valence, arousal, seed, random_movement))
+
+    planned = failed = 0
+    if jobs:
+        with Pool(processes, initializer=_init_planner, initargs=(cache_dir,)) as pool:
+            for i, (key, result) in enumerate(pool.imap_unordered(_plan, jobs)):
+                if isinstance(result, Exception):
+                    failed += 1
+                    print("Unable to plan %s." % key, result)
+                else:
+                    planned += 1
+                print("%d/%d planned" % (i + 1, len(jobs)), end="\r")
+        print()
+
+    return {"stored": skipped, "planned": planned, "failed": failed}
+
+
+def grid(values, steps):
+    """Gets evenly spaced values from [-1.0, 1.0], or the given values.
+
+    Args:
+        values (List[float]): Values to use, or None.
+        steps (int): Number of evenly spaced values if none are given.
+
+    Returns:
+        List[float]: The values.
+    """
+    if values:
+        return values
+    return [float(v) for v in np.linspace(-1.0, 1.0, steps)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Precomputes generative gesture plans for a directory of MIDI files over a valence/arousal grid.")
+    parser.add_argument('midi_dir', type=str, help="Directory of the MIDI files.")
+    parser.add_argument('-v', '--valences', nargs='+', type=float, help="Valence values, instead of a grid.")
+    parser.add_argument('-a', '--arousals', nargs='+', type=float, help="Arousal values, instead of a grid.")
+    parser.add_argument('-n', '--steps', type=int, default=5,
+                        help="Number of grid values in [-1, 1] for valence and arousal not given.")
+    parser.add_argument('-s', '--seeds', nargs='+', type=int, default=[PHRASE_SEED],
+                        help="Seeds to plan each gesture with.")
+    parser.add_argument('-r', '--random', action='store_true', help="Plan random movement instead.")
+    parser.add_argument('-p', '--processes', type=int, default=None, help="Number of planning processes.")
+    parser.add_argument('-c', '--cache_dir', type=str, default=PHRASE_PLAN_DIR, help="Directory of the plan store.")
+    args = parser.parse_args()
+
+    midi_paths = sorted(os.path.join(args.midi_dir, f) for f in os.listdir(args.midi_dir)
+                        if f.lower().endswith((".mid", ".midi")))
+
+    start = time.time()
+    counts = precompute(midi_paths, grid(args.valences, args.steps), grid(args.arousals, args.steps), args.seeds,
+                        args.random, args.cache_dir, args.processes)
+    print("%d already stored, %d planned, %d failed in %.1fs" % (counts["stored"], counts["planned"],
+                                                                  counts["failed"], time.time() - start))
@@ -2,17 +2,24 @@ from pypot.utils import StoppableThread
 import matplotlib.pyplot as plt
 from motion.move import *
 from motion.playback import *
+from motion.playback_worker import worker_for
+from motion.keyframes import reduce_plan
+from motion.gesture_file import save_gesture, load_gesture, GESTURE_EXTENSION
+from motion.recording import Recording
 from utils.utils import countdown
 import numpy as np
 import time
+import os
 import pickle
-from multiprocessing import Process
 
 
 class Recorder():
-    """Records manual motion of Shimi to a file."""
+    """Records manual motion of Shimi to a file.
 
-    def __init__(self, shimi, motors, duration, wait_time=3.0):
+    The data is held in a Recording, which motors, duration, timestamps, positions and velocities read and write.
+    """
+
+    def __init__(self, shimi, motors, duration, wait_time=3.0, freq=None):
         """Initializes input parameters.
 
         Args:
@@ -20,29 +27,69 @@ class Recorder():
             motors (List[int]): Motors IDs to record position and velocity from.
             duration (float): How long to record for in seconds.
             wait_time (float, optional): Defaults to 3.0. Length of time to wait between calling self.record() and the recording starting.
+            freq (float, optional): Defaults to None. The interval time in seconds between samples, or None to sample as fast as possible.
         """
         self.shimi = shimi
-        self.motors = motors
-        self.duration = duration
         self.wait = wait_time
+        self.freq = freq
+        self.recording = Recording.empty(motors, duration, freq)
+
+        # Fixed rate samples of (position, speed) per motor, and the time of each, filled in by _record_fixed_rate()
+        self.buffer = None
+        self.buffer_timestamps = None
+        self.missed = 0
+
+    @property
+    def motors(self):
+        return self.recording.motors
+
+    @motors.setter
+    def motors(self, motors):
+        self.recording.motors = list(motors)
+
+    @property
+    def duration(self):
+        return self.recording.duration
+
+    @duration.setter
+    def duration(self, duration):
+        self.recording.duration = duration
+
+    @property
+    def timestamps(self):
+        return self.recording.timestamps
+
+    @timestamps.setter
+    def timestamps(self, timestamps):
+        self.recording.timestamps = np.asarray(timestamps, dtype=np.float64)
+
+    @property
+    def positions(self):
+        return self.recording.positions
+
+    @positions.setter
+    def positions(self, positions):
+        self.recording.positions = np.asarray(positions, dtype=np.float64).reshape(-1, len(self.motors))
+
+    @property
+    def velocities(self):
+        return self.recording.velocities
 
-        self.positions = []
-        self.velocities = []
-        self.timestamps = []
+    @velocities.setter
+    def velocities(self, velocities):
+        self.recording.velocities = np.asarray(velocities, dtype=np.float64).reshape(-1, len(self.motors))
 
     def record(self):
         """Start recording position and velocity data."""
         # Erase previous recording
-        self.positions = []
-        self.velocities = []
-        self.timestamps = []
+        self.recording = Recording.empty(self.motors, self.duration, self.freq)
 
         # Disable torque
         self.shimi.disable_torque()
 
         # Define the thread
         r = StoppableThread()
-        r.__init__(setup=self.setup, target=self._record,
+        r.__init__(setup=self.setup, target=self._record if self.freq is None else self._record_fixed_rate,
                    teardown=self.teardown)
 
         # Run the recording
@@ -66,37 +113,98 @@ class Recorder():
         print("Recording...")
 
         # Initial position/velocity/time
-        self.positions.append(
-            self.shimi.controller.get_present_position(self.motors))
-        self.velocities.append([0.0 for m in self.motors])
-        self.timestamps.append(0)
+        positions = [self.shimi.controller.get_present_position(self.motors)]
+        velocities = [[0.0 for m in self.motors]]
+        timestamps = [0]
 
         start_time = time.time()
         while time.time() <= start_time + self.duration:
             # Sample the current position/velocity as fast as possible
-            self.positions.append(
+            positions.append(
                 self.shimi.controller.get_present_position(self.motors))
             vel = self.shimi.controller.get_present_speed(self.motors)
             vel = [abs(v) for v in vel]
-            self.velocities.append(vel)
+            velocities.append(vel)
             t = time.time() - start_time
-            self.timestamps.append(t)
+            timestamps.append(t)
+
+        self.recording = Recording(self.motors, timestamps, positions, velocities, self.duration)
 
         print("Done. Recorded {0} positions and {1} velocities.".format(
             len(self.positions), len(self.velocities)))
 
-    def play(self, pos_ax=None, vel_ax=None, callback=None):
+    def _record_fixed_rate(self):
+        """Records position and velocity data from the motors at a fixed rate, with one combined read per sample."""
+        num_samples = int(self.duration / self.freq) + 1
+
+        # Preallocated for every sample, so nothing is allocated while recording
+        self.buffer = np.zeros((num_samples, len(self.motors), 2), dtype=np.float32)
+        self.buffer_timestamps = np.zeros(num_samples, dtype=np.float64)
+        self.missed = 0
+
+        # Count down to recording
+        countdown(self.wait)
+
+        # Make the recording
+        print("Recording...")
+
+        controller = self.shimi.controller
+        count = 0
+        start_time = time.monotonic()
+        end_time = start_time + self.duration + (self.freq / 2)
+        deadline = start_time
+        while count < num_samples and deadline <= end_time:
+            t = time.monotonic()
+            values = controller.get_present_position_speed_load(self.motors)
+
+            # Position and speed come from the same read, so they describe the same instant
+            self.buffer[count] = [value[:2] for value in values]
+            self.buffer_timestamps[count] = t - start_time
+            count += 1
+
+            # Sleep until the next deadline, skipping samples whose deadline has passed entirely
+            deadline += self.freq
+            sleep_time = deadline - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                # Sample late rather than skipping unless whole periods have passed
+                missed = int(-sleep_time / self.freq)
+                self.missed += missed
+                deadline += missed * self.freq
+
+        # Drop the space of any missed samples
+        self.buffer = self.buffer[:count]
+        self.buffer_timestamps = self.buffer_timestamps[:count]
+
+        self.recording = Recording(self.motors, self.buffer_timestamps, self.buffer[:, :, 0],
+                                   np.abs(self.buffer[:, :, 1]), self.duration, self.freq)
+
+        print("Done. Recorded {0} samples at {1:.1f}Hz, {2} missed.".format(
+            count, 1.0 / self.freq, self.missed))
+
+    def play(self, pos_ax=None, vel_ax=None, callback=None, window=None, clock=None, keyframe_tolerance=None):
         """Playsback the current recording. 
             pos_ax (matplotlib.pyplot.axis, optional): Defaults to None. An axis to plot position data on through pyplot.
             vel_ax (matplotlib.pyplot.axis, optional): Defaults to None. An axis to plot velocity data on through pyplot.
             callback (function, optional): Defaults to None. A function called when movement starts.
+            window (float, optional): Defaults to None. If set, plays in this process while smoothing windows of this many seconds, so long or appended recordings start moving right away. Plotting is skipped.
+            clock (Clock, optional): Defaults to None. A clock to keep the playback in sync with, e.g. a MixerClock for the song it goes with.
+            keyframe_tolerance (float, optional): Defaults to None. If set, plays only keyframes within this many degrees of the smoothed recording, sending far fewer commands. Not used with window.
         """
-        def closure():
-            playback(self.shimi, self.motors, self.duration, self.timestamps, self.positions, self.velocities, pos_ax,
-                     vel_ax, callback=callback)
-        p = Process(target=closure)
-        p.start()
-        p.join()
+        if window is not None:
+            playback(self.shimi, self.motors, self.duration, self.timestamps, self.positions, self.velocities,
+                     callback=callback, window=window, clock=clock)
+            return
+
+        plan = plan_playback(self.motors, self.duration, self.timestamps, self.positions, self.velocities, pos_ax,
+                             vel_ax)
+        if keyframe_tolerance is not None:
+            plan = reduce_plan(plan, keyframe_tolerance)
+
+        # Play on the long-lived worker rather than forking for every playback
+        worker = worker_for(self.shimi)
+        worker.play(worker.load(plan), callback=callback, clock=clock).wait()
 
     def plot(self, ax):
         """Plots position data on a provided axis.
@@ -106,10 +214,8 @@ class Recorder():
         """
         t = np.linspace(0, self.duration, len(self.positions))
 
-        pos_matrix = np.array(self.positions)
-
         for i, _ in enumerate(self.motors):
-            ax.plot(t, pos_matrix[:, i])
+            ax.plot(t, self.positions[:, i])
 
         ax.legend(self.motors)
         ax.set_xlabel('Time (in s)')
@@ -119,7 +225,7 @@ class Recorder():
         """Adds the position and velocity data from a provided recording to this recording.
         
         Args:
-            r (Recording): The recording to add to this one.
+            r (Recorder or Recording): The recording to add to this one.
         """
         # Only allow appending if recorded motors are the same
         if self.motors != r.motors:
@@ -131,43 +237,19 @@ class Recorder():
             print("Can't append to a blank recording.")
             return
 
-        # Space between data points to add between recordings
-        delta_t = self.timestamps[1] - self.timestamps[0]
-
-        # Fix timestamps for all of r
-        r_timestamps = list(
-            map(lambda t: t + self.timestamps[-1] + delta_t, r.timestamps))
-
-        # Add timestamps
-        self.timestamps += r_timestamps
-
-        # Add positions
-        self.positions += r.positions
-
-        # Add velocities
-        self.velocities += r.velocities
-
-        # Add duration
-        self.duration += r.duration
+        self.recording = self.recording.concat(getattr(r, "recording", r))
 
         print("Recording appended.")
 
-    def save(self, name, path="saved_gestures"):
-        """Saves the data of this recording to a file.
+    def save(self, name, path="saved_gestures", compress=False):
+        """Saves the data of this recording to a gesture file.
         
         Args:
-            name (str): The name of the file to be saved. Will be postfixed with ".p".
+            name (str): The name of the file to be saved. Will be postfixed with GESTURE_EXTENSION.
             path (str, optional): Defaults to "saved_gestures". The path to the directory at which to save the file.
+            compress (bool, optional): Defaults to False. Compresses the file, which then can't be memory-mapped when loaded.
         """
-        # Save pickle of this object
-        gesture = {
-            "motors": self.motors,
-            "duration": self.duration,
-            "positions": self.positions,
-            "velocities": self.velocities,
-            "timestamps": self.timestamps
-        }
-        pickle.dump(gesture, open(path + "/" + str(name) + ".p", "wb"))
+        save_gesture(os.path.join(path, str(name) + GESTURE_EXTENSION), self.recording, compress)
 
     def trim(self, duration, end="front"):
         """Remove data of a certain length from the beginning or end of the recording.
@@ -176,21 +258,10 @@ class Recorder():
             duration (float): How much data to remove, in seconds.
             end (str, optional): Defaults to "front". Either "front" for trimming from the front, or any other string for trimming from the back.
         """
-        # Make timestamps a numpy array to get new front more easily
-        times = np.array(self.timestamps)
         if end == "front":
-            # Get the new front
-            new_front_index = (np.abs(times - duration)).argmin()
-            new_front_value = self.timestamps[new_front_index]
-
-            # Trim timestamps, positions, velocities
-            self.timestamps = self.timestamps[new_front_index:]
-            self.positions = self.positions[new_front_index:]
-            self.velocities = self.velocities[new_front_index:]
-
-            # Re-zero timestamps
-            for i, timestamp in enumerate(self.timestamps):
-                self.timestamps[i] = timestamp - new_front_value
+            # Cut at the sample closest to the new front, and re-zero timestamps from it
+            new_front = self.timestamps[self.recording.nearest_index(duration)]
+            self.recording = self.recording.slice(start=new_front)
 
             # Shorten duration
             self.duration = self.timestamps[-1]
@@ -198,13 +269,9 @@ class Recorder():
             # Get new duration
             new_duration = self.duration - duration
 
-            # Get the new back
-            new_back_index = (np.abs(times - new_duration)).argmin()
-
-            # Trim timestamps, positions, velocities
-            self.timestamps = self.timestamps[:new_back_index + 1]
-            self.positions = self.positions[:new_back_index + 1]
-            self.velocities = self.velocities[:new_back_index + 1]
+            # Cut after the sample closest to the new back
+            new_back = self.timestamps[self.recording.nearest_index(new_duration)]
+            self.recording = self.recording.slice(end=new_back, rezero=False)
 
             # Shorten duration
             self.duration = new_duration
@@ -216,36 +283,32 @@ class Recorder():
         """Adds a new motor recording to the current recording.
         
         Args:
-            new_recording (Recording): The new motor recording data.
+            new_recording (Recorder or Recording): The new motor recording data.
         """
+        new_recording = getattr(new_recording, "recording", new_recording)
 
-        new_pos_matrix = np.array(new_recording.positions)
-        new_vel_matrix = np.array(new_recording.velocities)
+        # Don't allow recordings with the same motors
+        if set(new_recording.motors) & set(self.motors):
+            print("Unable to overwrite motor recording.")
+            return
 
-        # Add motor(s) to this recording
-        for m in new_recording.motors:
-            if m in self.motors:
-                # Don't allow recordings with the same motors
-                print("Unable to overwrite motor recording.")
-                return
-            else:
-                self.motors.append(m)
+        # Add positions and velocities from new recording based on the current recording's time stamps
+        self.recording = self.recording.merge(new_recording)
 
-        for i, _ in enumerate(new_recording.motors):
-            for j, t in enumerate(self.timestamps):
-                # Add positions and velocities from new recording based on the current recording's time stamps
-                pos = list(self.positions[j])
-                pos.append(
-                    np.interp(t, new_recording.timestamps, new_pos_matrix[:, i]))
-                self.positions[j] = tuple(pos)
-                vel = list(self.velocities[j])
-                vel.append(
-                    np.interp(t, new_recording.timestamps, new_vel_matrix[:, i]))
-                self.velocities[j] = tuple(vel)
+    def resample(self, freq):
+        """Resamples the recording to evenly spaced samples.
+
+        Args:
+            freq (float): The interval time in seconds between samples.
+        """
+        self.recording = self.recording.resample(freq)
+        self.freq = freq
 
 
 def load_recorder(shimi, name, path="saved_gestures"):
     """Loads a recording object from a file.
+
+    Loads the gesture file if there is one, otherwise a gesture pickled by older versions of Recorder.save.
     
     Args:
         shimi (Shimi): An instance of the Shimi motor controller class.
@@ -253,17 +316,24 @@ def load_recorder(shimi, name, path="saved_gestures"):
         path (str, optional): Defaults to "saved_gestures". Path to the directory of the file.
     
     Returns:
-        [type]: [description]
+        Recorder: A recorder with the loaded recording.
     """
+    gesture_path = os.path.join(path, str(name) + GESTURE_EXTENSION)
+    if os.path.exists(gesture_path):
+        gesture = load_gesture(gesture_path)
+
+        # Recreate the recorder
+        r = Recorder(shimi, gesture.motors, gesture.duration, freq=gesture.freq)
+        r.recording = Recording.from_gesture(gesture)
+        return r
 
     # Unpickle the gesture
     gesture = pickle.load(open(path + "/" + str(name) + ".p", "rb"))
 
     # Recreate the recorder
     r = Recorder(shimi, gesture["motors"], gesture["duration"])
-    r.positions = gesture["positions"]
-    r.velocities = gesture["velocities"]
-    r.timestamps = gesture["timestamps"]
+    r.recording = Recording(gesture["motors"], gesture["timestamps"], gesture["positions"], gesture["velocities"],
+                            gesture["duration"])
 
     # Return the recorder
     return r
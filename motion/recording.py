@@ -0,0 +1,170 @@
+from motion.gesture_file import Gesture
+import numpy as np
+
+# Tolerance in seconds for sample times landing on the end of a time range
+ERROR = 0.00001
+
+
+class Recording(Gesture):
+    """A recorded gesture held as contiguous arrays, with vectorized editing.
+
+    Editing methods return new recordings rather than changing this one. Positions and velocities are shaped
+    (n_samples, n_motors), with columns in the order of motors.
+    """
+
+    def __init__(self, motors, timestamps, positions, velocities, duration=None, freq=None):
+        """Initializes the recording, copying the data into contiguous float64 arrays if it isn't already.
+
+        Args:
+            motors (List[int]): Motor IDs, in the column order of positions and velocities.
+            timestamps (List[float] or np.ndarray): Time in seconds of each sample, in ascending order.
+            positions (List[List[float]] or np.ndarray): Positions in degrees for each sample and motor.
+            velocities (List[List[float]] or np.ndarray): Velocities in degrees per second for each sample and motor.
+            duration (float, optional): Defaults to None. Length of the recording in seconds, or None for the last timestamp.
+            freq (float, optional): Defaults to None. The interval time in seconds between samples if they are evenly spaced, otherwise None.
+        """
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.float64).reshape(-1)
+        shape = (len(timestamps), len(motors))
+        Gesture.__init__(self, motors, timestamps,
+                         np.ascontiguousarray(positions, dtype=np.float64).reshape(shape),
+                         np.ascontiguousarray(velocities, dtype=np.float64).reshape(shape),
+                         duration, freq)
+
+    @classmethod
+    def from_gesture(cls, gesture):
+        """Copies a gesture, e.g. a memory-mapped one from load_gesture(), into a recording.
+
+        Args:
+            gesture (Gesture): The gesture.
+
+        Returns:
+            Recording: The recording.
+        """
+        return cls(gesture.motors, gesture.timestamps, gesture.positions, gesture.velocities, gesture.duration,
+                   gesture.freq)
+
+    @classmethod
+    def empty(cls, motors, duration=0.0, freq=None):
+        """Creates a recording with no samples.
+
+        Args:
+            motors (List[int]): Motor IDs.
+            duration (float, optional): Defaults to 0.0. Length of the recording in seconds.
+            freq (float, optional): Defaults to None. The interval time in seconds between samples.
+
+        Returns:
+            Recording: The recording.
+        """
+        return cls(motors, np.empty(0), np.empty((0, len(motors))), np.empty((0, len(motors))), duration, freq)
+
+    @property
+    def interval(self):
+        """float: The time in seconds between samples, from freq or the first two timestamps."""
+        if self.freq is not None:
+            return self.freq
+        if len(self) > 1:
+            return float(self.timestamps[1] - self.timestamps[0])
+        return 0.0
+
+    def nearest_index(self, t):
+        """Gets the index of the sample closest to a time.
+
+        Args:
+            t (float): Time in seconds.
+
+        Returns:
+            int: The sample index.
+        """
+        i = int(np.searchsorted(self.timestamps, t))
+        if i > 0 and (i == len(self) or t - self.timestamps[i - 1] <= self.timestamps[i] - t):
+            return i - 1
+        return min(i, len(self) - 1)
+
+    def concat(self, other, gap=None):
+        """Appends another recording of the same motors after this one.
+
+        Args:
+            other (Recording): The recording to append.
+            gap (float, optional): Defaults to None. Time in seconds between this recording's last sample and the other's first, or None for this recording's sample interval.
+
+        Returns:
+            Recording: The combined recording.
+        """
+        if list(other.motors) != self.motors:
+            raise ValueError("Can't concatenate recordings of different motors.")
+
+        if gap is None:
+            gap = self.interval
+        offset = (self.timestamps[-1] + gap) if len(self) else 0.0
+
+        freq = self.freq if self.freq == other.freq else None
+        return Recording(self.motors,
+                         np.concatenate((self.timestamps, other.timestamps + offset)),
+                         np.concatenate((self.positions, other.positions)),
+                         np.concatenate((self.velocities, other.velocities)),
+                         self.duration + other.duration, freq)
+
+    def merge(self, other):
+        """Adds the motors of another recording to this one, interpolated onto this recording's timestamps.
+
+        Args:
+            other (Recording): A recording of different motors.
+
+        Returns:
+            Recording: The recording with the motors of both.
+        """
+        if set(other.motors) & set(self.motors):
+            raise ValueError("Can't merge recordings that share motors.")
+
+        return Recording(self.motors + list(other.motors), self.timestamps,
+                         np.hstack((self.positions, self._interp(self.timestamps, other.timestamps, other.positions))),
+                         np.hstack((self.velocities,
+                                    self._interp(self.timestamps, other.timestamps, other.velocities))),
+                         self.duration, self.freq)
+
+    def slice(self, start=None, end=None, rezero=True):
+        """Gets the samples between two times.
+
+        Args:
+            start (float, optional): Defaults to None. Time in seconds of the first sample to keep, or None for the start.
+            end (float, optional): Defaults to None. Time in seconds of the last sample to keep, or None for the end.
+            rezero (bool, optional): Defaults to True. Shifts timestamps so the recording starts at start.
+
+        Returns:
+            Recording: The recording between the times, with its duration cut to match.
+        """
+        start = 0.0 if start is None else start
+        end = self.duration if end is None else end
+
+        first = int(np.searchsorted(self.timestamps, start - ERROR, side='left'))
+        last = int(np.searchsorted(self.timestamps, end + ERROR, side='right'))
+
+        timestamps = self.timestamps[first:last]
+        if rezero:
+            timestamps = timestamps - start
+
+        return Recording(self.motors, timestamps, self.positions[first:last], self.velocities[first:last],
+                         max(min(end, self.duration) - start, 0.0), self.freq)
+
+    def resample(self, freq):
+        """Resamples the recording to evenly spaced samples by linear interpolation.
+
+        Args:
+            freq (float): The interval time in seconds between the new samples.
+
+        Returns:
+            Recording: The resampled recording, from time 0 through its duration.
+        """
+        timestamps = np.arange(int(np.floor(self.duration / freq + ERROR)) + 1) * freq
+        return Recording(self.motors, timestamps,
+                         self._interp(timestamps, self.timestamps, self.positions),
+                         self._interp(timestamps, self.timestamps, self.velocities),
+                         self.duration, freq)
+
+    @staticmethod
+    def _interp(times, timestamps, values):
+        """Interpolates each column of values at some times."""
+        result = np.empty((len(times), values.shape[1]))
+        for i in range(values.shape[1]):
+            result[:, i] = np.interp(times, timestamps, values[:, i])
+        return result
@@ -0,0 +1,206 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+from config.definitions import *
+import threading
+import random
+import time
+
+
+class LatencyModel:
+    """Models the time a serial transaction with the motors takes."""
+
+    def __init__(self, transaction=0.0012, per_motor=0.0002, jitter=0.0003):
+        """Initializes latency parameters.
+
+        Args:
+            transaction (float, optional): Defaults to 0.0012. Fixed turnaround time in seconds of any transaction.
+            per_motor (float, optional): Defaults to 0.0002. Additional time in seconds per motor addressed in the transaction.
+            jitter (float, optional): Defaults to 0.0003. Maximum uniformly distributed extra time in seconds.
+        """
+        self.transaction = transaction
+        self.per_motor = per_motor
+        self.jitter = jitter
+
+    def delay(self, num_motors):
+        """Gets the time a transaction addressing a number of motors takes.
+
+        Args:
+            num_motors (int): How many motors the transaction reads or writes.
+
+        Returns:
+            float: Transaction time in seconds.
+        """
+        return self.transaction + (self.per_motor * num_motors) + (self.jitter * random.random())
+
+
+class SimulatedDxlIO:
+    """A drop-in stand-in for pypot.dynamixel.DxlIO that simulates Shimi's motors.
+
+    Motors follow a first-order response toward their goal position, limited by their moving speed and clamped to
+    ANGLE_LIMITS. Every call is one transaction on a simulated serial bus, which is held for the time given by the
+    latency model, so concurrent callers contend for it the way they do for the real USB2AX.
+    """
+
+    def __init__(self, ids=None, latency=None, time_constant=0.05, model='MX-28'):
+        """Initializes simulated motors at their starting positions.
+
+        Args:
+            ids (List[int], optional): Defaults to None. Motor IDs on the bus, or None for all of Shimi's motors.
+            latency (LatencyModel, optional): Defaults to None. Serial latency model, or None for the default LatencyModel.
+            time_constant (float, optional): Defaults to 0.05. Time constant in seconds of the motors' first-order response.
+            model (str, optional): Defaults to 'MX-28'. Model name reported for every motor.
+        """
+        if ids is None:
+            ids = [TORSO, NECK_LR, NECK_UD, PHONE, FOOT]
+        self.ids = list(ids)
+        self.latency = latency if latency is not None else LatencyModel()
+        self.time_constant = time_constant
+        self.model = model
+
+        self.positions = {m: float(STARTING_POSITIONS.get(m, 0.0)) for m in self.ids}
+        self.goals = dict(self.positions)
+        self.moving_speeds = {m: 0.0 for m in self.ids}
+        self.speeds = {m: 0.0 for m in self.ids}
+        self.torque = {m: False for m in self.ids}
+
+        # Named like pypot's DxlIO lock, so the two can be handled alike
+        self._serial_lock = threading.Lock()
+        self._last_update = time.monotonic()
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clears transaction statistics."""
+        self.transactions = 0
+        self.bus_time = 0.0
+        self.calls = {}
+
+    def _transaction(self, name, num_motors):
+        """Holds the bus for the duration of one transaction. Must be called with the bus locked."""
+        delay = self.latency.delay(num_motors)
+        time.sleep(delay)
+        self.transactions += 1
+        self.bus_time += delay
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self._update()
+
+    def _update(self):
+        """Advances the simulated motors to the current time."""
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+
+        # Integrate in small steps so the first-order response stays stable
+        steps = max(1, int(elapsed / 0.001))
+        dt = elapsed / steps
+        for m in self.ids:
+            if not self.torque[m]:
+                self.speeds[m] = 0.0
+                continue
+
+            max_speed = abs(self.moving_speeds[m]) or MAX_SPEED
+            pos = self.positions[m]
+            goal = self.goals[m]
+            for _ in range(steps):
+                vel = (goal - pos) / self.time_constant
+                vel = max(-max_speed, min(max_speed, vel))
+                pos += vel * dt
+            low, high = ANGLE_LIMITS.get(m, (-150.0, 150.0))
+            self.positions[m] = max(low, min(high, pos))
+            self.speeds[m] = vel
+
+    def _get(self, name, values, ids):
+        with self._serial_lock:
+            self._transaction(name, len(ids))
+            return tuple(values[m] for m in ids)
+
+    def _set(self, name, values, value_for_id):
+        with self._serial_lock:
+            self._transaction(name, len(value_for_id))
+            for m, value in value_for_id.items():
+                if m in values:
+                    values[m] = value
+
+    def ping(self, id):
+        with self._serial_lock:
+            self._transaction('ping', 1)
+        return id in self.ids
+
+    def scan(self, ids=range(254)):
+        return [id for id in ids if self.ping(id)]
+
+    def get_model(self, ids):
+        return self._get('get_model', {m: self.model for m in self.ids}, ids)
+
+    def get_present_position(self, ids):
+        return self._get('get_present_position', self.positions, ids)
+
+    def get_present_speed(self, ids):
+        return self._get('get_present_speed', self.speeds, ids)
+
+    def get_present_load(self, ids):
+        return self._get('get_present_load', {m: 0.0 for m in self.ids}, ids)
+
+    def get_present_position_speed_load(self, ids):
+        with self._serial_lock:
+            self._transaction('get_present_position_speed_load', len(ids))
+            return tuple((self.positions[m], self.speeds[m], 0.0) for m in ids)
+
+    def set_goal_position(self, value_for_id):
+        self._set('set_goal_position', self.goals, value_for_id)
+
+    def set_moving_speed(self, value_for_id):
+        self._set('set_moving_speed', self.moving_speeds, value_for_id)
+
+    def set_goal_position_speed_load(self, value_for_id):
+        with self._serial_lock:
+            self._transaction('set_goal_position_speed_load', len(value_for_id))
+            for m, (goal, speed, _) in value_for_id.items():
+                if m in self.goals:
+                    self.goals[m] = goal
+                    self.moving_speeds[m] = speed
+
+    def enable_torque(self, ids):
+        self._set('enable_torque', self.torque, {m: True for m in ids})
+
+    def disable_torque(self, ids):
+        self._set('disable_torque', self.torque, {m: False for m in ids})
+
+    def close(self):
+        pass
+
+
+if __name__ == '__main__':
+    # Compares bus usage of thread-per-Move and control loop scheduling on a simulated Shimi
+    from shimi import Shimi
+    from motion.move import Move
+
+    def gesture(shimi):
+        moves = []
+        for m in shimi.all_motors:
+            move = Move(shimi, m, 0.8, 0.5, vel_algo='linear_ad')
+            for i in range(5):
+                move.add_move([0.2, 0.8][i % 2], 0.5, vel_algo='linear_ad')
+            moves.append(move)
+        return moves
+
+    for use_control_loop in [False, True]:
+        shimi = Shimi(silent=True, simulate=True, use_control_loop=use_control_loop)
+        shimi.controller.reset_stats()
+
+        moves = gesture(shimi)
+        start = time.monotonic()
+        for move in moves:
+            move.start()
+        for move in moves:
+            move.join()
+        elapsed = time.monotonic() - start
+
+        print("Control loop: %s" % use_control_loop)
+        print("  took %.3fs for a 3.0s gesture" % elapsed)
+        print("  %d transactions, bus busy %.1f%%" % (shimi.controller.transactions,
+                                                       100 * shimi.controller.bus_time / elapsed))
+        for name, count in sorted(shimi.controller.calls.items()):
+            print("    %s: %d" % (name, count))
@@ -0,0 +1,274 @@
+from config.definitions import MAX_SPEED
+import numpy as np
+import threading
+import json
+import time
+
+# Default number of commands and of state readings a Telemetry can hold, each about 10 minutes at 100Hz
+TELEMETRY_CAPACITY = 60000
+
+
+class _Stream:
+    """A preallocated table of timestamped values per motor, with NaN for motors a row has no value for."""
+
+    def __init__(self, capacity, num_motors, fields):
+        self.capacity = capacity
+        self.times = np.empty(capacity)
+        self.values = np.full((capacity, len(fields), num_motors), np.nan)
+        self.count = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Gets the index of the next free row, or None (counting the drop) if the table is full."""
+        if self.count >= self.capacity:
+            self.dropped += 1
+            return None
+        index = self.count
+        self.count += 1
+        return index
+
+
+class Telemetry:
+    """Records what the motors were commanded and where they actually were, for measuring how closely they follow.
+
+    Commands are recorded as they are written to the motors, and actual positions and speeds from the state poller's
+    bulk reads, so recording adds no serial reads. Everything goes into preallocated tables, which stop recording
+    (counting what was dropped) once full. Attach one to a Shimi with Shimi.start_telemetry().
+    """
+
+    def __init__(self, motors, capacity=TELEMETRY_CAPACITY):
+        """Allocates the tables.
+
+        Args:
+            motors (List[int]): Motor IDs to record.
+            capacity (int, optional): Defaults to TELEMETRY_CAPACITY. The most commands, and the most state readings, to record.
+        """
+        self.motors = list(motors)
+        self.columns = {m: i for i, m in enumerate(self.motors)}
+
+        # Goal position and moving speed per command, and position and speed per reading
+        self.commands = _Stream(capacity, len(self.motors), ["goal", "speed"])
+        self.states = _Stream(capacity, len(self.motors), ["position", "speed"])
+
+    def record_commands(self, now, goals=None, speeds=None):
+        """Records commands written to the motors.
+
+        Args:
+            now (float): The time.monotonic() time they were written.
+            goals (dict, optional): Defaults to None. Goal positions in degrees, keyed by motor ID.
+            speeds (dict, optional): Defaults to None. Moving speeds in degrees per second, keyed by motor ID.
+        """
+        stream = self.commands
+        with stream.lock:
+            index = stream.reserve()
+            if index is None:
+                return
+            stream.times[index] = now
+            row = stream.values[index]
+            for field, values in enumerate([goals, speeds]):
+                if values:
+                    for m, value in values.items():
+                        column = self.columns.get(m)
+                        if column is not None:
+                            row[field, column] = value
+
+    def record_state(self, now, values):
+        """Records a bulk read of the motors.
+
+        Args:
+            now (float): The time.monotonic() time of the read.
+            values (dict): (position, speed, load) tuples keyed by motor ID, as read by MotorState.
+        """
+        stream = self.states
+        with stream.lock:
+            index = stream.reserve()
+            if index is None:
+                return
+            stream.times[index] = now
+            row = stream.values[index]
+            for m, value in values.items():
+                column = self.columns.get(m)
+                if column is not None:
+                    row[0, column] = value[0]
+                    row[1, column] = value[1]
+
+    def data(self):
+        """Gets copies of everything recorded so far.
+
+        Returns:
+            dict: Motor IDs, command times, goals and speeds, and state times, positions and speeds, each shaped (n, n_motors) apart from the times.
+        """
+        with self.commands.lock:
+            commands = self.commands.times[:self.commands.count].copy(), \
+                       self.commands.values[:self.commands.count].copy()
+        with self.states.lock:
+            states = self.states.times[:self.states.count].copy(), self.states.values[:self.states.count].copy()
+
+        return {
+            "motors": list(self.motors),
+            "command_times": commands[0],
+            "goals": commands[1][:, 0],
+            "speeds": commands[1][:, 1],
+            "state_times": states[0],
+            "positions": states[1][:, 0],
+            "velocities": states[1][:, 1],
+            "dropped": self.commands.dropped + self.states.dropped
+        }
+
+    def extend(self, data):
+        """Adds data recorded by another Telemetry, e.g. one in the playback worker.
+
+        Args:
+            data (dict): The other telemetry's data().
+        """
+        columns = [self.columns.get(m) for m in data["motors"]]
+        for stream, times, fields in [(self.commands, data["command_times"], [data["goals"], data["speeds"]]),
+                                      (self.states, data["state_times"], [data["positions"], data["velocities"]])]:
+            with stream.lock:
+                count = min(len(times), stream.capacity - stream.count)
+                stream.dropped += len(times) - count
+                rows = slice(stream.count, stream.count + count)
+                stream.times[rows] = times[:count]
+                for field, values in enumerate(fields):
+                    for i, column in enumerate(columns):
+                        if column is not None:
+                            stream.values[rows, field, column] = values[:count, i]
+                stream.count += count
+
+    def setpoints(self, motor, times, data=None):
+        """Gets where a motor was meant to be at given times, per the goal positions and moving speeds commanded.
+
+        From each command on, the setpoint moves from where it was toward the latest goal at the latest speed, and
+        stops there, like the motor would if it followed perfectly. Before the first command there is no setpoint.
+
+        Args:
+            motor (int): The motor ID.
+            times (np.ndarray): time.monotonic() times, in increasing order.
+            data (dict, optional): Defaults to None. This telemetry's data(), if already fetched.
+
+        Returns:
+            np.ndarray: The setpoint in degrees at each time, NaN before the first command.
+        """
+        if data is None:
+            data = self.data()
+        i = data["motors"].index(motor)
+        goals, speeds = data["goals"][:, i], data["speeds"][:, i]
+        sent = ~(np.isnan(goals) & np.isnan(speeds))
+        command_times, goals, speeds = data["command_times"][sent], goals[sent], speeds[sent]
+
+        # Setpoint, goal and speed from each command on, carrying over whatever a command doesn't set
+        starts = np.empty(len(command_times))
+        targets = np.empty(len(command_times))
+        rates = np.empty(len(command_times))
+        position = goal = None
+        speed = MAX_SPEED
+        for k, t in enumerate(command_times):
+            if k == 0:
+                # Start from where the readings put the motor at the first command, or at the goal without any
+                readings = ~np.isnan(data["positions"][:, i])
+                position = np.interp(t, data["state_times"][readings], data["positions"][readings, i]) \
+                    if readings.any() else np.nan
+            else:
+                position = self._setpoint(position, goal, speed, t - command_times[k - 1])
+            if not np.isnan(goals[k]):
+                goal = goals[k]
+            if not np.isnan(speeds[k]):
+                # A moving speed of 0.0 is as fast as possible
+                speed = speeds[k] if speeds[k] > 0 else MAX_SPEED
+            if goal is None:
+                goal = position
+            if np.isnan(position):
+                position = goal
+            starts[k], targets[k], rates[k] = position, goal, speed
+
+        times = np.asarray(times, dtype=np.float64)
+        index = np.searchsorted(command_times, times, side='right') - 1
+        result = np.full(len(times), np.nan)
+        valid = index >= 0
+        k = index[valid]
+        result[valid] = self._setpoint(starts[k], targets[k], rates[k], times[valid] - command_times[k])
+        return result
+
+    @staticmethod
+    def _setpoint(start, goal, speed, elapsed):
+        """Moves from start toward goal at speed for elapsed seconds, without passing it."""
+        distance = goal - start
+        return start + np.sign(distance) * np.minimum(np.abs(distance), speed * elapsed)
+
+    def tracking(self):
+        """Compares each state reading to the setpoint and speed commanded when it was read.
+
+        Returns:
+            dict: Per motor ID, a dict of the reading times, setpoints (see setpoints()), position_error (actual minus setpoint, in degrees) and speed_error (absolute actual speed minus latest commanded speed, in degrees per second). Errors are NaN before the first command.
+        """
+        data = self.data()
+        tracking = {}
+        for i, m in enumerate(data["motors"]):
+            setpoints = self.setpoints(m, data["state_times"], data)
+            errors = {"times": data["state_times"], "setpoints": setpoints,
+                      "position_error": data["positions"][:, i] - setpoints}
+
+            # Latest commanded speed at each reading
+            commanded = data["speeds"][:, i]
+            sent = ~np.isnan(commanded)
+            index = np.searchsorted(data["command_times"][sent], data["state_times"], side='right') - 1
+            latest = np.full(len(index), np.nan)
+            latest[index >= 0] = commanded[sent][index[index >= 0]]
+            errors["speed_error"] = np.abs(data["velocities"][:, i]) - latest
+            tracking[m] = errors
+        return tracking
+
+    def summary(self):
+        """Summarizes tracking error per motor.
+
+        Returns:
+            List[dict]: Per motor, the number of readings compared and the mean absolute, RMS and max absolute position and speed errors.
+        """
+        rows = []
+        for m, errors in self.tracking().items():
+            row = {"motor": m}
+            for name in ["position_error", "speed_error"]:
+                error = errors[name][~np.isnan(errors[name])]
+                row[name] = {
+                    "count": len(error),
+                    "mean_abs": float(np.mean(np.abs(error))) if len(error) else None,
+                    "rms": float(np.sqrt(np.mean(error ** 2))) if len(error) else None,
+                    "max_abs": float(np.max(np.abs(error))) if len(error) else None
+                }
+            rows.append(row)
+        return rows
+
+    def save(self, path):
+        """Saves everything recorded, and the setpoints and tracking errors, to a .npz file.
+
+        Args:
+            path (str): The path of the file to save.
+        """
+        data = self.data()
+        tracking = self.tracking()
+        for name in ["setpoints", "position_error", "speed_error"]:
+            data[name] = np.column_stack([tracking[m][name] for m in self.motors]) \
+                if self.motors else np.empty((0, 0))
+        data["motors"] = np.array(data["motors"])
+        np.savez(path, **data)
+
+    def dump(self, path=None):
+        """Prints a summary of tracking error, or writes it as JSON.
+
+        Args:
+            path (str, optional): Defaults to None. A file path to write JSON to, or None to print.
+        """
+        rows = self.summary()
+        if path:
+            with open(path, "w") as f:
+                json.dump({"time": time.time(), "tracking": rows}, f, indent=2)
+            return
+
+        for row in rows:
+            position, speed = row["position_error"], row["speed_error"]
+            if position["count"]:
+                print("motor %s: n=%d position mean=%.2f rms=%.2f max=%.2f deg, speed mean=%.2f max=%.2f deg/s" %
+                      (row["motor"], position["count"], position["mean_abs"], position["rms"], position["max_abs"],
+                       speed["mean_abs"] if speed["count"] else float('nan'),
+                       speed["max_abs"] if speed["count"] else float('nan')))
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class Timeline:
+    """The schedule of a motor's planned movements, for asking where it will be at a point in time.
+
+    Each movement waits its delay after the previous one ends, then moves linearly from the previous position to its
+    own over its duration. Start and end times are kept cumulatively as movements are appended, so a position query
+    is a binary search, and batches of times are answered with vectorized numpy operations. Movements can also be
+    pulled lazily from a planner, only as far as the latest time asked about, and dropped once they're in the past.
+    """
+
+    def __init__(self, segments=None, initial_position=None, capacity=64):
+        """Initializes an empty timeline.
+
+        Args:
+            segments (Iterable[Segment], optional): Defaults to None. Movements to pull as queries need them, e.g. a planner's generator, which may be endless.
+            initial_position (float, optional): Defaults to None. Position before the first movement, or None to use the first movement's position.
+            capacity (int, optional): Defaults to 64. Number of movements to allocate room for, grown as needed.
+        """
+        self.source = iter(segments) if segments is not None else None
+        self.initial_position = initial_position
+
+        self._starts = np.zeros(capacity)
+        self._ends = np.zeros(capacity)
+        self._positions = np.zeros(capacity)
+        self._previous = np.zeros(capacity)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def starts(self):
+        """np.ndarray: The time in seconds each movement starts, after its delay."""
+        return self._starts[:self._n]
+
+    @property
+    def ends(self):
+        """np.ndarray: The time in seconds each movement ends."""
+        return self._ends[:self._n]
+
+    @property
+    def positions(self):
+        """np.ndarray: The position each movement ends at."""
+        return self._positions[:self._n]
+
+    @property
+    def end(self):
+        """float: The time in seconds the last appended movement ends."""
+        return self._ends[self._n - 1] if self._n else 0.0
+
+    def append(self, position, duration, delay=0.0):
+        """Adds a movement after the last one.
+
+        Args:
+            position (float): The position to move to.
+            duration (float): The duration the movement lasts.
+            delay (float, optional): Defaults to 0.0. Time to wait after the end of the previous movement.
+        """
+        n = self._n
+        if n == len(self._ends):
+            for name in ["_starts", "_ends", "_positions", "_previous"]:
+                setattr(self, name, np.resize(getattr(self, name), 2 * n))
+
+        start = self.end + delay
+        if n:
+            previous = self._positions[n - 1]
+        else:
+            previous = position if self.initial_position is None else self.initial_position
+
+        self._starts[n] = start
+        self._ends[n] = start + duration
+        self._positions[n] = position
+        self._previous[n] = previous
+        self._n = n + 1
+
+    def extend(self, segments):
+        """Adds movements after the last one.
+
+        Args:
+            segments (Iterable[Segment]): The movements, or any (position, duration, ..., delay) tuples shaped like them.
+        """
+        for segment in segments:
+            self.append(segment.position, segment.duration, segment.delay)
+
+    def pull(self, t):
+        """Adds movements from the source until they reach a time, or it runs out.
+
+        Args:
+            t (float): Time in seconds to reach.
+        """
+        while self.source is not None and (self._n == 0 or self.end < t):
+            segment = next(self.source, None)
+            if segment is None:
+                self.source = None
+                break
+            self.append(segment.position, segment.duration, segment.delay)
+
+    def forget_before(self, t):
+        """Drops movements that end before a time, for timelines only queried at increasing times.
+
+        Positions at t and later are unchanged. The last movement is always kept, so later ones start from it.
+
+        Args:
+            t (float): The earliest time in seconds still to be queried.
+        """
+        n = self._n
+        dropped = min(int(np.searchsorted(self._ends[:n], t)), n - 1)
+        if dropped <= 0:
+            return
+
+        for name in ["_starts", "_ends", "_positions", "_previous"]:
+            array = getattr(self, name)
+            array[:n - dropped] = array[dropped:n]
+        self._n = n - dropped
+
+    def position_at(self, t):
+        """Gets the position at a time.
+
+        Args:
+            t (float): Time in seconds.
+
+        Returns:
+            float: The position, or None if there are no movements.
+        """
+        self.pull(t)
+        n = self._n
+        if n == 0:
+            return None
+
+        i = int(np.searchsorted(self._ends[:n], t))
+        if i == n:
+            return float(self._positions[n - 1])
+
+        start = self._starts[i]
+        if t <= start:
+            return float(self._previous[i])
+        return float(self._previous[i] + (self._positions[i] - self._previous[i]) *
+                     (t - start) / (self._ends[i] - start))
+
+    def positions_at(self, times):
+        """Gets the positions at many times at once.
+
+        Args:
+            times (np.ndarray): Times in seconds, in any order.
+
+        Returns:
+            np.ndarray: The position at each time, or None if there are no movements.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if times.size:
+            self.pull(float(np.max(times)))
+        n = self._n
+        if n == 0:
+            return None
+
+        starts, ends = self._starts[:n], self._ends[:n]
+        positions, previous = self._positions[:n], self._previous[:n]
+
+        i = np.searchsorted(ends, times)
+        after = i == n
+        i = np.minimum(i, n - 1)
+
+        start = starts[i]
+        length = ends[i] - start
+        progress = np.clip((times - start) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+        result = previous[i] + (positions[i] - previous[i]) * progress
+        result[after] = positions[n - 1]
+        return result
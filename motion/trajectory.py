@@ -0,0 +1,425 @@
+from pypot.utils import StoppableThread
+from motion.move import profile_velocity
+from motion.control_loop import TORQUE_LIMIT
+from motion.clock import ClockSync, SYNC_TOLERANCE, CLOCK_START_TIMEOUT
+import utils.utils as utils
+import numpy as np
+import threading
+import time
+
+# Slowest speed to command, as a moving speed of 0.0 means move-as-fast-as-possible
+MIN_SPEED = 1.0
+
+# Default time in seconds to blend from the motors' measured state into a new trajectory
+BLEND_TIME = 0.15
+
+
+class Trajectory:
+    """Position and velocity setpoints for a set of motors, sampled at a fixed rate."""
+
+    def __init__(self, motors, freq, positions, velocities):
+        """Initializes the setpoint arrays.
+
+        Args:
+            motors (List[int]): Motor IDs, in the column order of positions and velocities.
+            freq (float): The interval time in seconds between setpoints.
+            positions (np.ndarray): Positions in degrees, shaped (n_setpoints, n_motors).
+            velocities (np.ndarray): Signed velocities in degrees per second, shaped (n_setpoints, n_motors).
+        """
+        self.motors = list(motors)
+        self.freq = freq
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.velocities = np.asarray(velocities, dtype=np.float64)
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    @property
+    def times(self):
+        """np.ndarray: The time in seconds of each setpoint from the start of the trajectory."""
+        return np.arange(len(self)) * self.freq
+
+    @property
+    def duration(self):
+        """float: The length of the trajectory in seconds."""
+        return (len(self) - 1) * self.freq
+
+    @property
+    def setpoints(self):
+        """np.ndarray: (t, position, velocity) setpoints, shaped (n_setpoints, n_motors, 3)."""
+        times = np.repeat(self.times[:, np.newaxis], len(self.motors), axis=1)
+        return np.stack((times, self.positions, self.velocities), axis=2)
+
+    def index(self, t):
+        """Gets the index of the setpoint in effect at a time.
+
+        Args:
+            t (float): Time in seconds from the start of the trajectory.
+
+        Returns:
+            int: Setpoint index, clipped to the trajectory.
+        """
+        return min(max(int(t / self.freq), 0), len(self) - 1)
+
+    def save(self, path):
+        """Saves the trajectory to a .npz file.
+
+        Args:
+            path (str): The path of the file to save.
+        """
+        np.savez(path, motors=np.array(self.motors), freq=np.array(self.freq), positions=self.positions,
+                 velocities=self.velocities)
+
+
+def load_trajectory(path):
+    """Loads a trajectory saved with Trajectory.save.
+
+    Args:
+        path (str): The path of the .npz file.
+
+    Returns:
+        Trajectory: The loaded trajectory.
+    """
+    with np.load(path) as data:
+        return Trajectory([int(m) for m in data["motors"]], float(data["freq"]), data["positions"],
+                          data["velocities"])
+
+
+def compile_moves(moves, starting_positions, freq=0.01):
+    """Compiles the queued movements of Moves into a Trajectory, without running them.
+
+    Moves are compiled as if they were all started at the same time. The motors are modeled as moving toward each
+    goal position at the velocity the Move's velocity algorithm would command, stopping once they reach it.
+
+    Args:
+        moves (List[Move]): Moves that have not been started yet. Moves with a source are filled from it completely, so it must be finite.
+        starting_positions (dict): Positions in degrees of every motor to compile for, keyed by motor ID.
+        freq (float, optional): Defaults to 0.01. The interval time in seconds between setpoints.
+
+    Returns:
+        Trajectory: Setpoints for every motor in starting_positions.
+    """
+    motors = list(starting_positions.keys())
+
+    # Lay every queued movement out on a timeline per motor
+    segments = {m: [] for m in motors}
+    for move in moves:
+        if move.motor not in segments:
+            continue
+        move.fill()
+
+        t = 0.0
+        vel_algo = move.vel_algos[0] if move.vel_algos else move.vel_algo
+        vel_algo_kwarg = move.vel_algo_kwargs[0] if move.vel_algo_kwargs else move.vel_algo_kwarg
+        for i, (position, duration, delay) in enumerate(zip(move.positions, move.durations, move.delays)):
+            if i < len(move.vel_algos):
+                vel_algo = move.vel_algos[i]
+            if i < len(move.vel_algo_kwargs):
+                vel_algo_kwarg = move.vel_algo_kwargs[i]
+            if move.norm:
+                position = utils.denormalize_position(move.motor, position)
+
+            start = t + delay
+            segments[move.motor].append((start, duration, position, vel_algo, vel_algo_kwarg))
+            t = start + duration
+
+    end_time = max([s[0] + s[1] for motor_segments in segments.values() for s in motor_segments] + [0.0])
+    n = int(np.ceil(end_time / freq)) + 1
+    times = np.arange(n) * freq
+
+    positions = np.empty((n, len(motors)))
+    velocities = np.zeros((n, len(motors)))
+
+    for j, m in enumerate(motors):
+        positions[:, j] = starting_positions[m]
+        motor_segments = sorted(segments[m], key=lambda s: s[0])
+
+        for k, (start, duration, goal, vel_algo, vel_algo_kwarg) in enumerate(motor_segments):
+            # A later movement takes over the motor when it starts
+            end = start + duration
+            if k + 1 < len(motor_segments):
+                end = min(end, motor_segments[k + 1][0])
+
+            first = int(np.ceil(start / freq - 1e-9))
+            last = min(int(np.ceil(end / freq - 1e-9)), n)
+            if first >= n:
+                continue
+
+            starting_position = positions[first, j]
+            distance = abs(goal - starting_position)
+            direction = 1.0 if goal >= starting_position else -1.0
+
+            # Include the setpoint where the movement hands over, to know where it leaves the motor
+            indices = np.arange(first, min(last + 1, n))
+            vel = np.array([profile_velocity(vel_algo, t, duration, distance, **vel_algo_kwarg)
+                            for t in times[indices] - start])
+
+            # Integrate velocity into position, stopping at the goal
+            travelled = np.concatenate(([0.0], np.cumsum(np.abs(vel[:-1]) * freq)))
+            travelled = np.minimum(travelled, distance)
+            vel[travelled >= distance] = 0.0
+            motor_positions = starting_position + direction * travelled
+
+            positions[first:last, j] = motor_positions[:last - first]
+            velocities[first:last, j] = direction * vel[:last - first]
+
+            # Hold the motor where the movement left it until something else moves it
+            if last < n:
+                positions[last:, j] = motor_positions[-1]
+                velocities[last:, j] = 0.0
+
+    return Trajectory(motors, freq, positions, velocities)
+
+
+def blend_trajectory(trajectory, positions, velocities, blend=BLEND_TIME):
+    """Blends the start of a trajectory in from the motors' measured state, so it can replace a running one.
+
+    Over the blend time, the motors' measured motion is carried on with its velocity easing out to zero, and
+    crossfaded into the trajectory with a smoothstep, so neither position nor velocity jump.
+
+    Args:
+        trajectory (Trajectory): The trajectory to blend into.
+        positions (dict): Measured positions in degrees, keyed by motor ID.
+        velocities (dict): Measured velocities in degrees per second, keyed by motor ID.
+        blend (float, optional): Defaults to BLEND_TIME. The blend time in seconds.
+
+    Returns:
+        Trajectory: A new trajectory, blended for every motor in positions.
+    """
+    blended_positions = trajectory.positions.copy()
+    blended_velocities = trajectory.velocities.copy()
+
+    n = min(len(trajectory), int(np.ceil(blend / trajectory.freq)) + 1)
+    if blend <= 0 or n < 2:
+        return Trajectory(trajectory.motors, trajectory.freq, blended_positions, blended_velocities)
+
+    t = np.minimum(trajectory.times[:n], blend)
+    x = t / blend
+    fade = x * x * (3 - 2 * x)
+
+    for j, m in enumerate(trajectory.motors):
+        if m not in positions:
+            continue
+
+        velocity = velocities.get(m, 0.0)
+        carried = positions[m] + velocity * (t - (t * t) / (2 * blend))
+        blended_positions[:n, j] = (1 - fade) * carried + fade * trajectory.positions[:n, j]
+
+        # Velocities over the blend follow from the blended positions, running into the trajectory's own
+        blended_velocities[:n - 1, j] = np.diff(blended_positions[:n, j]) / trajectory.freq
+
+    return Trajectory(trajectory.motors, trajectory.freq, blended_positions, blended_velocities)
+
+
+class TrajectoryPlayer(StoppableThread):
+    """Plays back a Trajectory against monotonic deadlines, indexing one setpoint per tick.
+
+    Runs on Shimi's control loop if it is running, otherwise on its own thread. Given a clock, setpoints are indexed by
+    the clock's time instead, stretched or compressed to stay in sync with it.
+    """
+
+    def __init__(self, shimi, trajectory, start_time=None, clock=None, tolerance=SYNC_TOLERANCE,
+                 clock_timeout=CLOCK_START_TIMEOUT):
+        """Initializes the player.
+
+        Args:
+            shimi (Shimi): An instance of the Shimi motor controller class.
+            trajectory (Trajectory): The setpoints to play.
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start the trajectory, or None to start as soon as the player is started. Ignored if there is a clock.
+            clock (Clock, optional): Defaults to None. A clock to keep the trajectory in sync with, starting when it reaches 0.
+            tolerance (float, optional): Defaults to SYNC_TOLERANCE. Maximum drift in seconds from the clock before stretching.
+            clock_timeout (float, optional): Defaults to CLOCK_START_TIMEOUT. Longest time in seconds to wait for the clock to start, e.g. if its song fails to play, before giving up on the trajectory.
+        """
+        self.shimi = shimi
+        self.trajectory = trajectory
+        self.start_time = start_time
+        self.clock = clock
+        self.tolerance = tolerance
+        self.clock_timeout = clock_timeout
+        self._sync = None
+
+        # Set when another gesture takes over the motors from this one
+        self.preempted = False
+
+        self._loop = None
+        self._done = threading.Event()
+        self._paused_at = None
+
+        StoppableThread.__init__(self,
+                                 setup=self.setup,
+                                 target=self.run,
+                                 teardown=self.teardown)
+
+    def start(self):
+        """Starts playing the trajectory."""
+        if hasattr(self.shimi, 'wait_until_ready'):
+            self.shimi.wait_until_ready()
+
+        if self.start_time is None:
+            self._start = time.monotonic()
+        else:
+            self._start = self.start_time
+        if self.clock is not None:
+            self._sync = ClockSync(self.clock, self.tolerance)
+        self._done.clear()
+        self._paused_at = None
+
+        loop = getattr(self.shimi, 'control_loop', None)
+        if loop is not None and loop.active:
+            self._loop = loop
+            self._started.set()
+            self._resume.set()
+            self._running.set()
+            loop.add_task(self)
+        else:
+            self._loop = None
+            StoppableThread.start(self)
+
+    def stop(self, wait=True):
+        """Stops playing the trajectory, leaving the motors at their last goal positions.
+
+        Args:
+            wait (bool, optional): Defaults to True. Whether to wait for playback to stop.
+        """
+        if self._loop is None:
+            StoppableThread.stop(self, wait)
+            return
+
+        self._running.clear()
+        if wait and threading.current_thread() is not getattr(self._loop, '_thread', None):
+            self.join()
+        self._started.clear()
+
+    def join(self):
+        """Waits for the trajectory to finish playing."""
+        if self._loop is None:
+            StoppableThread.join(self)
+            return
+
+        while not self._done.wait(0.1):
+            if not self._loop.active:
+                break
+
+    def commands(self, i, rate=1.0):
+        """Gets the goal position and moving speed to send for a setpoint.
+
+        The goal is the next setpoint's position, reached by the following deadline at the setpoint's velocity.
+
+        Args:
+            i (int): Setpoint index.
+            rate (float, optional): Defaults to 1.0. Playback rate relative to real time, which speeds are scaled by.
+
+        Returns:
+            dict: (goal position, moving speed) tuples keyed by motor ID.
+        """
+        trajectory = self.trajectory
+        goal_index = min(i + 1, len(trajectory) - 1)
+        goals = trajectory.positions[goal_index]
+        speeds = np.maximum(np.abs(trajectory.velocities[i]) * rate, MIN_SPEED)
+        return {m: (float(goals[j]), float(speeds[j])) for j, m in enumerate(trajectory.motors)}
+
+    def tick(self, now):
+        """Stages the setpoint for the current time on the control loop.
+
+        Args:
+            now (float): The current time of the control loop, from time.monotonic().
+
+        Returns:
+            bool: Whether the player needs to keep being ticked.
+        """
+        if self.should_stop():
+            self._finish()
+            return False
+
+        # Hold the setpoint while paused, then carry on from where it was like run() does
+        if self.should_pause():
+            if self._paused_at is None:
+                self._paused_at = now
+            return True
+        if self._paused_at is not None:
+            self._start += now - self._paused_at
+            self._paused_at = None
+
+        if self._sync is None:
+            i = int((now - self._start) / self.trajectory.freq)
+            rate = 1.0
+        else:
+            position = self._sync.update(now)
+            if position is None:
+                if self._clock_timed_out(now):
+                    self._finish()
+                    return False
+                return True
+            i = int(position / self.trajectory.freq)
+            rate = self._sync.rate
+        if i >= len(self.trajectory):
+            self._finish()
+            return False
+        if i < 0:
+            return True
+
+        commands = self.commands(i, rate)
+        self._loop.set_goal_position({m: c[0] for m, c in commands.items()})
+        self._loop.set_moving_speed({m: c[1] for m, c in commands.items()})
+        return True
+
+    def run(self):
+        """Plays the trajectory on this thread, writing every setpoint in one combined write."""
+        freq = self.trajectory.freq
+        i = 0
+        tick = 0
+        while not self.should_stop():
+            if self.should_pause():
+                paused_at = time.monotonic()
+                self.wait_to_resume()
+                self._start += time.monotonic() - paused_at
+
+            # Wait for the deadline of the next setpoint, or the next tick when following a clock
+            deadline = self._start + (i if self._sync is None else tick) * freq
+            sleep_time = deadline - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            tick += 1
+
+            # Skip setpoints whose deadline has passed entirely
+            rate = 1.0
+            if self._sync is None:
+                i = max(i, int((time.monotonic() - self._start) / freq))
+            else:
+                position = self._sync.update(time.monotonic())
+                if position is None:
+                    if self._clock_timed_out(time.monotonic()):
+                        break
+                    continue
+                i = max(i, int(position / freq))
+                rate = self._sync.rate
+            if i >= len(self.trajectory):
+                break
+
+            commands = self.commands(i, rate)
+            self.shimi.controller.set_goal_position_speed_load(
+                {m: (goal, speed, TORQUE_LIMIT) for m, (goal, speed) in commands.items()})
+
+            telemetry = getattr(self.shimi, 'telemetry', None)
+            if telemetry is not None:
+                telemetry.record_commands(time.monotonic(), {m: c[0] for m, c in commands.items()},
+                                          {m: c[1] for m, c in commands.items()})
+            if self._sync is None:
+                i += 1
+
+        self._done.set()
+
+    def _clock_timed_out(self, now):
+        """Checks whether the clock has had longer than clock_timeout to start, printing an error if so."""
+        if now - self._start <= self.clock_timeout:
+            return False
+        print("Clock didn't start within %.1fs, stopping trajectory." % self.clock_timeout)
+        return True
+
+    def _finish(self):
+        self._running.clear()
+        self._done.set()
+
+    def abort(self):
+        """Called by the control loop if ticking this player fails."""
+        self._finish()
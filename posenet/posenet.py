@@ -6,6 +6,7 @@ from pprint import pprint
 import subprocess
 import numpy as np
 from utils.utils import *
+from utils.motor_space import motor_space
 from motion.playback import playback
 from pythonosc import dispatcher as osc_dispatcher
 from pythonosc import osc_server
@@ -247,9 +248,7 @@ class PoseNet:
         pos_matrix = np.array(self.positions)
 
         # Denormalize the position matrix
-        for i in range(pos_matrix.shape[0]):
-            for j, m in enumerate(self.motors):
-                pos_matrix[i, j] = denormalize_position(m, pos_matrix[i, j])
+        pos_matrix = motor_space.denormalize(pos_matrix, self.motors)
 
         # Playback
         playback(self.shimi, self.motors, self.recording_duration,
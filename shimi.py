@@ -1,8 +1,16 @@
 from config.definitions import *
 from motion.move import *
+from motion.control_loop import ControlLoop
+from motion.motor_state import MotorState, POSITION, SPEED
+from motion.trajectory import compile_moves, blend_trajectory, TrajectoryPlayer, BLEND_TIME
+from motion.simulated_io import SimulatedDxlIO
+from motion.telemetry import Telemetry, TELEMETRY_CAPACITY
 import utils.utils as utils
+from utils.bus_profile import load_bus_profile, save_bus_profile
+from concurrent.futures import Future
 import numpy as np
 import pypot.dynamixel
+import threading
 import time
 from pprint import pprint
 
@@ -10,40 +18,180 @@ from pprint import pprint
 class Shimi:
     """Abstraction around Shimi's motor controller."""
 
-    def __init__(self, silent=False):
+    def __init__(self, silent=False, use_control_loop=True, control_freq=0.01, poll_state=True,
+                 state_freq=0.02, state_max_age=0.1, home_async=False, rescan=False, port=None, simulate=False):
         """Sets up motor controller and sets Shimi to initial position.
             silent (bool, optional): Defaults to False. Suppresses print information on motor connections.
+            use_control_loop (bool, optional): Defaults to True. Determines whether Moves are actuated by a single control loop that batches motor writes, or each by their own thread.
+            control_freq (float, optional): Defaults to 0.01. The interval time in seconds between control loop ticks.
+            poll_state (bool, optional): Defaults to True. Determines whether motor position, speed and load are bulk read in the background.
+            state_freq (float, optional): Defaults to 0.02. The interval time in seconds between background state reads.
+            state_max_age (float, optional): Defaults to 0.1. The oldest a cached state value can be, in seconds, before it is read directly from the motors.
+            home_async (bool, optional): Defaults to False. Returns immediately instead of waiting for the motors to reach their initial positions. Motion waits on self.ready before starting.
+            rescan (bool, optional): Defaults to False. Scans for motors even if the cached bus profile is still valid.
+            port (str, optional): Defaults to None. The serial port of this Shimi's motors, or None for the last port connected to (or the first one found).
+            simulate (bool, optional): Defaults to False. Determines whether to use simulated motors instead of connecting to the robot.
         """
+        self.port = port
+        self.control_loop = None
+        self.control_freq = control_freq
+
+        # The gesture currently performing, which perform() preempts
+        self.gesture = None
+        self._gesture_lock = threading.Lock()
+
+        # Commanded vs. actual motion, recorded while set by start_telemetry()
+        self.telemetry = None
+
+        # Resolved once the motors are in their initial positions (or setup failed)
+        self.ready = Future()
+        self._homing_thread = None
+
+        # Always available so callers can read state, directly from the motors if the poller isn't running
+        self.state = MotorState(self, self.all_motors, freq=state_freq, max_age=state_max_age)
+
         try:
             # Setup serial connection to motors and get the controller
-            self.controller = self.setup(silent)
-            self.initial_position()  # Set motors to initial positions
+            if simulate:
+                self.controller = SimulatedDxlIO()
+            else:
+                self.controller = self.setup(silent, rescan, port)
+
+            # Start mirroring motor state
+            if poll_state:
+                self.state.start()
+                self.state.wait_to_start()
+
+            # Start the loop that batches all motor writes
+            if use_control_loop:
+                self.control_loop = ControlLoop(self, freq=control_freq)
+                self.control_loop.start()
+                self.control_loop.wait_to_start()
+
+            # Set motors to initial positions
+            if home_async:
+                self._homing_thread = threading.Thread(target=self._home, kwargs={"raise_errors": False})
+                self._homing_thread.daemon = True
+                self._homing_thread.start()
+            else:
+                self._homing_thread = threading.current_thread()
+                self._home()
         except Exception as e:
+            self.state.stop()
+            if self.control_loop is not None:
+                self.control_loop.stop()
+                self.control_loop = None
             self.controller = None
+            if not self.ready.done():
+                self.ready.set_exception(e)
             print("WARNING, MOTOR ERROR.", e)
 
-    def setup(self, silent):
+    def setup(self, silent, rescan=False, port=None):
         """Establishes serial connection to Shimi's motors.
 
+        Reuses the cached bus profile if every motor in it answers a ping as the same model, otherwise scans and caches
+        the result.
+
         Args:
             silent (bool): Suppresses print information on motor connections.
+            rescan (bool, optional): Defaults to False. Scans for motors even if the cached bus profile is valid.
+            port (str, optional): Defaults to None. The serial port to connect on, or None for the last port connected to (or the first one found).
 
         Returns:
             pypot.dynamixel.DxlIO: The motor controller connected to Shimi's motors.
         """
         ports = pypot.dynamixel.get_available_ports()  # Find USB to serial converter
-        if not silent:
-            print('Connecting on', ports[0])
+
+        # Try the last known configuration first, with one ping per known motor
+        profile = None if rescan else load_bus_profile(port)
+        if profile and profile["port"] in ports:
+            if not silent:
+                print('Connecting on', profile["port"])
+
+            controller = pypot.dynamixel.DxlIO(profile["port"], baudrate=profile["baudrate"])
+            if self._profile_matches(controller, profile):
+                if not silent:
+                    print('Found motors with the following IDs:', profile["ids"])
+                self.port = profile["port"]
+                return controller
+
+            if not silent:
+                print('Motors have changed since the last connection, scanning...')
+            controller.close()
 
         # Connect to first port by default
-        controller = pypot.dynamixel.DxlIO(ports[0])
+        if port is None:
+            port = ports[0]
+
+        if not silent:
+            print('Connecting on', port)
+
+        controller = pypot.dynamixel.DxlIO(port)
         ids = controller.scan(range(10))  # Search for motors with ids 0-9
 
         if not silent:
             print('Found motors with the following IDs:', ids)
 
+        save_bus_profile(port, controller.baudrate, ids, controller.get_model(ids))
+        self.port = port
+
         return controller
 
+    def _profile_matches(self, controller, profile):
+        """Checks a cached bus profile against the motors actually connected.
+
+        Args:
+            controller (pypot.dynamixel.DxlIO): The motor controller connected on the profile's port.
+            profile (dict): The cached bus profile.
+
+        Returns:
+            bool: Whether the profile has motors, every one of which answers a ping and is the model it was saved as.
+        """
+        ids = profile["ids"]
+        if not ids:
+            return False
+        try:
+            if not all(controller.ping(id) for id in ids):
+                return False
+            return list(controller.get_model(ids)) == [profile["models"].get(id) for id in ids]
+        except Exception:
+            return False
+
+    def _home(self, raise_errors=True):
+        """Moves to the initial position and resolves self.ready.
+
+        Args:
+            raise_errors (bool, optional): Defaults to True. Raises motor errors instead of printing them.
+        """
+        try:
+            self.initial_position()
+            self.ready.set_result(True)
+        except Exception as e:
+            self.ready.set_exception(e)
+            if raise_errors:
+                raise
+            print("WARNING, MOTOR ERROR.", e)
+        finally:
+            self._homing_thread = None
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until the motors have reached their initial positions after startup.
+
+        Args:
+            timeout (float, optional): Defaults to None. Maximum time in seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            bool: Whether setup succeeded.
+        """
+        # Homing moves themselves must not wait on homing
+        if threading.current_thread() is self._homing_thread:
+            return True
+
+        try:
+            return self.ready.result(timeout)
+        except Exception:
+            return False
+
     @property
     def torso(self):
         return TORSO
@@ -68,11 +216,12 @@ class Shimi:
     def all_motors(self):
         return [TORSO, NECK_UD, NECK_LR, PHONE, FOOT]
 
-    def initial_position(self, duration=1.0):
+    def initial_position(self, duration=1.0, wait=True):
         """Moves Shimi's motors to the initial position set in config/definitions.
 
         Args:
             duration (float, optional): Defaults to 1.0. Time to take Shimi's motors to their initial positions.
+            wait (bool, optional): Defaults to True. Blocks until the motors are there. Otherwise the movement is performed as a gesture, preempting the current one, and its TrajectoryPlayer is returned.
         """
         self.enable_torque()  # Make sure torque is enabled
         moves = []
@@ -81,6 +230,9 @@ class Shimi:
                 self, m, STARTING_POSITIONS[m], duration, normalized_positions=False)
             moves.append(move)
 
+        if not wait:
+            return self.perform(moves)
+
         # Start all the moves
         for move in moves:
             move.start()
@@ -89,6 +241,92 @@ class Shimi:
         for move in moves:
             move.join()
 
+    def perform(self, moves, blend=BLEND_TIME, start_time=None, clock=None):
+        """Performs a gesture, replacing the one currently performing without returning to the initial position.
+
+        The gesture's Moves are compiled into a trajectory, which is blended in from the motors' measured position and
+        speed over the blend time.
+
+        Args:
+            moves (List[Move]): Moves that have not been started yet, making up the gesture.
+            blend (float, optional): Defaults to BLEND_TIME. Time in seconds to blend from the current motion into the gesture.
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start the gesture, or None to start right away.
+            clock (Clock, optional): Defaults to None. A clock to keep the gesture in sync with, e.g. a MixerClock for the song it goes with, instead of start_time.
+
+        Returns:
+            TrajectoryPlayer: The player performing the gesture.
+        """
+        # Compile while the current gesture keeps going, as it can take a moment for long gestures
+        return self.play(self.compile(moves), blend, start_time, clock)
+
+    def compile(self, moves):
+        """Compiles Moves into a trajectory starting from the motors' current positions.
+
+        Args:
+            moves (List[Move]): Moves that have not been started yet. They are only read, so they can be compiled for any Shimi.
+
+        Returns:
+            Trajectory: Setpoints for every motor the Moves use, at the control loop's rate.
+        """
+        motors = []
+        for move in moves:
+            if move.motor not in motors:
+                motors.append(move.motor)
+
+        return compile_moves(moves, {m: self.state.get_position(m) for m in motors}, freq=self.control_freq)
+
+    def play(self, trajectory, blend=BLEND_TIME, start_time=None, clock=None):
+        """Plays a trajectory as a gesture, replacing the one currently performing. See perform().
+
+        Args:
+            trajectory (Trajectory): The setpoints to play.
+            blend (float, optional): Defaults to BLEND_TIME. Time in seconds to blend from the current motion into the trajectory.
+            start_time (float, optional): Defaults to None. The time.monotonic() time at which to start the trajectory, or None to start right away.
+            clock (Clock, optional): Defaults to None. A clock to keep the trajectory in sync with, instead of start_time.
+
+        Returns:
+            TrajectoryPlayer: The player performing the trajectory.
+        """
+        with self._gesture_lock:
+            if self.gesture is not None:
+                self.gesture.preempted = True
+                self.gesture.stop()
+
+            # Blend from where the motors are now, not from where they were when compiling
+            state = {m: self.state.get(m) for m in trajectory.motors}
+            trajectory = blend_trajectory(trajectory,
+                                          {m: s[POSITION] for m, s in state.items()},
+                                          {m: s[SPEED] for m, s in state.items()},
+                                          blend)
+
+            self.gesture = TrajectoryPlayer(self, trajectory, start_time, clock)
+            self.gesture.start()
+            return self.gesture
+
+    def start_telemetry(self, capacity=TELEMETRY_CAPACITY):
+        """Starts recording commanded and actual motion of every gesture, Move and playback, replacing any previous recording.
+
+        Actual positions come from the state poller's reads, so nothing extra is read from the motors.
+
+        Args:
+            capacity (int, optional): Defaults to TELEMETRY_CAPACITY. The most commands, and the most state readings, to record.
+
+        Returns:
+            Telemetry: The telemetry being recorded.
+        """
+        self.telemetry = Telemetry(self.all_motors, capacity)
+        return self.telemetry
+
+    def stop_telemetry(self):
+        """Stops recording telemetry.
+
+        Returns:
+            Telemetry: What was recorded, or None if nothing was being recorded.
+        """
+        telemetry = self.telemetry
+        self.telemetry = None
+        return telemetry
+
     def disable_torque(self):
         """Turns off torque for Shimi's motors so they can be moved by hand."""
         self.controller.disable_torque(self.all_motors)
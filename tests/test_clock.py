@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.clock import Clock, ClockSync, MAX_STRETCH, RESYNC_ERROR
+import pytest
+
+
+class ManualClock(Clock):
+    """A clock set by hand."""
+
+    def __init__(self, t=None):
+        self.t = t
+        Clock.__init__(self, lambda: self.t)
+
+
+def test_waits_for_clock_to_start():
+    clock = ManualClock()
+    sync = ClockSync(clock)
+    assert sync.update(0.0) is None
+    clock.t = -0.5
+    assert sync.update(0.1) is None
+    clock.t = 0.2
+    assert sync.update(0.2) == pytest.approx(0.2)
+
+
+def test_follows_clock_in_sync():
+    clock = ManualClock(0.0)
+    sync = ClockSync(clock)
+    for i in range(200):
+        clock.t = i * 0.01
+        position = sync.update(i * 0.01)
+    assert position == pytest.approx(clock.t)
+    assert sync.rate == pytest.approx(1.0)
+
+
+def test_stretches_to_catch_up_with_drift():
+    clock = ManualClock(0.0)
+    sync = ClockSync(clock, tolerance=0.04)
+    sync.update(0.0)
+
+    # The clock jumps ahead by more than the tolerance, but not enough to resync
+    clock.t = 0.11
+    sync.update(0.01)
+    assert 1.0 < sync.rate <= 1.0 + MAX_STRETCH
+
+    drift = clock.t - sync.position
+    for i in range(2, 200):
+        clock.t = 0.1 + i * 0.01
+        sync.update(i * 0.01)
+    assert abs(clock.t - sync.position) < min(drift, 0.04)
+
+
+def test_slows_down_when_ahead():
+    clock = ManualClock(0.0)
+    sync = ClockSync(clock, tolerance=0.04)
+    sync.update(0.0)
+    clock.t = -0.09 + 0.01
+    sync.update(0.01)
+    assert 1.0 - MAX_STRETCH <= sync.rate < 1.0
+
+
+def test_resyncs_on_large_drift():
+    clock = ManualClock(0.0)
+    sync = ClockSync(clock)
+    sync.update(0.0)
+    clock.t = 0.01 + 2 * RESYNC_ERROR
+    assert sync.update(0.01) == pytest.approx(clock.t)
+    assert sync.rate == 1.0
+
+
+def test_carries_on_when_clock_stops():
+    clock = ManualClock(0.0)
+    sync = ClockSync(clock)
+    sync.update(0.0)
+    clock.t = None
+    assert sync.update(0.5) == pytest.approx(0.5)
+    assert sync.rate == 1.0
@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.gesture_file import Gesture, save_gesture, load_gesture, convert_pickle
+import numpy as np
+import pickle
+import pytest
+
+
+def make_gesture(num_samples):
+    timestamps = np.linspace(0, 1, num_samples)
+    positions = np.column_stack([np.sin(timestamps), np.cos(timestamps)]) * 90
+    velocities = np.abs(np.gradient(positions, axis=0)) if num_samples > 1 else np.zeros((num_samples, 2))
+    return Gesture([1, 3], timestamps, positions, velocities, duration=1.0, freq=0.01)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("num_samples", [0, 1, 100])
+def test_round_trip(tmp_path, compress, mmap, num_samples):
+    gesture = make_gesture(num_samples)
+    path = str(tmp_path / "test.gesture")
+    save_gesture(path, gesture, compress)
+    loaded = load_gesture(path, mmap=mmap)
+
+    assert loaded.motors == [1, 3]
+    assert loaded.duration == 1.0
+    assert len(loaded) == num_samples
+    # Samples are stored as float32
+    np.testing.assert_allclose(loaded.timestamps, gesture.timestamps, rtol=1e-6)
+    np.testing.assert_allclose(loaded.positions, gesture.positions, rtol=1e-6)
+    np.testing.assert_allclose(loaded.velocities, gesture.velocities, rtol=1e-6)
+
+
+def test_convert_pickle(tmp_path):
+    pickle_path = str(tmp_path / "old.p")
+    with open(pickle_path, "wb") as f:
+        pickle.dump({"motors": [1, 3], "timestamps": [0.0, 0.5], "positions": [[1.0, 2.0], [3.0, 4.0]],
+                     "velocities": [[0.0, 0.0], [4.0, 4.0]], "duration": 0.5}, f)
+
+    loaded = load_gesture(convert_pickle(pickle_path))
+    np.testing.assert_allclose(loaded.positions, [[1.0, 2.0], [3.0, 4.0]])
+    assert loaded.duration == 0.5
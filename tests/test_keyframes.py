@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.keyframes import simplify, reduce_plan
+from motion.playback import PlaybackPlan, INTERP_FREQ
+from motion.trajectory import MIN_SPEED
+import numpy as np
+import pytest
+
+
+def make_curve(n=400, seed=0):
+    rng = np.random.RandomState(seed)
+    times = np.arange(n) * INTERP_FREQ
+    positions = 40 * np.sin(times * 2.1) + 15 * np.sin(times * 7.3 + 1.0) + rng.normal(0, 0.3, n)
+    return times, positions
+
+
+@pytest.mark.parametrize("tolerance", [0.1, 0.5, 2.0, 10.0])
+def test_simplify_stays_within_tolerance(tolerance):
+    times, positions = make_curve()
+    keyframes = simplify(times, positions, tolerance)
+
+    assert keyframes[0] == 0
+    assert keyframes[-1] == len(positions) - 1
+    assert np.all(np.diff(keyframes) > 0)
+    errors = np.abs(np.interp(times, times[keyframes], positions[keyframes]) - positions)
+    assert errors.max() <= tolerance + 1e-9
+
+
+def test_simplify_drops_points_on_a_line():
+    times = np.linspace(0, 2, 50)
+    np.testing.assert_array_equal(simplify(times, 3 * times - 1, 0.01), [0, 49])
+
+
+@pytest.mark.parametrize("n", [0, 1, 2])
+def test_simplify_short_curves(n):
+    np.testing.assert_array_equal(simplify(np.arange(n, dtype=float), np.arange(n, dtype=float)), np.arange(n))
+
+
+@pytest.mark.parametrize("tolerance", [0.2, 1.0, 5.0])
+def test_reduce_plan_stays_within_tolerance(tolerance):
+    times, first = make_curve(seed=1)
+    _, second = make_curve(seed=2)
+    pos_matrix = np.column_stack((first, -second))
+    n = len(times)
+    plan = PlaybackPlan([1, 3], times[-1], times, pos_matrix, np.ones((n, 2)), np.zeros((n, 2)), np.zeros((n, 2)))
+
+    reduced = reduce_plan(plan, tolerance)
+    assert reduced.speeds.shape == plan.speeds.shape
+    for i in range(2):
+        ticks = np.flatnonzero(~np.isnan(reduced.goals[:, i]))
+        np.testing.assert_array_equal(ticks, np.flatnonzero(~np.isnan(reduced.speeds[:, i])))
+        assert ticks[0] == 0
+
+        # Each goal is reached when the next one is sent, and the last one at the end
+        keyframe_times = np.append(times[ticks], times[-1])
+        keyframe_positions = np.append(pos_matrix[0, i], reduced.goals[ticks, i])
+        errors = np.abs(np.interp(times, keyframe_times, keyframe_positions) - pos_matrix[:, i])
+        assert errors.max() <= tolerance + 1e-9
+
+        expected_speeds = np.maximum(np.abs(np.diff(keyframe_positions)) / np.diff(keyframe_times), MIN_SPEED)
+        np.testing.assert_allclose(reduced.speeds[ticks, i], expected_speeds)
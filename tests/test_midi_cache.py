@@ -0,0 +1,79 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from audio.midi_cache import MidiAnalysisCache, MidiFeatures
+import numpy as np
+
+
+def write(path, content, mtime):
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def make_features(path):
+    return MidiFeatures(path, [0.0, 4.0], [120.0, 90.0], 16, [0.0, 0.5, 1.0], [0.5, 1.0, 2.0], [60, 64, 67], 48, 19,
+                        [0.0, 2.0, 4.0], ["C", "G", "C"], ["major", "major", "minor"])
+
+
+def test_key_follows_content(tmp_path):
+    cache = MidiAnalysisCache(cache_dir=None)
+    path = str(tmp_path / "a.mid")
+    write(path, b"first", 1000)
+    first = cache.key(path)
+    assert cache.key(path) == first
+
+    # Same size, new content and time
+    write(path, b"other", 2000)
+    assert cache.key(path) != first
+
+    # Back to the old content, and the same content elsewhere, share the old key
+    write(path, b"first", 3000)
+    assert cache.key(path) == first
+    copy = str(tmp_path / "b.mid")
+    write(copy, b"first", 4000)
+    assert cache.key(copy) == first
+
+
+def test_key_isnt_rehashed_while_unchanged(tmp_path, monkeypatch):
+    cache = MidiAnalysisCache(cache_dir=None)
+    path = str(tmp_path / "a.mid")
+    write(path, b"first", 1000)
+    key = cache.key(path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("hashed again")
+
+    monkeypatch.setattr("audio.midi_cache.hashlib.sha1", fail)
+    assert cache.key(path) == key
+
+
+def test_analysis_is_read_from_disk_cache(tmp_path):
+    path = str(tmp_path / "a.mid")
+    write(path, b"first", 1000)
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    cache = MidiAnalysisCache(cache_dir=str(cache_dir))
+    saved = make_features("elsewhere.mid")
+    saved.save(str(cache_dir / (cache.key(path) + ".npz")))
+
+    # Served without parsing the file, which isn't really MIDI
+    features = cache.analyze(path)
+    assert features.path == path
+    np.testing.assert_array_equal(features.note_pitches, saved.note_pitches)
+    np.testing.assert_array_equal(features.key_modes, saved.key_modes)
+    assert features.num_beats == 16
+    assert cache.analyze(path) is features
+
+
+def test_features_round_trip(tmp_path):
+    features = make_features("a.mid")
+    features.save(str(tmp_path / "f.npz"))
+    loaded = MidiFeatures.load(str(tmp_path / "f.npz"))
+
+    assert loaded.path == "a.mid"
+    for name in ["tempo_change_times", "tempi", "note_starts", "note_ends", "note_pitches", "downbeats",
+                 "key_tonics", "key_modes"]:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(features, name))
+    assert (loaded.lowest, loaded.pitch_range) == (48, 19)
@@ -0,0 +1,75 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from audio.midi_cache import MidiAnalysisCache
+from motion.phrase_plans import PhrasePlanStore, PHRASE_SEED
+import pytest
+
+PLAN = [{"motor": 1, "segments": [[10.0, 0.5, 0.0]]}]
+
+
+@pytest.fixture
+def midi_path(tmp_path):
+    path = str(tmp_path / "a.mid")
+    with open(path, "wb") as f:
+        f.write(b"first")
+    os.utime(path, (1000, 1000))
+    return path
+
+
+def make_store(cache_dir=None):
+    return PhrasePlanStore(cache_dir=cache_dir, midi_cache=MidiAnalysisCache(cache_dir=None))
+
+
+def test_key_covers_emotion_seed_and_movement(midi_path):
+    store = make_store()
+    key = store.key(midi_path, 0.5, -0.5, PHRASE_SEED)
+    assert store.key(midi_path, 0.5, -0.5, PHRASE_SEED) == key
+    # Ints and floats of the same emotion are the same gesture
+    assert store.key(midi_path, 1, -1, PHRASE_SEED) == store.key(midi_path, 1.0, -1.0, PHRASE_SEED)
+
+    others = [store.key(midi_path, 0.25, -0.5, PHRASE_SEED), store.key(midi_path, 0.5, 0.5, PHRASE_SEED),
+              store.key(midi_path, 0.5, -0.5, PHRASE_SEED + 1), store.key(midi_path, 0.5, -0.5, None),
+              store.key(midi_path, 0.5, -0.5, PHRASE_SEED, random_movement=True)]
+    assert len(set(others + [key])) == len(others) + 1
+
+
+def test_key_changes_with_midi_content(midi_path):
+    store = make_store()
+    key = store.key(midi_path, 0.0, 0.0, PHRASE_SEED)
+    with open(midi_path, "wb") as f:
+        f.write(b"other")
+    os.utime(midi_path, (2000, 2000))
+    assert store.key(midi_path, 0.0, 0.0, PHRASE_SEED) != key
+
+
+def test_key_changes_with_plan_version(midi_path, monkeypatch):
+    store = make_store()
+    key = store.key(midi_path, 0.0, 0.0, PHRASE_SEED)
+    monkeypatch.setattr("motion.phrase_plans.PHRASE_PLAN_VERSION", -1)
+    assert store.key(midi_path, 0.0, 0.0, PHRASE_SEED) != key
+
+
+def test_plans_survive_restarts(midi_path, tmp_path):
+    cache_dir = str(tmp_path / "plans")
+    store = make_store(cache_dir)
+    key = store.key(midi_path, 0.0, 0.0, PHRASE_SEED)
+    assert store.get(key) is None
+    assert key not in store
+    store.put(key, PLAN)
+    assert store.get(key) == PLAN
+
+    store = make_store(cache_dir)
+    assert key in store
+    assert store.get(key) == PLAN
+
+
+def test_memory_is_bounded(midi_path):
+    store = PhrasePlanStore(cache_dir=None, capacity=2, midi_cache=MidiAnalysisCache(cache_dir=None))
+    keys = [store.key(midi_path, v, 0.0, PHRASE_SEED) for v in [-1.0, 0.0, 1.0]]
+    for key in keys:
+        store.put(key, PLAN)
+    assert store.get(keys[0]) is None
+    assert store.get(keys[1]) == PLAN
+    assert store.get(keys[2]) == PLAN
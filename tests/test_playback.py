@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.playback import plan_playback, direction_changes, load_playback_plan
+import numpy as np
+
+
+def test_direction_changes_without_steps():
+    # Every drop is exactly 0.009, so no step meets either condition
+    times = np.arange(3.0)
+    positions = np.array([0.0, -0.009, -0.018])
+    change_times, change_positions = direction_changes(times, positions, True)
+    assert len(change_times) == 0
+    assert len(change_positions) == 0
+
+
+def test_plan_playback_of_very_short_gesture():
+    timestamps = np.linspace(0, 0.02, 8)
+    plan = plan_playback([1], 0.02, timestamps, np.linspace(0, 1, 8)[:, np.newaxis], np.ones((8, 1)))
+    assert plan.goals.shape[1] == 1
+
+
+def test_playback_plan_round_trip(tmp_path):
+    timestamps = np.linspace(0, 1, 50)
+    pos_matrix = np.column_stack((np.sin(timestamps * 6) * 30, timestamps * 20))
+    plan = plan_playback([1, 3], 1.0, timestamps, pos_matrix, np.full((50, 2), 10.0))
+    path = str(tmp_path / "plan.npz")
+    plan.save(path)
+
+    loaded = load_playback_plan(path)
+    assert loaded.motors == [1, 3]
+    assert loaded.duration == 1.0
+    for name in ["timestamps", "pos_matrix", "vel_matrix", "speeds", "goals"]:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(plan, name))
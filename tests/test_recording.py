@@ -0,0 +1,130 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.recording import Recording
+import numpy as np
+import pytest
+
+MOTORS = [1, 3]
+
+
+def make_recording(n=50, freq=0.05, motors=MOTORS, seed=0):
+    rng = np.random.RandomState(seed)
+    timestamps = np.arange(n) * freq
+    return Recording(motors, timestamps, rng.uniform(-90, 90, (n, len(motors))),
+                     rng.uniform(-200, 200, (n, len(motors))), timestamps[-1], freq)
+
+
+def as_lists(recording):
+    """The recording in the list-of-tuples form the old Recorder kept."""
+    return (list(recording.timestamps), [tuple(p) for p in recording.positions],
+            [tuple(v) for v in recording.velocities], recording.duration)
+
+
+def old_append_recording(this, other):
+    """Recorder.append_recording as it was before Recording."""
+    timestamps, positions, velocities, duration = as_lists(this)
+    other_timestamps, other_positions, other_velocities, other_duration = as_lists(other)
+    delta_t = timestamps[1] - timestamps[0]
+    timestamps += list(map(lambda t: t + timestamps[-1] + delta_t, other_timestamps))
+    return timestamps, positions + other_positions, velocities + other_velocities, duration + other_duration
+
+
+def old_add_motor_recording(this, other):
+    """Recorder.add_motor_recording as it was before Recording."""
+    timestamps, positions, velocities, _ = as_lists(this)
+    new_pos_matrix = np.array(other.positions)
+    new_vel_matrix = np.array(other.velocities)
+    for i, _ in enumerate(other.motors):
+        for j, t in enumerate(timestamps):
+            positions[j] = positions[j] + (np.interp(t, other.timestamps, new_pos_matrix[:, i]),)
+            velocities[j] = velocities[j] + (np.interp(t, other.timestamps, new_vel_matrix[:, i]),)
+    return positions, velocities
+
+
+def test_concat_matches_old_append():
+    a, b = make_recording(40, seed=1), make_recording(25, seed=2)
+    combined = a.concat(b)
+    timestamps, positions, velocities, duration = old_append_recording(a, b)
+
+    np.testing.assert_allclose(combined.timestamps, timestamps)
+    np.testing.assert_allclose(combined.positions, positions)
+    np.testing.assert_allclose(combined.velocities, velocities)
+    assert combined.duration == pytest.approx(duration)
+    assert combined.freq == a.freq
+
+
+def test_concat_gap_and_empty():
+    a, b = make_recording(10, seed=1), make_recording(10, seed=2)
+    combined = a.concat(b, gap=1.0)
+    assert combined.timestamps[10] == pytest.approx(a.timestamps[-1] + 1.0)
+
+    combined = Recording.empty(MOTORS).concat(b)
+    np.testing.assert_allclose(combined.timestamps, b.timestamps)
+    np.testing.assert_allclose(combined.positions, b.positions)
+
+
+def test_concat_rejects_different_motors():
+    with pytest.raises(ValueError):
+        make_recording(motors=[1, 3]).concat(make_recording(motors=[1, 2]))
+
+
+def test_merge_matches_old_add_motor_recording():
+    a = make_recording(40, seed=1)
+    # Sampled on different times than a, so the new motors are interpolated
+    b = Recording([2, 5], np.linspace(0.0, 2.5, 33), np.random.RandomState(3).uniform(-90, 90, (33, 2)),
+                  np.random.RandomState(4).uniform(-200, 200, (33, 2)), 2.5)
+    merged = a.merge(b)
+    positions, velocities = old_add_motor_recording(a, b)
+
+    assert merged.motors == [1, 3, 2, 5]
+    np.testing.assert_allclose(merged.timestamps, a.timestamps)
+    np.testing.assert_allclose(merged.positions, positions)
+    np.testing.assert_allclose(merged.velocities, velocities)
+    assert merged.duration == a.duration
+
+
+def test_merge_rejects_shared_motors():
+    with pytest.raises(ValueError):
+        make_recording(motors=[1, 3]).merge(make_recording(motors=[3, 4]))
+
+
+@pytest.mark.parametrize("start, end", [(None, None), (0.5, None), (None, 1.2), (0.52, 1.23), (0.0, 0.0)])
+def test_slice_keeps_samples_in_range(start, end):
+    r = make_recording(50)
+    s = r.slice(start, end)
+    lo = 0.0 if start is None else start
+    hi = r.duration if end is None else end
+    keep = (r.timestamps >= lo - 1e-9) & (r.timestamps <= hi + 1e-9)
+
+    np.testing.assert_allclose(s.timestamps, r.timestamps[keep] - lo)
+    np.testing.assert_allclose(s.positions, r.positions[keep])
+    np.testing.assert_allclose(s.velocities, r.velocities[keep])
+    assert s.duration == pytest.approx(hi - lo)
+
+
+def test_slice_without_rezero():
+    r = make_recording(50)
+    s = r.slice(1.0, 2.0, rezero=False)
+    assert s.timestamps[0] == pytest.approx(1.0)
+    assert s.timestamps[-1] == pytest.approx(2.0)
+
+
+def test_nearest_index_matches_old_argmin():
+    r = make_recording(50)
+    for t in np.linspace(-0.5, 3.0, 200):
+        assert r.nearest_index(t) == int(np.abs(r.timestamps - t).argmin())
+
+
+def test_resample():
+    r = Recording(MOTORS, [0.0, 0.1, 0.35, 0.4, 1.0], np.arange(10).reshape(5, 2) ** 2,
+                  -np.arange(10).reshape(5, 2), 1.0)
+    s = r.resample(0.05)
+
+    np.testing.assert_allclose(s.timestamps, np.arange(21) * 0.05)
+    for i in range(len(MOTORS)):
+        np.testing.assert_allclose(s.positions[:, i], np.interp(s.timestamps, r.timestamps, r.positions[:, i]))
+        np.testing.assert_allclose(s.velocities[:, i], np.interp(s.timestamps, r.timestamps, r.velocities[:, i]))
+    assert s.freq == 0.05
+    assert s.duration == r.duration
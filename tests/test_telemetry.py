@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from config.definitions import MAX_SPEED
+from motion.telemetry import Telemetry
+import numpy as np
+import pytest
+
+
+def test_no_setpoint_before_first_command():
+    telemetry = Telemetry([1])
+    telemetry.record_state(0.0, {1: (0.0, 0.0, 0.0)})
+    telemetry.record_commands(1.0, goals={1: 10.0}, speeds={1: 5.0})
+    setpoints = telemetry.setpoints(1, np.array([0.5, 1.0]))
+    assert np.isnan(setpoints[0])
+    assert setpoints[1] == pytest.approx(0.0)
+
+
+def test_moves_toward_goal_at_commanded_speed():
+    telemetry = Telemetry([1, 3])
+    telemetry.record_state(0.0, {1: (0.0, 0.0, 0.0), 3: (-20.0, 0.0, 0.0)})
+    telemetry.record_state(2.0, {1: (20.0, 0.0, 0.0), 3: (-20.0, 0.0, 0.0)})
+    telemetry.record_commands(1.0, goals={1: 30.0}, speeds={1: 10.0})
+
+    # Starts from the readings interpolated at the command, then stops at the goal
+    setpoints = telemetry.setpoints(1, np.array([1.0, 1.5, 2.0, 2.9, 3.0, 10.0]))
+    np.testing.assert_allclose(setpoints, [10.0, 15.0, 20.0, 29.0, 30.0, 30.0])
+
+    # A motor without commands has no setpoint
+    assert np.all(np.isnan(telemetry.setpoints(3, np.array([1.0, 5.0]))))
+
+
+def test_later_commands_carry_over_what_they_dont_set():
+    telemetry = Telemetry([1])
+    telemetry.record_state(0.0, {1: (0.0, 0.0, 0.0)})
+    telemetry.record_commands(0.0, goals={1: 100.0}, speeds={1: 10.0})
+    # New speed, same goal
+    telemetry.record_commands(1.0, speeds={1: 20.0})
+    # New goal, same speed
+    telemetry.record_commands(2.0, goals={1: 0.0})
+
+    setpoints = telemetry.setpoints(1, np.array([0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0]))
+    np.testing.assert_allclose(setpoints, [5.0, 10.0, 20.0, 30.0, 20.0, 10.0, 0.0])
+
+
+def test_zero_speed_is_max_speed():
+    telemetry = Telemetry([1])
+    telemetry.record_commands(0.0, goals={1: 0.0})
+    telemetry.record_commands(1.0, goals={1: 1000.0}, speeds={1: 0.0})
+    setpoints = telemetry.setpoints(1, np.array([1.0, 1.5, 3.0]))
+    np.testing.assert_allclose(setpoints, [0.0, MAX_SPEED * 0.5, 1000.0])
+
+
+def test_setpoints_from_extended_data():
+    worker = Telemetry([1])
+    worker.record_state(0.0, {1: (0.0, 0.0, 0.0)})
+    worker.record_commands(0.0, goals={1: -10.0}, speeds={1: 5.0})
+
+    telemetry = Telemetry([1])
+    telemetry.extend(worker.data())
+    times = np.array([0.0, 1.0, 4.0])
+    np.testing.assert_allclose(telemetry.setpoints(1, times), worker.setpoints(1, times))
+    np.testing.assert_allclose(telemetry.setpoints(1, times), [0.0, -5.0, -10.0])
@@ -0,0 +1,140 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from motion.move import Segment
+from motion.timeline import Timeline
+import itertools
+import numpy as np
+import pytest
+
+
+def endless_segments(seed=0):
+    rng = np.random.RandomState(seed)
+    while True:
+        yield Segment(float(rng.uniform(0, 1)), float(rng.uniform(0.1, 1.0)), delay=float(rng.uniform(0, 0.5)))
+
+
+def test_forget_before_keeps_later_positions():
+    times = np.linspace(0, 200, 2001)
+    expected = Timeline(endless_segments()).positions_at(times)
+
+    timeline = Timeline(endless_segments())
+    for i, t in enumerate(times):
+        assert timeline.position_at(t) == pytest.approx(expected[i])
+        timeline.forget_before(t)
+        assert timeline.starts[0] <= t or len(timeline) == 1
+    # Only the movements around the last query are left
+    assert len(timeline) <= 2
+
+
+def test_forget_before_keeps_last_movement():
+    timeline = Timeline()
+    timeline.extend([Segment(1.0, 1.0), Segment(2.0, 1.0)])
+    timeline.forget_before(10.0)
+    assert len(timeline) == 1
+    assert timeline.position_at(10.0) == 2.0
+
+    timeline.append(4.0, 1.0)
+    assert timeline.position_at(2.5) == pytest.approx(3.0)
+
+
+def test_forget_before_empty():
+    timeline = Timeline()
+    timeline.forget_before(1.0)
+    assert len(timeline) == 0
+    assert timeline.position_at(1.0) is None
+
+
+def test_memory_stays_bounded():
+    timeline = Timeline(endless_segments())
+    for t in itertools.islice(itertools.count(), 0, 5000, 3):
+        timeline.position_at(float(t))
+        timeline.forget_before(float(t))
+    # Thousands of movements were pulled, but never more than a few at once
+    assert len(timeline._ends) == 64
+
+
+def brute_force_position(segments, t, initial_position=None):
+    """Walks the movements one by one to find the position at t."""
+    end = 0.0
+    previous = initial_position
+    for position, duration, delay in segments:
+        if previous is None:
+            previous = position
+        start = end + delay
+        end = start + duration
+        if t <= start:
+            return previous
+        if t <= end:
+            return previous + (position - previous) * (t - start) / duration
+        previous = position
+    return previous
+
+
+@pytest.mark.parametrize("initial_position", [None, 0.25])
+def test_position_at_matches_brute_force(initial_position):
+    rng = np.random.RandomState(1)
+    segments = [(float(rng.uniform(0, 1)), float(rng.uniform(0.1, 1.0)), float(rng.choice([0.0, 0.3])))
+                for _ in range(100)]
+    timeline = Timeline(initial_position=initial_position)
+    for position, duration, delay in segments:
+        timeline.append(position, duration, delay)
+
+    times = np.concatenate((np.linspace(-1, timeline.end + 1, 3001), timeline.starts, timeline.ends))
+    for t in times:
+        assert timeline.position_at(t) == pytest.approx(brute_force_position(segments, t, initial_position))
+
+
+def test_positions_at_matches_position_at():
+    timeline = Timeline(endless_segments(2))
+    times = np.random.RandomState(3).uniform(-1, 100, 1000)
+    positions = timeline.positions_at(times)
+    np.testing.assert_allclose(positions, [timeline.position_at(t) for t in times])
+
+    # Zero length movements jump straight to their position
+    timeline = Timeline()
+    timeline.extend([Segment(1.0, 0.0, delay=1.0), Segment(2.0, 1.0)])
+    np.testing.assert_allclose(timeline.positions_at([0.5, 1.0, 1.5, 3.0]),
+                               [timeline.position_at(t) for t in [0.5, 1.0, 1.5, 3.0]])
+
+
+def test_delays_hold_the_previous_position():
+    timeline = Timeline(initial_position=0.0)
+    timeline.extend([Segment(10.0, 1.0), Segment(20.0, 1.0, delay=2.0)])
+    np.testing.assert_allclose(timeline.starts, [0.0, 3.0])
+    np.testing.assert_allclose(timeline.ends, [1.0, 4.0])
+    np.testing.assert_allclose(timeline.positions_at([0.5, 1.0, 2.0, 3.0, 3.5, 5.0]),
+                               [5.0, 10.0, 10.0, 10.0, 15.0, 20.0])
+
+
+def test_source_is_pulled_lazily():
+    pulled = []
+
+    def segments():
+        for i in itertools.count():
+            pulled.append(i)
+            yield Segment(float(i), 1.0)
+
+    timeline = Timeline(segments())
+    assert len(pulled) == 0
+    assert timeline.position_at(2.5) == pytest.approx(1.5)
+    assert len(pulled) == 3
+    timeline.positions_at([0.0, 9.5])
+    assert len(pulled) == 10
+    assert timeline.position_at(1.0) == pytest.approx(0.0)
+    assert len(pulled) == 10
+
+
+def test_finite_source_runs_out():
+    timeline = Timeline([Segment(1.0, 1.0), Segment(2.0, 1.0)])
+    assert timeline.position_at(100.0) == 2.0
+    assert timeline.source is None
+    assert len(timeline) == 2
+
+
+def test_empty():
+    timeline = Timeline()
+    assert timeline.position_at(0.0) is None
+    assert timeline.positions_at([0.0]) is None
+    assert timeline.end == 0.0
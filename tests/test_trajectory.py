@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..'))
+from shimi import Shimi
+from motion.clock import Clock
+from motion.trajectory import Trajectory, TrajectoryPlayer
+import numpy as np
+import threading
+import pytest
+
+
+@pytest.mark.parametrize("use_control_loop", [True, False])
+def test_player_gives_up_on_clock_that_never_starts(use_control_loop):
+    shimi = Shimi(silent=True, simulate=True, use_control_loop=use_control_loop)
+    trajectory = Trajectory([shimi.torso], 0.01, np.full((50, 1), 10.0), np.zeros((50, 1)))
+    player = TrajectoryPlayer(shimi, trajectory, clock=Clock(lambda: None), clock_timeout=0.2)
+    player.start()
+
+    joined = threading.Thread(target=player.join)
+    joined.daemon = True
+    joined.start()
+    joined.join(5.0)
+    assert not joined.is_alive()
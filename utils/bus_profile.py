@@ -0,0 +1,90 @@
+from config.definitions import BUS_PROFILE_PATH
+import threading
+import json
+import os
+
+# Robots in a fleet connect in parallel and may all save at once
+_lock = threading.Lock()
+
+
+def _read_profiles(path):
+    """Reads every cached bus profile, keyed by port, and the last port saved."""
+    if not os.path.exists(path):
+        return {"last": None, "ports": {}}
+    with open(path, "r") as f:
+        profiles = json.load(f)
+
+    # Older files hold a single profile, which becomes that port's
+    if "ports" not in profiles:
+        port = profiles.get("port")
+        if port is None:
+            return {"last": None, "ports": {}}
+        return {"last": port, "ports": {port: profiles}}
+    return profiles
+
+
+def load_bus_profile(port=None, path=BUS_PROFILE_PATH):
+    """Loads the last known motor bus configuration of a port.
+
+    Args:
+        port (str, optional): Defaults to None. The serial port, or None for the last port a profile was saved for.
+        path (str, optional): Defaults to BUS_PROFILE_PATH. Path to the bus profile JSON file.
+
+    Returns:
+        dict: The profile with port, baudrate, ids and models keys, or None if there isn't a readable one.
+    """
+    try:
+        profiles = _read_profiles(path)
+        if port is None:
+            port = profiles["last"]
+
+        profile = profiles["ports"].get(port)
+        if profile is None:
+            return None
+
+        profile["ids"] = [int(i) for i in profile["ids"]]
+        profile["models"] = {int(i): m for i, m in profile.get("models", {}).items()}
+        return profile
+    except Exception as e:
+        print("Unable to read bus profile, ignoring it.", e)
+        return None
+
+
+def save_bus_profile(port, baudrate, ids, models, path=BUS_PROFILE_PATH):
+    """Persists a motor bus configuration discovered by scanning, alongside those of other ports.
+
+    Args:
+        port (str): The serial port the motors were found on.
+        baudrate (int): The baudrate of the connection.
+        ids (List[int]): The motor IDs found.
+        models (List[str]): The model of each motor in ids.
+        path (str, optional): Defaults to BUS_PROFILE_PATH. Path to the bus profile JSON file.
+    """
+    # Nothing answered, e.g. the motors are off, so there's nothing worth reusing next time
+    if not ids:
+        print("No motors found on %s, not saving a bus profile." % port)
+        return
+
+    profile = {
+        "port": port,
+        "baudrate": baudrate,
+        "ids": list(ids),
+        "models": {str(i): m for i, m in zip(ids, models)}
+    }
+
+    try:
+        with _lock:
+            try:
+                profiles = _read_profiles(path)
+            except Exception:
+                profiles = {"last": None, "ports": {}}
+            profiles["ports"][port] = profile
+            profiles["last"] = port
+
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(path, "w") as f:
+                json.dump(profiles, f, indent=2)
+    except Exception as e:
+        print("Unable to save bus profile.", e)
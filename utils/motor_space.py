@@ -0,0 +1,175 @@
+from config.definitions import *
+import numpy as np
+
+
+class Quantizer:
+    """Quantizes values to the closest of a fixed list of options, with the decision boundaries precomputed."""
+
+    def __init__(self, quant):
+        """Precomputes the midpoints between options.
+
+        Args:
+            quant (List[float]): Quantized value options, in ascending order.
+        """
+        self.quant = list(quant)
+        self.values = np.asarray(self.quant, dtype=np.float64)
+        self.mids = (self.values[:-1] + self.values[1:]) / 2.0
+
+        # For bisecting one value at a time without going through NumPy
+        self.mid_list = [(self.quant[i] + self.quant[i + 1]) / 2.0 for i in range(len(self.quant) - 1)]
+
+    def index(self, values):
+        """Gets the index of the closest option for each value.
+
+        Args:
+            values (np.ndarray or float): Values to quantize, of any shape.
+
+        Returns:
+            np.ndarray or int: Option indices, shaped like values.
+        """
+        return np.searchsorted(self.mids, values, side='right')
+
+    def __call__(self, values):
+        """Quantizes values.
+
+        Args:
+            values (np.ndarray or float): Values to quantize, of any shape.
+
+        Returns:
+            np.ndarray: The closest option to each value, shaped like values.
+        """
+        return self.values[self.index(values)]
+
+
+class MotorSpace:
+    """Angle limits and starting positions as arrays indexed by motor, for math on whole trajectories at once.
+
+    Matrices are shaped (n_samples, n_motors), with columns in the order of the motors passed to each call (all of
+    the space's motors by default). Any array whose last axis is the motors works, including a single row.
+    """
+
+    def __init__(self, motors=None, angle_limits=ANGLE_LIMITS, starting_positions=STARTING_POSITIONS):
+        """Builds the limit and starting position tables.
+
+        Args:
+            motors (List[int], optional): Defaults to None. Motor IDs in column order, or None for all motors in angle_limits.
+            angle_limits (dict, optional): Defaults to ANGLE_LIMITS. [min, max] angles in degrees, keyed by motor ID.
+            starting_positions (dict, optional): Defaults to STARTING_POSITIONS. Starting positions in degrees, keyed by motor ID.
+        """
+        if motors is None:
+            motors = sorted(angle_limits.keys())
+        self.motors = list(motors)
+        self.columns = {m: i for i, m in enumerate(self.motors)}
+
+        self.low = np.array([angle_limits[m][0] for m in self.motors], dtype=np.float64)
+        self.high = np.array([angle_limits[m][1] for m in self.motors], dtype=np.float64)
+        self.span = self.high - self.low
+        self.starting_positions = np.array([starting_positions.get(m, 0.0) for m in self.motors], dtype=np.float64)
+
+        # Plain float copies for the scalar helpers, which are faster than indexing arrays one value at a time
+        self._scalar_limits = {m: (float(self.low[i]), float(self.span[i])) for i, m in enumerate(self.motors)}
+
+        self._quantizers = {}
+
+    def _select(self, motors):
+        """Gets column indices into the tables for a list of motors, or a slice of all of them."""
+        if motors is None:
+            return slice(None)
+        return np.array([self.columns[m] for m in motors], dtype=np.intp)
+
+    def normalize(self, positions, motors=None):
+        """Normalizes positions in degrees to range [0.0, 1.0] of each motor's angle limits.
+
+        Args:
+            positions (np.ndarray): Positions in degrees, with motors along the last axis.
+            motors (List[int], optional): Defaults to None. Motor IDs of the columns, or None for all of the space's motors.
+
+        Returns:
+            np.ndarray: Normalized positions.
+        """
+        columns = self._select(motors)
+        return (np.asarray(positions, dtype=np.float64) - self.low[columns]) / self.span[columns]
+
+    def denormalize(self, positions, motors=None):
+        """Denormalizes positions in range [0.0, 1.0] of each motor's angle limits to degrees.
+
+        Args:
+            positions (np.ndarray): Normalized positions, with motors along the last axis.
+            motors (List[int], optional): Defaults to None. Motor IDs of the columns, or None for all of the space's motors.
+
+        Returns:
+            np.ndarray: Positions in degrees.
+        """
+        columns = self._select(motors)
+        return (np.asarray(positions, dtype=np.float64) * self.span[columns]) + self.low[columns]
+
+    def clamp(self, positions, motors=None, normalized=False):
+        """Clamps positions to each motor's angle limits.
+
+        Args:
+            positions (np.ndarray): Positions, with motors along the last axis.
+            motors (List[int], optional): Defaults to None. Motor IDs of the columns, or None for all of the space's motors.
+            normalized (bool, optional): Defaults to False. Whether positions are normalized rather than in degrees.
+
+        Returns:
+            np.ndarray: Clamped positions.
+        """
+        if normalized:
+            return np.clip(positions, 0.0, 1.0)
+        columns = self._select(motors)
+        return np.clip(positions, self.low[columns], self.high[columns])
+
+    def starting(self, motors=None, normalized=False):
+        """Gets starting positions.
+
+        Args:
+            motors (List[int], optional): Defaults to None. Motor IDs, or None for all of the space's motors.
+            normalized (bool, optional): Defaults to False. Whether to return normalized positions rather than degrees.
+
+        Returns:
+            np.ndarray: Starting positions, one per motor.
+        """
+        positions = self.starting_positions[self._select(motors)]
+        return self.normalize(positions, motors) if normalized else positions
+
+    def quantizer(self, quant):
+        """Gets the quantizer for a list of options, building and caching it the first time.
+
+        Args:
+            quant (List[float]): Quantized value options, in ascending order.
+
+        Returns:
+            Quantizer: The quantizer.
+        """
+        key = tuple(quant)
+        quantizer = self._quantizers.get(key)
+        if quantizer is None:
+            quantizer = Quantizer(key)
+            self._quantizers[key] = quantizer
+        return quantizer
+
+    def quantize(self, values, quant):
+        """Quantizes values to the closest of a list of options.
+
+        Args:
+            values (np.ndarray): Values to quantize, of any shape.
+            quant (List[float]): Quantized value options, in ascending order.
+
+        Returns:
+            np.ndarray: Quantized values, shaped like values.
+        """
+        return self.quantizer(quant)(values)
+
+    def normalize_position(self, motor, position):
+        """Normalizes a single position in degrees. See utils.normalize_position."""
+        low, span = self._scalar_limits[motor]
+        return (position - low) / span
+
+    def denormalize_position(self, motor, position):
+        """Denormalizes a single normalized position. See utils.denormalize_position."""
+        low, span = self._scalar_limits[motor]
+        return (position * span) + low
+
+
+# Shared by the scalar helpers in utils.utils
+motor_space = MotorSpace()
@@ -0,0 +1,92 @@
+from pypot.utils import StoppableThread
+import threading
+import time
+
+
+class WaitableThread(StoppableThread):
+    """A StoppableThread that can wait without spinning, and is woken up as soon as it is stopped.
+
+    Use sleep() in place of time.sleep() for waits that should end early on stop, and wait_to_resume() (from
+    StoppableThread) for waits while paused, which also ends on stop.
+    """
+
+    def __init__(self, setup=None, target=None, teardown=None):
+        self._wakeup = threading.Condition()
+        StoppableThread.__init__(self, setup=setup, target=target, teardown=teardown)
+
+    def notify(self):
+        """Wakes up any waits in progress so they can re-check whether the thread should stop."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def stop(self, wait=True):
+        """Stops the thread, waking it up if it is waiting.
+
+        Args:
+            wait (bool, optional): Defaults to True. Whether to wait for the thread to finish.
+        """
+        if self.started:
+            self._running.clear()
+            self._resume.set()
+            self.notify()
+        StoppableThread.stop(self, wait)
+
+    def sleep(self, duration):
+        """Waits for a duration, returning early if the thread is stopped.
+
+        Args:
+            duration (float): Time in seconds to wait.
+
+        Returns:
+            bool: True if the full duration elapsed, False if the thread was stopped.
+        """
+        deadline = time.monotonic() + duration
+        with self._wakeup:
+            while not self.should_stop():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._wakeup.wait(remaining)
+        return False
+
+
+class ParkableThread(StoppableThread):
+    """A StoppableThread whose pause can wait for the thread to actually reach its pause point.
+
+    pause() only asks the thread to pause, so it may still be in the middle of what it was doing, e.g. a transaction
+    on the motor bus. park() also waits for the thread to be parked in wait_to_resume(), after which it does nothing
+    until resumed. Threads must call wait_to_resume() when should_pause(), as StoppableThread's run loops do.
+    """
+
+    def __init__(self, setup=None, target=None, teardown=None):
+        self._parked = threading.Event()
+        StoppableThread.__init__(self, setup=setup, target=target, teardown=teardown)
+
+    def wait_to_resume(self):
+        """Waits until resumed, marking the thread as parked meanwhile."""
+        self._parked.set()
+        try:
+            StoppableThread.wait_to_resume(self)
+        finally:
+            self._parked.clear()
+
+    def park(self, timeout=1.0):
+        """Pauses the thread and waits for it to be parked.
+
+        Args:
+            timeout (float, optional): Defaults to 1.0. Maximum time in seconds to wait.
+
+        Returns:
+            bool: Whether the thread is parked, or isn't running at all.
+        """
+        self.pause()
+        if threading.current_thread() is getattr(self, '_thread', None):
+            return False
+
+        deadline = time.monotonic() + timeout
+        while self.running and not self._parked.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._parked.wait(min(remaining, 0.01))
+        return True
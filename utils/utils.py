@@ -1,4 +1,5 @@
 from config.definitions import *
+from utils.motor_space import motor_space
 import bisect
 import time
 
@@ -13,7 +14,7 @@ def normalize_position(id, position):
     Returns:
         float: Normalized motor position in range [0.0, 1.0].
     """
-    return (position - ANGLE_LIMITS[id][0]) / (ANGLE_LIMITS[id][1] - ANGLE_LIMITS[id][0])
+    return motor_space.normalize_position(id, position)
 
 
 def denormalize_position(id, position):
@@ -26,7 +27,7 @@ def denormalize_position(id, position):
     Returns:
         float: Denormalized motor position in degrees.
     """
-    return (position * (ANGLE_LIMITS[id][1] - ANGLE_LIMITS[id][0])) + ANGLE_LIMITS[id][0]
+    return motor_space.denormalize_position(id, position)
 
 
 def denormalize_to_range(value, range_min, range_max):
@@ -81,9 +82,8 @@ def quantize(value, quant):
     Returns:
         float: Quantized input value.
     """
-    mids = [(quant[i] + quant[i + 1]) / 2.0
-            for i in range(len(quant) - 1)]
-    ind = bisect.bisect_right(mids, value)
+    # Midpoints are computed once per list of options and cached
+    ind = bisect.bisect_right(motor_space.quantizer(quant).mid_list, value)
     return quant[ind]
 
 
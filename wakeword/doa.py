@@ -27,16 +27,15 @@ class DOA:
         self.doa = 0.0
         self.thread = threading.Thread(target=self.run_doa)
         self.run = True
+        self.stopped = threading.Event()
         self.thread.start()
 
     def run_doa(self):
         """Continuously checks and returns DOA value."""
         while self.run:
             raw_doa = self.mic_tuning.direction
-            if raw_doa > 120:
-                # Throw out outliers that would be behind Shimi
-                continue
-            else:
+            # Throw out outliers that would be behind Shimi, but still wait before reading again
+            if raw_doa <= 120:
                 if len(self.previous_values) < self.sma_length:
                     self.previous_values.append(raw_doa)
                     self.doa = sum(self.previous_values) / len(self.previous_values)
@@ -47,12 +46,15 @@ class DOA:
                     # From https://en.wikipedia.org/wiki/Moving_average
                     self.doa = self.previous_sma + (raw_doa / self.sma_length) - (last / self.sma_length)
                     self.previous_sma = self.doa
-            time.sleep(0.1)
+
+            # Wait for the next reading, waking up immediately if stopped
+            self.stopped.wait(0.1)
 
         usb.util.dispose_resources(self.usb_device)
 
     def stop(self):
         self.run = False
+        self.stopped.set()
         self.thread.join()
 
 